@@ -0,0 +1,176 @@
+"""
+Benchmark the chatbot parser's inference backends on a fixed prompt corpus.
+
+Each backend runs in its own process so resident memory is measured in
+isolation. Reports load time, per-prompt latency, peak RSS and extraction
+accuracy against the expected tasks.
+
+Usage (from the project root):
+    python -m ai_chatbot.benchmark_parser --backends fp32 int8 onnx --output bench.json
+"""
+import argparse
+import json
+import multiprocessing as mp
+import resource
+import statistics
+import sys
+import time
+from typing import Dict, List
+
+from ai_chatbot.parser import LLMParser, INFERENCE_BACKENDS, NUM_BEAMS, MAX_NEW_TOKENS, rule_extract_tasks
+
+# Fixed corpus: prompt -> expected (appliance, hours) pairs
+CORPUS = [
+    ("I need to do laundry for 2 hours", [("washer", 2.0)]),
+    ("charge my EV for 3.5h", [("ev_charger", 3.5)]),
+    ("laundry for 2 hours, charge my EV for 3.5h", [("washer", 2.0), ("ev_charger", 3.5)]),
+    ("run the dishwasher for 90 minutes", [("dishwasher", 1.5)]),
+    ("Dry the clothes for 1 hour and then run the dishwasher", [("dryer", 1.0), ("dishwasher", 1.0)]),
+    ("bake bread in the oven for 45 min", [("oven", 0.75)]),
+    ("turn on the water heater for half an hour", [("water_heater", 0.5)]),
+    ("run the AC for 4 hours this afternoon", [("ac", 4.0)]),
+    ("heater for 2h overnight", [("heater", 2.0)]),
+    ("microwave leftovers for 5 minutes", [("microwave", 0.0833)]),
+    ("wash clothes, dry them for 2 hours and charge the car for 6 hours",
+     [("washer", 1.0), ("dryer", 2.0), ("ev_charger", 6.0)]),
+    ("Schedule the dishwasher and the washing machine", [("dishwasher", 1.0), ("washer", 1.0)]),
+]
+
+
+def _peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS reports bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _normalize(tasks: List[Dict]) -> List[tuple]:
+    """Map free-form task names onto appliance keys so outputs can be compared."""
+    pairs = []
+    for task in tasks:
+        matched, _ = rule_extract_tasks(str(task.get('name', '')))
+        name = matched[0]['name'] if matched else str(task.get('name', '')).lower()
+        pairs.append((name, round(float(task['hours']), 2)))
+    return sorted(pairs)
+
+
+def score(predicted: List[Dict], expected: List[tuple]) -> tuple:
+    """Return (exact_match, matched_tasks) for one prompt."""
+    got = _normalize(predicted)
+    want = sorted((name, round(hours, 2)) for name, hours in expected)
+    remaining = list(got)
+    matched = 0
+    for pair in want:
+        if pair in remaining:
+            remaining.remove(pair)
+            matched += 1
+    return got == want, matched
+
+
+def run_backend(backend: str, model_name: str, num_beams: int, max_new_tokens: int, repeats: int) -> Dict:
+    """Measure one backend in the current process."""
+    rss_before = _peak_rss_mb()
+    if backend == "rules":
+        predict = lambda text: rule_extract_tasks(text)[0]
+        load_s = 0.0
+    else:
+        # Disable the rule fast path and the cache so every prompt hits the model
+        parser = LLMParser(model_name, backend=backend, num_beams=num_beams, max_new_tokens=max_new_tokens,
+                           min_rule_confidence=float('inf'), cache_size=0, max_wait_ms=0)
+        start = time.perf_counter()
+        if not parser.warm_up():
+            return {"backend": backend, "error": "model could not be loaded"}
+        load_s = time.perf_counter() - start
+        predict = parser.parse_tasks
+        predict(CORPUS[0][0])  # first call pays one-off graph/kernel setup
+
+    latencies = []
+    exact = 0
+    matched = 0
+    expected_total = 0
+    for _ in range(repeats):
+        for text, expected in CORPUS:
+            start = time.perf_counter()
+            tasks = predict(text)
+            latencies.append((time.perf_counter() - start) * 1000)
+            ok, hits = score(tasks, expected)
+            exact += ok
+            matched += hits
+            expected_total += len(expected)
+
+    latencies.sort()
+    n = len(latencies)
+    return {
+        "backend": backend,
+        "num_beams": num_beams,
+        "max_new_tokens": max_new_tokens,
+        "prompts": n,
+        "load_s": round(load_s, 2),
+        "latency_ms_mean": round(statistics.fmean(latencies), 2),
+        "latency_ms_p50": round(latencies[n // 2], 2),
+        "latency_ms_p95": round(latencies[min(n - 1, int(n * 0.95))], 2),
+        "peak_rss_mb": round(_peak_rss_mb(), 1),
+        "rss_growth_mb": round(_peak_rss_mb() - rss_before, 1),
+        "exact_match": round(exact / n, 3),
+        "task_recall": round(matched / expected_total, 3) if expected_total else 0.0,
+    }
+
+
+def _worker(args, conn):
+    try:
+        conn.send(run_backend(*args))
+    except Exception as e:
+        conn.send({"backend": args[0], "error": str(e)})
+    finally:
+        conn.close()
+
+
+def format_table(results: List[Dict]) -> str:
+    columns = ["backend", "load_s", "latency_ms_mean", "latency_ms_p50", "latency_ms_p95",
+               "peak_rss_mb", "exact_match", "task_recall"]
+    if any("error" in r for r in results):
+        columns.append("error")
+    rows = [[str(r.get(c, "-")) for c in columns] for r in results]
+    widths = [max(len(c), *(len(row[i]) for row in rows)) for i, c in enumerate(columns)]
+    lines = ["  ".join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines.append("  ".join("-" * w for w in widths))
+    lines.extend("  ".join(v.ljust(w) for v, w in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument("--backends", nargs="+", default=["rules", "fp32", "int8"],
+                    choices=("rules",) + INFERENCE_BACKENDS)
+    ap.add_argument("--model", default="t5-small")
+    ap.add_argument("--num-beams", type=int, default=NUM_BEAMS)
+    ap.add_argument("--max-new-tokens", type=int, default=MAX_NEW_TOKENS)
+    ap.add_argument("--repeats", type=int, default=3, help="passes over the corpus per backend")
+    ap.add_argument("--output", help="write the results as JSON to this path")
+    args = ap.parse_args(argv)
+
+    ctx = mp.get_context("spawn")
+    results = []
+    for backend in args.backends:
+        recv, send = ctx.Pipe(duplex=False)
+        proc = ctx.Process(target=_worker, args=(
+            (backend, args.model, args.num_beams, args.max_new_tokens, args.repeats), send))
+        proc.start()
+        send.close()
+        try:
+            result = recv.recv()
+        except EOFError:
+            result = {"backend": backend, "error": "benchmark process exited without a result"}
+        proc.join()
+        results.append(result)
+        print(f"{backend}: done", file=sys.stderr)
+
+    print(format_table(results))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print('Wrote', args.output)
+    return results
+
+
+if __name__ == '__main__':
+    main()
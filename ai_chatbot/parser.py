@@ -1,30 +1,15 @@
-from transformers import pipeline, set_seed
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import Future
+import asyncio
+import os
+import queue
+import threading
+import time
 import re
 import json
 
-class LLMParser:
-    def __init__(self, model_name="t5-small"):
-        """
-        Initializes the parser with a text-to-text generation model from Hugging Face.
-        """
-        try:
-            self.pipe = pipeline('text2text-generation', model=model_name)
-            set_seed(42)
-            self.model_loaded = True
-        except Exception as e:
-            print(f"Warning: Could not load model {model_name}. LLMParser will be disabled. Error: {e}")
-            self.model_loaded = False
-
-    def parse_tasks(self, text: str) -> List[Dict]:
-        """
-        Uses a T5 model to parse tasks from free text into a structured format.
-        Returns a list of dictionaries, e.g., [{'name': 'Laundry', 'hours': 2.0}].
-        """
-        if not self.model_loaded or not text.strip():
-            return []
-
-        prompt = f"""
+PROMPT_TEMPLATE = """
         Extract tasks and their durations in hours from the following text.
         Provide the output as a list of JSON objects, where each object has a "name" and "hours" key.
         If no duration is mentioned for a task, assume it is 1 hour.
@@ -35,36 +20,433 @@ class LLMParser:
         JSON Output:
         """
 
+# Micro-batching defaults: gather up to MAX_BATCH_SIZE prompts, waiting at most
+# MAX_WAIT_MS after the first one arrives, and run them as one generate call.
+MAX_BATCH_SIZE = 8
+MAX_WAIT_MS = 10.0
+
+# Inference backends for the model:
+#   fp32 - the stock transformers pipeline
+#   int8 - the same model with its Linear layers dynamically quantized to int8
+#   onnx - an exported ONNX graph run with onnxruntime (needs optimum[onnxruntime])
+INFERENCE_BACKENDS = ("fp32", "int8", "onnx")
+INFERENCE_BACKEND = os.environ.get("AURA_PARSER_BACKEND", "fp32")
+NUM_BEAMS = 4
+MAX_NEW_TOKENS = 128
+
+# The rule-based extractor answers on its own when at least this share of the
+# clauses in a message resolve to a known appliance; otherwise the model is used,
+# and without a model such a message yields no tasks.
+MIN_RULE_CONFIDENCE = 0.8
+CACHE_SIZE = 1024
+
+# Everyday phrases for each appliance the backend schedules (the keys of
+# APPLIANCE_CONSUMPTION in backend/appliances.py). The appliance name itself
+# (with underscores as spaces) is always accepted too.
+APPLIANCE_ALIASES = {
+    "washer": ["laundry", "washing machine", "wash clothes", "wash the clothes"],
+    "dryer": ["dry clothes", "dry the clothes", "tumble dry"],
+    "dishwasher": ["dishes", "dish washer", "dish washing"],
+    "ev_charger": ["ev", "electric vehicle", "electric car", "ev charging", "charge the car", "charge my car"],
+    "oven": ["bake", "baking", "roast"],
+    "microwave": [],
+    "refrigerator": ["fridge", "freezer"],
+    "ac": ["air conditioner", "air conditioning", "a/c", "cooling"],
+    "heater": ["space heater"],
+    "water_heater": ["hot water", "water heating", "boiler", "heat water", "heat the water"],
+}
+
+# Verbs that hint at an appliance but also go with other objects ("wash the
+# dishes", "charge my phone"). A noun alias in the same clause wins over a verb;
+# a verb on its own only counts as a guess, see VERB_ONLY_CONFIDENCE.
+APPLIANCE_VERBS = {
+    "washer": ["wash", "washing"],
+    "dryer": ["dry", "drying"],
+    "ev_charger": ["charge"],
+    "oven": ["cook", "cooking"],
+    "heater": ["heat", "heating"],
+}
+
+# Weight of a clause resolved from a verb alone, e.g. "wash for 2 hours"; kept
+# below MIN_RULE_CONFIDENCE so such a message still goes to the model.
+VERB_ONLY_CONFIDENCE = 0.5
+
+DURATION_UNITS = {
+    "h": 1.0, "hr": 1.0, "hrs": 1.0, "hour": 1.0, "hours": 1.0,
+    "m": 1 / 60, "min": 1 / 60, "mins": 1 / 60, "minute": 1 / 60, "minutes": 1 / 60,
+}
+
+NUMBER_WORDS = {
+    "a": 1.0, "an": 1.0, "one": 1.0, "two": 2.0, "three": 3.0, "four": 4.0, "five": 5.0,
+    "six": 6.0, "seven": 7.0, "eight": 8.0, "nine": 9.0, "ten": 10.0, "twelve": 12.0,
+    "half an": 0.5, "half a": 0.5,
+}
+
+# Words that carry no task information on their own
+FILLER_WORDS = {
+    "i", "need", "to", "do", "my", "the", "a", "an", "then", "also", "please", "for",
+    "and", "run", "start", "schedule", "want", "would", "like", "can", "you", "it",
+    "some", "of", "about", "around", "tonight", "today", "tomorrow", "later", "me",
+    "let", "lets", "let's", "should", "could", "will", "have", "got", "up", "on", "use",
+}
+
+
+def _alias_pattern():
+    aliases = {}
+    for appliance, verbs in APPLIANCE_VERBS.items():
+        for verb in verbs:
+            aliases[verb] = (appliance, True)
+    for appliance in APPLIANCE_ALIASES:
+        aliases[appliance.replace('_', ' ')] = (appliance, False)
+        aliases[appliance] = (appliance, False)
+        for alias in APPLIANCE_ALIASES[appliance]:
+            aliases[alias] = (appliance, False)
+    # Longest alias first so "water heater" wins over "heater"
+    ordered = sorted(aliases, key=len, reverse=True)
+    pattern = re.compile(r'(?<![\w/])(' + '|'.join(re.escape(a) for a in ordered) + r')(?![\w/])')
+    return pattern, aliases
+
+
+_APPLIANCE_RE, _ALIAS_TO_APPLIANCE = _alias_pattern()
+_NUMBER = r'\d+(?:\.\d+)?|' + '|'.join(sorted((re.escape(w) for w in NUMBER_WORDS), key=len, reverse=True))
+_DURATION_RE = re.compile(
+    r'(?<![\w.])(' + _NUMBER + r')\s*(' + '|'.join(sorted(DURATION_UNITS, key=len, reverse=True)) + r')\b'
+)
+_CLAUSE_SPLIT_RE = re.compile(r'[,;!?]+|\.(?!\d)|\band then\b|\bthen\b|\band\b|\bplus\b|\balso\b')
+_WORD_RE = re.compile(r"[a-z][a-z'/]*")
+
+
+def normalize_text(text: str) -> str:
+    """Lower-case and collapse whitespace; used as the extraction cache key."""
+    return ' '.join(text.lower().split())
+
+
+def rule_extract_tasks(text: str) -> Tuple[List[Dict], float]:
+    """
+    Extract tasks with a deterministic grammar over known appliance names and
+    duration units, e.g. "laundry for 2 hours, charge my EV for 3.5h".
+
+    Returns the tasks and a confidence between 0 and 1: the share of clauses in
+    the text that resolved to an appliance, where a clause read from a verb
+    alone counts VERB_ONLY_CONFIDENCE.
+    """
+    tasks: List[Dict] = []
+    resolved = 0.0
+    clauses = 0
+    for clause in _CLAUSE_SPLIT_RE.split(normalize_text(text)):
+        clause = clause.strip()
+        if not clause:
+            continue
+
+        duration = _DURATION_RE.search(clause)
+        nouns, verbs = [], []
+        for match in _APPLIANCE_RE.finditer(clause):
+            appliance, is_verb = _ALIAS_TO_APPLIANCE[match.group(1)]
+            found = verbs if is_verb else nouns
+            if appliance not in found:
+                found.append(appliance)
+
+        weight = 1.0
+        appliances = nouns
+        if not nouns and verbs:
+            # "wash for 2 hours" is a guess; "wash the car" is a task we cannot read
+            rest = _APPLIANCE_RE.sub(' ', _DURATION_RE.sub(' ', clause))
+            if not any(w not in FILLER_WORDS for w in _WORD_RE.findall(rest)):
+                appliances = verbs
+                weight = VERB_ONLY_CONFIDENCE
+
+        if not appliances:
+            # A clause with leftover words but no appliance is a task we could not read
+            rest = _DURATION_RE.sub(' ', clause)
+            if any(w not in FILLER_WORDS for w in _WORD_RE.findall(rest)):
+                clauses += 1
+            elif duration and tasks:
+                # "laundry, for 2 hours" - the duration belongs to the previous task
+                tasks[-1]['hours'] = _duration_hours(duration)
+            continue
+
+        hours = _duration_hours(duration) if duration else 1.0
+        for appliance in appliances:
+            tasks.append({'name': appliance, 'hours': hours})
+        resolved += weight
+        clauses += 1
+
+    confidence = resolved / clauses if clauses else 0.0
+    return tasks, confidence
+
+
+def _duration_hours(match) -> float:
+    amount, unit = match.group(1), match.group(2)
+    value = NUMBER_WORDS[amount] if amount in NUMBER_WORDS else float(amount)
+    return round(value * DURATION_UNITS[unit], 4)
+
+
+def extract_tasks(llm_output: str) -> List[Dict]:
+    """
+    Parse the raw model output into a list of {'name', 'hours'} dictionaries.
+    """
+    # The model output can be messy. We need to robustly parse it.
+    # It might be a stringified list of dicts, or just the dicts.
+    # Find all occurrences of JSON-like objects in the generated string.
+    json_objects = re.findall(r'\{.*?\}', llm_output)
+
+    tasks = []
+    for obj_str in json_objects:
         try:
-            # Generate text using the model
-            llm_output = self.pipe(prompt, max_length=128, num_beams=4, early_stopping=True)[0]['generated_text']
+            task = json.loads(obj_str)
+            if 'name' in task and 'hours' in task:
+                # Ensure hours is a float
+                task['hours'] = float(task['hours'])
+                tasks.append(task)
+        except (json.JSONDecodeError, TypeError, ValueError):
+            # Ignore malformed JSON objects
+            continue
 
-            # The model output can be messy. We need to robustly parse it.
-            # It might be a stringified list of dicts, or just the dicts.
-            # Find all occurrences of JSON-like objects in the generated string.
-            json_objects = re.findall(r'\{.*?\}', llm_output)
+    return tasks
 
-            tasks = []
-            for obj_str in json_objects:
+
+class LLMParser:
+    def __init__(self, model_name="t5-small", max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS,
+                 min_rule_confidence=MIN_RULE_CONFIDENCE, cache_size=CACHE_SIZE,
+                 backend=INFERENCE_BACKEND, num_beams=NUM_BEAMS, max_new_tokens=MAX_NEW_TOKENS):
+        """
+        Sets up a parser around a text-to-text generation model from Hugging Face.
+        The model is loaded on first use by the batching thread, never on the
+        caller's (event loop) thread, and concurrent parse_tasks() calls are
+        gathered into micro-batches of up to max_batch_size prompts, waiting at
+        most max_wait_ms for a batch to fill.
+
+        Texts the rule-based extractor reads with at least min_rule_confidence
+        never reach the model. Results are kept in an LRU cache of cache_size
+        entries keyed on the normalized text.
+
+        backend selects fp32, int8 (dynamic quantization) or onnx inference;
+        num_beams and max_new_tokens control generation cost.
+        """
+        if backend not in INFERENCE_BACKENDS:
+            raise ValueError(f"Unknown inference backend {backend!r}; expected one of {INFERENCE_BACKENDS}")
+        self.model_name = model_name
+        self.backend = backend
+        self.num_beams = max(1, int(num_beams))
+        self.max_new_tokens = max(1, int(max_new_tokens))
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait_ms = max(0.0, float(max_wait_ms))
+        self.pipe = None
+        self._loaded: Optional[bool] = None
+        self._load_lock = threading.Lock()
+        self._queue: "queue.Queue[tuple[str, Future]]" = queue.Queue()
+        self._worker: Optional[threading.Thread] = None
+        self.min_rule_confidence = min_rule_confidence
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[str, List[Dict]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+    def _load(self) -> bool:
+        """Build the generation pipeline once; later calls return the cached outcome."""
+        if self._loaded is not None:
+            return self._loaded
+        with self._load_lock:
+            if self._loaded is None:
+                try:
+                    self.pipe = self._build_pipeline()
+                    from transformers import set_seed
+                    set_seed(42)
+                    self._loaded = True
+                except Exception as e:
+                    print(f"Warning: Could not load model {self.model_name} ({self.backend}). LLMParser will be disabled. Error: {e}")
+                    self._loaded = False
+        return self._loaded
+
+    def _build_pipeline(self):
+        """Create the CPU generation pipeline for the configured backend."""
+        from transformers import pipeline, AutoTokenizer
+
+        if self.backend == "fp32":
+            return pipeline('text2text-generation', model=self.model_name, device=-1)
+
+        tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        if self.backend == "int8":
+            import torch
+            from transformers import AutoModelForSeq2SeqLM
+
+            model = AutoModelForSeq2SeqLM.from_pretrained(self.model_name).eval()
+            model = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+        else:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+            model = ORTModelForSeq2SeqLM.from_pretrained(
+                self.model_name, export=True, provider="CPUExecutionProvider"
+            )
+        return pipeline('text2text-generation', model=model, tokenizer=tokenizer, device=-1)
+
+    @property
+    def model_loaded(self) -> bool:
+        return self._load()
+
+    def warm_up(self) -> bool:
+        """Load the model ahead of the first request."""
+        return self._load()
+
+    def _ensure_worker(self):
+        if self._worker is not None and self._worker.is_alive():
+            return
+        with self._load_lock:
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._batch_loop, name="llm-parser-batcher", daemon=True)
+                self._worker.start()
+
+    def _generate(self, prompts: List[str]) -> List[str]:
+        """Run one batched generate call and return the generated text per prompt."""
+        outputs = self.pipe(
+            prompts,
+            max_new_tokens=self.max_new_tokens,
+            num_beams=self.num_beams,
+            early_stopping=self.num_beams > 1,
+            batch_size=len(prompts),
+        )
+        texts = []
+        for out in outputs:
+            # Pipelines return either a dict or a single-element list per prompt
+            if isinstance(out, list):
+                out = out[0]
+            texts.append(out['generated_text'])
+        return texts
+
+    def _batch_loop(self):
+        wait_s = self.max_wait_ms / 1000.0
+        while True:
+            # Block for the first prompt, then give others up to max_wait_ms to join
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + wait_s
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
                 try:
-                    task = json.loads(obj_str)
-                    if 'name' in task and 'hours' in task:
-                        # Ensure hours is a float
-                        task['hours'] = float(task['hours'])
-                        tasks.append(task)
-                except (json.JSONDecodeError, TypeError):
-                    # Ignore malformed JSON objects
-                    continue
+                    if remaining > 0:
+                        batch.append(self._queue.get(timeout=remaining))
+                    else:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            if not self._load():
+                # No model: None tells _resolve_tasks() to answer without one
+                for _, fut in batch:
+                    fut.set_result(None)
+                continue
+
+            prompts = [prompt for prompt, _ in batch]
+            try:
+                results = self._generate(prompts)
+            except Exception as e:
+                for _, fut in batch:
+                    fut.set_exception(e)
+                continue
+            for (_, fut), text in zip(batch, results):
+                fut.set_result(text)
 
-            return tasks
+    def _cache_get(self, key: str) -> Optional[List[Dict]]:
+        with self._cache_lock:
+            tasks = self._cache.get(key)
+            if tasks is None:
+                return None
+            self._cache.move_to_end(key)
+        return [dict(t) for t in tasks]
 
+    def _cache_put(self, key: str, tasks: List[Dict]):
+        if self.cache_size <= 0:
+            return
+        with self._cache_lock:
+            self._cache[key] = [dict(t) for t in tasks]
+            self._cache.move_to_end(key)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def submit(self, text: str) -> Future:
+        """
+        Queue a text for parsing and return a Future resolving to its task list.
+        """
+        result: Future = Future()
+        key = normalize_text(text)
+        if not key:
+            result.set_result([])
+            return result
+
+        cached = self._cache_get(key)
+        if cached is not None:
+            result.set_result(cached)
+            return result
+
+        # Fast path: confident rule-based extraction skips the model entirely
+        rule_tasks, confidence = rule_extract_tasks(key)
+        if confidence >= self.min_rule_confidence:
+            self._cache_put(key, rule_tasks)
+            result.set_result(rule_tasks)
+            return result
+        if self._loaded is False:
+            # Partial rule results are not trusted without the model
+            result.set_result([])
+            return result
+
+        raw: Future = Future()
+        raw.add_done_callback(lambda f: self._resolve_tasks(f, result, key, rule_tasks))
+        self._ensure_worker()
+        self._queue.put((PROMPT_TEMPLATE.format(text=text), raw))
+        return result
+
+    def _resolve_tasks(self, raw: Future, result: Future, key: str, rule_tasks: List[Dict]):
+        try:
+            output = raw.result()
+            if output is None:
+                # The model could not be loaded; partial rule results are not trusted without it
+                result.set_result([])
+                return
+            tasks = extract_tasks(output)
         except Exception as e:
             print(f"Error during LLM parsing: {e}")
-            return []
+            result.set_result([])
+            return
+        # Keep whatever the rules found if the model produced nothing usable
+        tasks = tasks or rule_tasks
+        self._cache_put(key, tasks)
+        result.set_result(tasks)
+
+    def parse_tasks(self, text: str) -> List[Dict]:
+        """
+        Uses a T5 model to parse tasks from free text into a structured format.
+        Returns a list of dictionaries, e.g., [{'name': 'Laundry', 'hours': 2.0}].
+        """
+        return self.submit(text).result()
+
+    async def aparse_tasks(self, text: str) -> List[Dict]:
+        """Async variant of parse_tasks() for use from request handlers."""
+        return await asyncio.wrap_future(self.submit(text))
+
+
+_parsers: Dict[tuple, LLMParser] = {}
+_parsers_lock = threading.Lock()
+
+
+def get_parser(model_name="t5-small", backend=INFERENCE_BACKEND, num_beams=NUM_BEAMS,
+               max_new_tokens=MAX_NEW_TOKENS, **kwargs) -> LLMParser:
+    """
+    Return the process-wide LLMParser for model_name with this backend and
+    generation settings, creating it on first call. Other keyword arguments
+    (max_batch_size, max_wait_ms, ...) only apply on creation.
+    """
+    key = (model_name, backend, int(num_beams), int(max_new_tokens))
+    parser = _parsers.get(key)
+    if parser is None:
+        with _parsers_lock:
+            parser = _parsers.get(key)
+            if parser is None:
+                parser = LLMParser(model_name, backend=backend, num_beams=num_beams,
+                                   max_new_tokens=max_new_tokens, **kwargs)
+                _parsers[key] = parser
+    return parser
 
 # Example usage:
 if __name__ == '__main__':
-    parser = LLMParser()
+    parser = get_parser()
     if parser.model_loaded:
         test_text = "I need to do laundry for 2 hours, then charge my EV for 3.5h. Also, run backups."
         parsed_tasks = parser.parse_tasks(test_text)
@@ -0,0 +1,176 @@
+"""
+Admission control for the expensive endpoints.
+
+Each limited route has a token bucket per client (rate tokens per second, up
+to burst) and, optionally, a cap on requests in progress across all clients.
+A client that has used up its bucket gets 429; a route at its cap gets 503,
+both with Retry-After - the time until the client's next token, or the
+route's recent mean latency - so a burst is turned away at the door instead
+of queuing CPU work that delays everyone else.
+
+Limits are per worker process. They default to ROUTE_LIMITS and can be
+overridden with AURA_ADMISSION_LIMITS, a JSON object mapping a path to
+{"rate": ..., "burst": ..., "concurrency": ...} (null removes the limit).
+"""
+import json
+import math
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+from fastapi.responses import JSONResponse
+from starlette.middleware.base import BaseHTTPMiddleware
+
+ROUTE_LIMITS = {
+    '/api/compute-green-window': {'rate': 0.1, 'burst': 5, 'concurrency': 4},
+    '/api/jobs/compute-green-window': {'rate': 0.5, 'burst': 10, 'concurrency': 16},
+    '/api/optimize-windows': {'rate': 5.0, 'burst': 20, 'concurrency': 8},
+    '/api/optimize-windows/batch': {'rate': 1.0, 'burst': 5, 'concurrency': 2},
+    '/api/schedule-appliances': {'rate': 5.0, 'burst': 20, 'concurrency': 8},
+    '/api/scenarios': {'rate': 5.0, 'burst': 20, 'concurrency': 4},
+}
+# Buckets kept before idle (full) ones are dropped
+MAX_BUCKETS = 10_000
+# Weight of the newest request in the per-route latency average
+LATENCY_ALPHA = 0.2
+
+
+class RouteLimit:
+    """Token-bucket rate and burst per client, plus an optional concurrency cap."""
+
+    def __init__(self, rate: float, burst: float, concurrency: Optional[int] = None):
+        if rate <= 0 or burst < 1:
+            raise ValueError('rate must be positive and burst at least 1')
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self.concurrency = concurrency
+
+    def to_dict(self) -> Dict:
+        return {'rate': self.rate, 'burst': self.burst, 'concurrency': self.concurrency}
+
+
+def load_limits(overrides: Optional[str] = None) -> Dict[str, RouteLimit]:
+    """ROUTE_LIMITS with the JSON overrides (AURA_ADMISSION_LIMITS by default) applied."""
+    config = {path: dict(limit) for path, limit in ROUTE_LIMITS.items()}
+    overrides = os.environ.get('AURA_ADMISSION_LIMITS') if overrides is None else overrides
+    if overrides:
+        for path, limit in json.loads(overrides).items():
+            if limit is None:
+                config.pop(path, None)
+            else:
+                config[path] = {**config.get(path, {}), **limit}
+    return {path: RouteLimit(**limit) for path, limit in config.items()}
+
+
+class AdmissionController:
+    """Per-client token buckets and per-route concurrency for a set of routes."""
+
+    def __init__(self, limits: Dict[str, RouteLimit], trust_forwarded: bool = False,
+                 max_buckets: int = MAX_BUCKETS, clock=time.monotonic):
+        self.limits = limits
+        self.trust_forwarded = trust_forwarded
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self._buckets: Dict[Tuple[str, str], List[float]] = {}
+        self._active: Dict[str, int] = {path: 0 for path in limits}
+        self._latency: Dict[str, float] = {}
+        self.counters: Dict[str, Dict[str, int]] = {
+            path: {'admitted': 0, 'rate_limited': 0, 'saturated': 0} for path in limits
+        }
+
+    def client_id(self, request) -> str:
+        """The client's address (the first X-Forwarded-For hop when behind a trusted proxy)."""
+        if self.trust_forwarded:
+            forwarded = request.headers.get('x-forwarded-for')
+            if forwarded:
+                return forwarded.split(',')[0].strip()
+        return request.client.host if request.client else 'unknown'
+
+    def admit(self, path: str, client: str) -> Optional[Tuple[int, int, str]]:
+        """
+        Take a token and a concurrency slot for the request, or refuse it.
+
+        Returns:
+            None when admitted (call release() when done), otherwise
+            (status code, Retry-After seconds, reason)
+        """
+        limit = self.limits.get(path)
+        if limit is None:
+            return None
+        now = self.clock()
+
+        if limit.concurrency is not None and self._active[path] >= limit.concurrency:
+            self.counters[path]['saturated'] += 1
+            retry = max(1, math.ceil(self._latency.get(path, 1.0)))
+            return 503, retry, f'{path} is at its limit of {limit.concurrency} concurrent requests'
+
+        key = (client, path)
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._prune(now)
+            bucket = self._buckets[key] = [limit.burst, now]
+        tokens = min(limit.burst, bucket[0] + (now - bucket[1]) * limit.rate)
+        bucket[1] = now
+        if tokens < 1.0:
+            bucket[0] = tokens
+            self.counters[path]['rate_limited'] += 1
+            retry = max(1, math.ceil((1.0 - tokens) / limit.rate))
+            return 429, retry, f'Rate limit for {path} exceeded ({limit.rate:g}/s, burst {limit.burst:g})'
+        bucket[0] = tokens - 1.0
+
+        self._active[path] += 1
+        self.counters[path]['admitted'] += 1
+        return None
+
+    def release(self, path: str, elapsed_s: float):
+        """Free the request's concurrency slot and fold its latency into the route average."""
+        self._active[path] -= 1
+        previous = self._latency.get(path)
+        self._latency[path] = elapsed_s if previous is None else (
+            LATENCY_ALPHA * elapsed_s + (1 - LATENCY_ALPHA) * previous
+        )
+
+    def _prune(self, now: float):
+        """Drop buckets that have refilled completely; they are equivalent to new ones."""
+        for key, (tokens, updated) in list(self._buckets.items()):
+            limit = self.limits[key[1]]
+            if tokens + (now - updated) * limit.rate >= limit.burst:
+                del self._buckets[key]
+
+    def status(self) -> Dict:
+        return {
+            path: {
+                **limit.to_dict(),
+                'in_progress': self._active[path],
+                'mean_latency_s': round(self._latency[path], 4) if path in self._latency else None,
+                **self.counters[path],
+            }
+            for path, limit in self.limits.items()
+        }
+
+
+class AdmissionMiddleware(BaseHTTPMiddleware):
+    """Applies an AdmissionController to every request before it reaches the endpoint."""
+
+    def __init__(self, app, controller: AdmissionController):
+        super().__init__(app)
+        self.controller = controller
+
+    async def dispatch(self, request, call_next):
+        path = request.url.path
+        # CORS preflights are cheap and must not use up tokens
+        if request.method == 'OPTIONS' or path not in self.controller.limits:
+            return await call_next(request)
+
+        refused = self.controller.admit(path, self.controller.client_id(request))
+        if refused is not None:
+            status_code, retry_after, reason = refused
+            return JSONResponse({'detail': reason}, status_code=status_code,
+                                headers={'Retry-After': str(retry_after)})
+
+        start = time.perf_counter()
+        try:
+            return await call_next(request)
+        finally:
+            self.controller.release(path, time.perf_counter() - start)
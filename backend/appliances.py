@@ -0,0 +1,69 @@
+import numpy as np
+
+# Appliance energy consumption (kWh per hour) - approximate values
+APPLIANCE_CONSUMPTION = {
+    "washer": 0.5,
+    "dryer": 3.0,
+    "dishwasher": 1.8,
+    "ev_charger": 7.2,
+    "oven": 2.3,
+    "microwave": 1.2,
+    "refrigerator": 0.1,
+    "ac": 1.5,
+    "heater": 1.5,
+    "water_heater": 4.0
+}
+
+# Power curves (average kW in each 15-minute slot of one cycle) - approximate
+# values in line with the hourly rates above
+SLOT_MINUTES = 15
+SLOTS_PER_HOUR = 60 // SLOT_MINUTES
+APPLIANCE_PROFILES = {
+    "washer": [1.2, 0.3, 0.2, 0.3],                      # water heating, then tumbling and spin
+    "dryer": [3.4, 3.4, 3.0, 2.2],                       # element cycling, cool-down
+    "dishwasher": [1.8, 1.8, 0.2, 0.1, 0.1, 1.6, 1.4, 0.2],  # heated wash, pump, heated rinse, dry
+    "ev_charger": [7.2] * 12 + [6.0, 4.5, 3.0, 1.5],     # constant current, then taper near full
+    "oven": [3.0, 2.3, 1.8, 2.1],                        # preheat, then thermostat cycling
+    "microwave": [1.2],
+    "refrigerator": [0.15, 0.15, 0.05, 0.05],            # compressor duty cycle
+    "ac": [1.8, 1.5, 1.2, 1.5],
+    "heater": [1.5, 1.5, 1.5, 1.5],
+    "water_heater": [4.5, 4.5, 4.0, 3.0],                # tank recovery
+}
+# Appliances that run for as long as they are scheduled, repeating their
+# cycle; the others run their cycle once
+CONTINUOUS_APPLIANCES = {"refrigerator", "ac", "heater"}
+# Unknown appliances draw 1 kW for as long as they are scheduled
+DEFAULT_PROFILE = [1.0] * SLOTS_PER_HOUR
+
+
+def appliance_profile(appliance: str, duration_minutes=None) -> np.ndarray:
+    """
+    Energy (kWh) drawn in each slot of the appliance's cycle, or of
+    duration_minutes of running it: a cycle is cut short when the duration is
+    shorter and continuous appliances repeat it when longer. A final partial
+    slot draws its share of the slot's energy.
+    """
+    known = appliance in APPLIANCE_PROFILES
+    power = np.asarray(APPLIANCE_PROFILES[appliance] if known else DEFAULT_PROFILE, dtype=float)
+    if duration_minutes is not None:
+        slots = max(1, -(-int(duration_minutes) // SLOT_MINUTES))
+        if slots <= len(power) or appliance in CONTINUOUS_APPLIANCES or not known:
+            power = np.resize(power, slots)
+        else:
+            power = np.concatenate([power, np.zeros(slots - len(power))])
+        partial = duration_minutes / SLOT_MINUTES - (slots - 1)
+        if 0 < partial < 1:
+            power[-1] *= partial
+    return power * SLOT_MINUTES / 60
+
+
+def start_emissions(profile_kwh: np.ndarray, intensity: np.ndarray) -> np.ndarray:
+    """
+    CO2 in kg of running a profile (kWh per slot) from the start of each hour
+    of an hourly intensity series (gCO2/kWh), as one convolution. A cycle that
+    runs past the last hour is charged the last hour's intensity.
+    """
+    slots = np.repeat(np.asarray(intensity, dtype=float), SLOTS_PER_HOUR)
+    slots = np.pad(slots, (0, len(profile_kwh) - 1), mode='edge')
+    return np.convolve(slots, profile_kwh[::-1], mode='valid')[::SLOTS_PER_HOUR] / 1000
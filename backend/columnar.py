@@ -0,0 +1,254 @@
+"""
+Versioned columnar tables on disk: one .npy file per column.
+
+Layout:
+    <root>/<version>/<column>.npy
+    <root>/<version>/meta.json
+    <root>/CURRENT            (name of the version readers should open)
+
+A table is written into a fresh version directory and published by atomically
+replacing CURRENT, so readers never see a partially written table. Columns are
+opened with np.load(mmap_mode='r'), so reading costs no copies.
+
+A table grown with append_table() is stored in segments instead
+(<column>.<i>.npy, row counts in meta['segments']): a new version hard-links
+the full segments it keeps from the published one and writes only the rows
+after them. Opening such a table concatenates its segments once per version.
+"""
+import json
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: updates are serialised per process only
+    fcntl = None
+
+KEEP_VERSIONS = 3
+# Rows per segment written by append_table()
+SEGMENT_ROWS = 4096
+
+_update_lock = threading.Lock()
+
+
+class ColumnTable:
+    """A published table version: metadata plus memory-mapped column arrays."""
+
+    def __init__(self, root: Path, version: str, meta: Dict, segments: List[Dict[str, np.ndarray]]):
+        self.root = root
+        self.version = version
+        self.meta = meta
+        self.segments = segments
+        self._columns: Optional[Dict[str, np.ndarray]] = None
+
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        if self._columns is None:
+            if len(self.segments) == 1:
+                self._columns = self.segments[0]
+            else:
+                self._columns = {name: np.concatenate([s[name] for s in self.segments])
+                                 for name in self.meta['columns']}
+        return self._columns
+
+    def __getitem__(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def __len__(self) -> int:
+        return int(self.meta.get('rows', 0))
+
+    def rows(self, lo: int, hi: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Rows [lo, hi) of every column, reading only the segments they fall in."""
+        hi = len(self) if hi is None else min(hi, len(self))
+        parts = {name: [] for name in self.meta['columns']}
+        start = 0
+        for segment, n in zip(self.segments, _segment_sizes(self.meta)):
+            if start < hi and start + n > lo:
+                for name in parts:
+                    parts[name].append(segment[name][max(lo - start, 0):hi - start])
+            start += n
+        return {name: np.concatenate(values) if values else self.segments[0][name][:0]
+                for name, values in parts.items()}
+
+    def searchsorted(self, name: str, value) -> int:
+        """Index of the first row whose (sorted) column name is >= value, segment by segment."""
+        start = 0
+        for segment in self.segments:
+            values = segment[name]
+            if len(values) and values[-1] >= value:
+                return start + int(np.searchsorted(values, value))
+            start += len(values)
+        return start
+
+
+def current_version(root: Path) -> Optional[str]:
+    try:
+        return (Path(root) / 'CURRENT').read_text().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+@contextmanager
+def update_lock(root: Path):
+    """
+    Serialise read-modify-publish cycles on the table at root across threads
+    and, where flock exists, across processes.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    if fcntl is None:
+        with _update_lock:
+            yield
+        return
+    with open(root / '.lock', 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_table(root: Path, columns: Dict[str, np.ndarray], meta: Optional[Dict] = None,
+                keep_versions: int = KEEP_VERSIONS) -> str:
+    """
+    Write columns as a new version under root and publish it. All columns must
+    have the same length. Returns the new version name.
+    """
+    lengths = {len(v) for v in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f'Columns have different lengths: {sorted(lengths)}')
+
+    def fill(staging: Path) -> Dict:
+        for name, values in columns.items():
+            np.save(staging / f'{name}.npy', np.ascontiguousarray(values), allow_pickle=False)
+        return {'rows': lengths.pop() if lengths else 0}
+
+    return _publish(Path(root), columns, fill, meta, keep_versions)
+
+
+def append_table(root: Path, columns: Dict[str, np.ndarray], keep_rows: int, meta: Optional[Dict] = None,
+                 keep_versions: int = KEEP_VERSIONS, segment_rows: int = SEGMENT_ROWS,
+                 base: Optional[str] = None) -> str:
+    """
+    Publish a new version holding the first keep_rows rows of version base
+    (the published one by default) followed by columns, e.g. a history whose
+    newest rows were recomputed. Full segments that end by keep_rows are
+    hard-linked from base, so the cost is the rows after them, not the table.
+    Without a published version this is write_table().
+    """
+    root = Path(root)
+    current = base or current_version(root)
+    if current is None:
+        if keep_rows:
+            raise ValueError(f'No published table under {root} to keep {keep_rows} rows of')
+        return write_table(root, columns, meta, keep_versions)
+    published = open_table(root, current)
+    if set(published.meta['columns']) != set(columns):
+        raise ValueError(f'Columns {sorted(columns)} do not match the table {sorted(published.meta["columns"])}')
+    if not 0 <= keep_rows <= len(published):
+        raise ValueError(f'keep_rows {keep_rows} is outside the table of {len(published)} rows')
+    lengths = {len(v) for v in columns.values()}
+    if len(lengths) > 1:
+        raise ValueError(f'Columns have different lengths: {sorted(lengths)}')
+
+    # Keep the leading full segments that end by keep_rows; rewrite the rest
+    sizes = _segment_sizes(published.meta)
+    kept, start = 0, 0
+    while kept < len(sizes) and sizes[kept] >= segment_rows and start + sizes[kept] <= keep_rows:
+        start += sizes[kept]
+        kept += 1
+    carried = published.rows(start, keep_rows)
+    tail = {name: np.concatenate([carried[name], np.asarray(values)]) for name, values in columns.items()}
+    n = len(next(iter(tail.values()))) if tail else 0
+
+    def fill(staging: Path) -> Dict:
+        for i in range(kept):
+            for name in columns:
+                _link(_column_file(root / current, published.meta, name, i), staging / f'{name}.{i}.npy')
+        bounds = list(range(0, n, segment_rows)) or [0]
+        for j, lo in enumerate(bounds):
+            for name, values in tail.items():
+                np.save(staging / f'{name}.{kept + j}.npy',
+                        np.ascontiguousarray(values[lo:lo + segment_rows]), allow_pickle=False)
+        written = [min(segment_rows, n - lo) for lo in bounds]
+        return {'rows': start + n, 'segments': sizes[:kept] + written}
+
+    return _publish(root, tail, fill, meta, keep_versions)
+
+
+def _publish(root: Path, columns: Dict[str, np.ndarray], fill: Callable[[Path], Dict],
+             meta: Optional[Dict], keep_versions: int) -> str:
+    """Fill a staging directory, move it in as a new version and point CURRENT at it."""
+    root.mkdir(parents=True, exist_ok=True)
+    version = pd.Timestamp.now(tz='UTC').strftime('%Y%m%dT%H%M%S%f')
+    staging = Path(tempfile.mkdtemp(dir=root, prefix=f'.{version}.'))
+    try:
+        layout = fill(staging)
+        full_meta = dict(meta or {})
+        full_meta.update({
+            'version': version,
+            **layout,
+            'columns': {name: str(np.asarray(values).dtype) for name, values in columns.items()},
+        })
+        with open(staging / 'meta.json', 'w') as f:
+            json.dump(full_meta, f, indent=2)
+        os.replace(staging, root / version)
+    except BaseException:
+        shutil.rmtree(staging, ignore_errors=True)
+        raise
+
+    fd, tmp = tempfile.mkstemp(dir=root, prefix='.CURRENT.')
+    with os.fdopen(fd, 'w') as f:
+        f.write(version)
+    os.replace(tmp, root / 'CURRENT')
+
+    _prune(root, keep_versions)
+    return version
+
+
+def _segment_sizes(meta: Dict) -> List[int]:
+    return list(meta.get('segments', [meta.get('rows', 0)]))
+
+
+def _column_file(version_dir: Path, meta: Dict, name: str, segment: int) -> Path:
+    if 'segments' not in meta:
+        return version_dir / f'{name}.npy'
+    return version_dir / f'{name}.{segment}.npy'
+
+
+def _link(src: Path, dst: Path):
+    """Share an unchanged segment file with the new version (copy where hard links are unsupported)."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copyfile(src, dst)
+
+
+def _prune(root: Path, keep_versions: int):
+    """Remove all but the newest keep_versions versions (open memory maps stay valid)."""
+    versions = sorted(p for p in root.iterdir() if p.is_dir() and not p.name.startswith('.'))
+    for old in versions[:-keep_versions]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def open_table(root: Path, version: Optional[str] = None) -> ColumnTable:
+    """Open a version (the published one by default) with memory-mapped columns."""
+    root = Path(root)
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(root / 'CURRENT')
+    with open(root / version / 'meta.json', 'r') as f:
+        meta = json.load(f)
+    segments = [
+        {name: np.load(_column_file(root / version, meta, name, i), mmap_mode='r') for name in meta['columns']}
+        for i in range(len(_segment_sizes(meta)))
+    ]
+    return ColumnTable(root, version, meta, segments)
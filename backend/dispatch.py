@@ -0,0 +1,115 @@
+"""
+Merit-order dispatch of fossil generation.
+
+Instead of one 700 gCO2/kWh block, the fossil share of the load can be served
+by a fleet of units read from a local CSV (AURA_DISPATCH_UNITS, unset by
+default): one row per unit with name, fuel, capacity_mw,
+emission_factor_gco2_per_kwh and, optionally, marginal_cost. Units are
+stacked cheapest first (file order without costs). For any array of fossil
+demand - an hourly forecast or a (scenarios x hours) batch - the marginal unit
+of every element is found at once with np.searchsorted on the cumulative
+capacity, and emissions are the full units below it plus its partial output.
+Demand beyond the fleet's capacity is charged at shortfall_factor.
+"""
+import os
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.forecast_records import FOSSIL_INTENSITY
+
+DISPATCH_UNITS = os.environ.get('AURA_DISPATCH_UNITS')
+UNIT_COLUMNS = ('name', 'capacity_mw', 'emission_factor_gco2_per_kwh')
+
+
+class MeritOrder:
+    """Fossil units in dispatch order, with cumulative capacity and emissions."""
+
+    def __init__(self, names, capacity_mw, emission_factor, marginal_cost=None, fuels=None,
+                 shortfall_factor: float = FOSSIL_INTENSITY):
+        capacity_mw = np.asarray(capacity_mw, dtype=float)
+        emission_factor = np.asarray(emission_factor, dtype=float)
+        if len(capacity_mw) == 0 or (capacity_mw <= 0).any() or (emission_factor < 0).any():
+            raise ValueError('dispatch needs at least one unit, positive capacities and non-negative emission factors')
+        order = (np.arange(len(capacity_mw)) if marginal_cost is None
+                 else np.argsort(np.asarray(marginal_cost, dtype=float), kind='stable'))
+        self.names = [str(names[i]) for i in order]
+        self.fuels = [str(fuels[i]) for i in order] if fuels is not None else [''] * len(order)
+        self.capacity_mw = capacity_mw[order]
+        self.emission_factor = emission_factor[order]
+        self.shortfall_factor = float(shortfall_factor)
+        # Capacity stacked up to the top of each unit, and the emissions (MW x
+        # gCO2/kWh) of every unit below it at full output
+        self.top = np.cumsum(self.capacity_mw)
+        self.bottom = self.top - self.capacity_mw
+        self.below = np.concatenate(([0.0], np.cumsum(self.capacity_mw * self.emission_factor)[:-1]))
+        # A virtual last unit takes demand beyond the fleet
+        self._bottom = np.append(self.bottom, self.top[-1])
+        self._below = np.append(self.below, self.below[-1] + self.capacity_mw[-1] * self.emission_factor[-1])
+        self._factor = np.append(self.emission_factor, self.shortfall_factor)
+
+    @classmethod
+    def from_file(cls, path, shortfall_factor: float = FOSSIL_INTENSITY) -> 'MeritOrder':
+        units = pd.read_csv(path, comment='#')
+        missing = [column for column in UNIT_COLUMNS if column not in units.columns]
+        if missing:
+            raise ValueError(f'{path} is missing columns: {", ".join(missing)}')
+        return cls(
+            units['name'].tolist(),
+            units['capacity_mw'].to_numpy(),
+            units['emission_factor_gco2_per_kwh'].to_numpy(),
+            units['marginal_cost'].to_numpy() if 'marginal_cost' in units.columns else None,
+            units['fuel'].tolist() if 'fuel' in units.columns else None,
+            shortfall_factor,
+        )
+
+    @property
+    def capacity(self) -> float:
+        return float(self.top[-1])
+
+    def marginal_unit(self, fossil_mw: np.ndarray) -> np.ndarray:
+        """
+        Position in merit order of the unit serving the last MW of each demand
+        (the first unit for no demand, len(self) beyond the fleet's capacity).
+        """
+        return np.searchsorted(self.top, fossil_mw, side='left')
+
+    def dispatch(self, fossil_mw: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Emissions (MW x gCO2/kWh) and marginal emission factor (gCO2/kWh) for fossil demand of any shape."""
+        fossil_mw = np.asarray(fossil_mw, dtype=float)
+        unit = self.marginal_unit(fossil_mw)
+        emissions = self._below[unit] + (fossil_mw - self._bottom[unit]) * self._factor[unit]
+        return emissions, self._factor[unit]
+
+    def intensity(self, fossil_mw: np.ndarray, load_mw: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Average and marginal carbon intensity of the load (gCO2/kWh); NaN where the load is not positive."""
+        load_mw = np.asarray(load_mw, dtype=float)
+        emissions, marginal = self.dispatch(fossil_mw)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return (np.where(load_mw > 0, emissions / load_mw, np.nan),
+                    np.where(load_mw > 0, marginal, np.nan))
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def to_dict(self) -> Dict:
+        return {
+            'capacity_mw': self.capacity,
+            'shortfall_factor_gco2_per_kwh': self.shortfall_factor,
+            'units': [
+                {'name': name, 'fuel': fuel, 'capacity_mw': float(capacity), 'emission_factor_gco2_per_kwh': float(ef)}
+                for name, fuel, capacity, ef in zip(self.names, self.fuels, self.capacity_mw, self.emission_factor)
+            ],
+        }
+
+
+def load_dispatch(path=None) -> Optional[MeritOrder]:
+    """The merit order from the units file (AURA_DISPATCH_UNITS by default), or None when none is configured."""
+    path = path or DISPATCH_UNITS
+    if not path:
+        return None
+    if not Path(path).exists():
+        raise FileNotFoundError(f'Dispatch units file not found: {path}')
+    return MeritOrder.from_file(path)
@@ -0,0 +1,151 @@
+"""
+Compact forecast records for the forecast endpoints.
+
+A forecast is held as two arrays rather than a DataFrame: the hour of each
+step (int32 hours since the epoch) and the load (float32, rounded to 0.01 MW
+as every response reports it; float32 resolves loads below 65,536 MW finely
+enough to recover the rounded value exactly). The renewable baseload is the
+region's monthly baseline row, shared rather than repeated per hour, and
+fossil generation, carbon intensity and hour of day are derived on demand in
+float64, so responses are unchanged. Green/dirty classes are uint8 codes that
+become 'green_window'/'dirty_window' strings only in serialised rows; an hour
+is green when its intensity is below the baseline of its own month
+(classify_hours, shared with ml_models/compute_green_window.py).
+
+Fossil generation emits FOSSIL_INTENSITY per kWh unless the records carry a
+merit order (backend/dispatch.py), which stacks the fossil units per hour.
+"""
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+DIRTY = 0
+GREEN = 1
+WINDOW_TYPES = np.array(['dirty_window', 'green_window'])
+# Grams of CO2 per kWh of fossil generation
+FOSSIL_INTENSITY = 700.0
+
+
+def classify_hours(ds: np.ndarray, intensity: np.ndarray, baselines: np.ndarray) -> np.ndarray:
+    """
+    GREEN (1) where an hour's intensity is below the baseline of that hour's
+    month, else DIRTY (0); unknown (NaN) intensity is DIRTY. baselines holds
+    12 monthly values, January first.
+    """
+    months = np.asarray(ds).astype('datetime64[M]').astype(np.int64) % 12
+    return (np.asarray(intensity, dtype=float) < np.asarray(baselines, dtype=float)[months]).astype(np.uint8)
+
+
+class ForecastRecords:
+    """An hourly forecast with the carbon-intensity columns derived from it."""
+
+    __slots__ = ('hours', 'load_mw', 'baselines', 'tier', 'dispatch')
+
+    def __init__(self, hours: np.ndarray, load_mw: np.ndarray, baselines: np.ndarray, tier: str, dispatch=None):
+        self.hours = np.asarray(hours, dtype=np.int32)
+        self.load_mw = np.round(np.asarray(load_mw, dtype=float), 2).astype(np.float32)
+        self.baselines = baselines
+        self.tier = tier
+        self.dispatch = dispatch
+
+    @classmethod
+    def from_forecast(cls, ds: np.ndarray, load_mw: np.ndarray, baselines: np.ndarray, tier: str,
+                      dispatch=None) -> 'ForecastRecords':
+        """
+        Records for forecast timestamps (datetime64) and loads, with a region's
+        12 monthly baselines and, optionally, a MeritOrder for the fossil units.
+        """
+        hours = np.asarray(ds, dtype='datetime64[h]').astype(np.int64)
+        return cls(hours, load_mw, baselines, tier, dispatch)
+
+    def __len__(self) -> int:
+        return len(self.hours)
+
+    @property
+    def nbytes(self) -> int:
+        return self.hours.nbytes + self.load_mw.nbytes
+
+    @property
+    def ds(self) -> np.ndarray:
+        return self.hours.astype('datetime64[h]')
+
+    @property
+    def time_minutes(self) -> np.ndarray:
+        """Minutes after midnight at which each hour starts."""
+        return (self.hours % 24) * 60
+
+    def load(self) -> np.ndarray:
+        """Load in MW as float64, exactly the rounded values the records were built from."""
+        return np.round(self.load_mw.astype(float), 2)
+
+    def renewable(self) -> np.ndarray:
+        months = self.ds.astype('datetime64[M]').astype(np.int64) % 12
+        return np.asarray(self.baselines, dtype=float)[months]
+
+    def thresholds(self) -> np.ndarray:
+        """Baseline of each hour's month, the intensity below which the hour is green."""
+        return self.renewable()
+
+    def baseline_threshold(self) -> float:
+        """Baseline of the first forecast hour's month, reported alongside the classes."""
+        return float(self.thresholds()[0])
+
+    def fossil(self, load: Optional[np.ndarray] = None, renewable: Optional[np.ndarray] = None) -> np.ndarray:
+        load = self.load() if load is None else load
+        renewable = self.renewable() if renewable is None else renewable
+        return np.maximum(load - renewable, 0.0)
+
+    def carbon_intensity(self) -> np.ndarray:
+        """gCO2/kWh per hour; NaN where the load is not positive."""
+        load = self.load()
+        if self.dispatch is not None:
+            return self.dispatch.intensity(self.fossil(load), load)[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(load > 0, self.fossil(load) * FOSSIL_INTENSITY / load, np.nan)
+
+    def marginal_intensity(self) -> np.ndarray:
+        """gCO2/kWh of the fossil unit serving the last MW of each hour; NaN where the load is not positive."""
+        load = self.load()
+        if self.dispatch is not None:
+            return self.dispatch.intensity(self.fossil(load), load)[1]
+        return np.where(load > 0, FOSSIL_INTENSITY, np.nan)
+
+    def renewable_percentage(self) -> np.ndarray:
+        load = self.load()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(load > 0, self.renewable() / load * 100, 0.0)
+
+    def classes(self, intensity: Optional[np.ndarray] = None) -> np.ndarray:
+        """GREEN (1) where the intensity is below the hour's monthly baseline, else DIRTY (0)."""
+        intensity = self.carbon_intensity() if intensity is None else intensity
+        return classify_hours(self.ds, intensity, self.baselines)
+
+    def frame(self) -> pd.DataFrame:
+        """The forecast as the DataFrame the endpoints used to build (for scripts and inspection)."""
+        ds = pd.to_datetime(self.ds.astype('datetime64[ns]'))
+        load, renewable = self.load(), self.renewable()
+        df = pd.DataFrame({
+            'ds': ds,
+            'Forecast_Load_MW': load,
+            'Renewable_Baseload_MW': renewable,
+            'Fossil_Fuel_MW': self.fossil(load, renewable),
+            'Carbon_Intensity_gCO2_per_kWh': self.carbon_intensity(),
+            'hour': ds.hour,
+            'minute': ds.minute,
+            'time_minutes': self.time_minutes.astype(np.int64),
+        })
+        if self.dispatch is not None:
+            df['Marginal_Intensity_gCO2_per_kWh'] = self.marginal_intensity()
+        df.attrs['forecast_tier'] = self.tier
+        return df
+
+
+def window_types(codes: np.ndarray) -> List[str]:
+    return WINDOW_TYPES[codes].tolist()
+
+
+def forecast_rows(columns: Dict[str, list]) -> List[Dict]:
+    """Response rows from equal-length column lists."""
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
@@ -0,0 +1,152 @@
+"""
+Forecast state shared by all backend worker processes.
+
+With several uvicorn/gunicorn workers only one of them - the producer, the
+holder of an exclusive flock on <state dir>/.producer.lock - loads SARIMAX and
+computes forecasts. Each forecast is published per region as an immutable
+columnar table (ds, forecast_load_mw) with the producing tier and a sequence
+number in its metadata; CURRENT is swapped atomically, so it acts as the
+version counter readers compare against. Every worker memory-maps the
+published version once and reads it without copying. A table also records the
+version of the load series and of the SARIMAX model it was computed from. A
+new version is published only when one of those changes (e.g. new readings
+are ingested or a model finishes loading) or a forecast outlives its TTL; a
+seasonal-profile forecast stays published while no model is available. If the
+producer exits its lock is released and the next worker that needs a fresh
+forecast takes over.
+"""
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, every process produces for itself
+    fcntl = None
+
+from backend.columnar import ColumnTable, current_version, open_table, write_table
+from backend.forecasters import TIER_PROFILE
+from backend.registry import region_slug
+
+ROOT = Path(__file__).parent.parent
+STATE_DIR = Path(os.environ.get('AURA_FORECAST_STATE_DIR', ROOT / 'outputs' / 'forecast_state'))
+TTL_S = float(os.environ.get('AURA_FORECAST_TTL_S', 900))
+
+
+class SharedForecast:
+    """Single-producer, many-reader forecast publication across processes."""
+
+    def __init__(self, forecaster, state_dir: Path = STATE_DIR, ttl_s: float = TTL_S):
+        self.forecaster = forecaster
+        self.state_dir = Path(state_dir)
+        self.ttl_s = ttl_s
+        self._lock_fd: Optional[int] = None
+        self._produce_lock = threading.Lock()
+        self._tables: Dict[str, ColumnTable] = {}
+        self._tables_lock = threading.Lock()
+
+    def is_producer(self) -> bool:
+        """Whether this process produces forecasts, claiming the role if it is free."""
+        if self._lock_fd is not None or fcntl is None:
+            return True
+        self.state_dir.mkdir(parents=True, exist_ok=True)
+        fd = os.open(self.state_dir / '.producer.lock', os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            os.close(fd)
+            return False
+        os.ftruncate(fd, 0)
+        os.write(fd, str(os.getpid()).encode())
+        self._lock_fd = fd
+        return True
+
+    def release(self):
+        """Give up the producer role (the lock is also released when the process exits)."""
+        if self._lock_fd is not None:
+            os.close(self._lock_fd)
+            self._lock_fd = None
+
+    def published(self, region: Optional[str] = None) -> Optional[ColumnTable]:
+        """The region's current forecast table, memory-mapped once per version."""
+        table_dir = self.state_dir / region_slug(region)
+        version = current_version(table_dir)
+        if version is None:
+            return None
+        key = str(table_dir)
+        table = self._tables.get(key)
+        if table is None or table.version != version:
+            with self._tables_lock:
+                table = self._tables.get(key)
+                if table is None or table.version != version:
+                    table = open_table(table_dir, version)
+                    self._tables[key] = table
+        return table
+
+    def publish(self, region: Optional[str], forecast: pd.Series, tier: str, source: Optional[str] = None,
+                model: Optional[str] = None) -> str:
+        previous = self.published(region)
+        sequence = previous.meta.get('sequence', 0) + 1 if previous is not None else 1
+        return write_table(self.state_dir / region_slug(region), {
+            'ds': np.asarray(forecast.index.values, dtype='datetime64[ns]'),
+            'forecast_load_mw': np.asarray(forecast.values, dtype=float),
+        }, meta={
+            'tier': tier,
+            'source': source,
+            'model': model,
+            'sequence': sequence,
+            'produced_at': time.time(),
+            'producer_pid': os.getpid(),
+        })
+
+    def _stale(self, table: Optional[ColumnTable], steps: int, source: Optional[str]) -> bool:
+        if table is None or len(table) < steps or table.meta.get('source') != source:
+            return True
+        return time.time() - table.meta.get('produced_at', 0.0) >= self.ttl_s
+
+    def _model_changed(self, table: Optional[ColumnTable], region: Optional[str]) -> bool:
+        """Whether a model finished loading, or another version replaced the one table was computed with."""
+        if self._lock_fd is None and fcntl is not None:
+            return False  # only the producer loads models
+        return table is not None and table.meta.get('model') != self.forecaster.model_version(region)
+
+    def get(self, region: Optional[str] = None, steps: int = 24) -> Tuple[pd.Series, str]:
+        """
+        The published forecast for region, refreshed first if this process is
+        the producer and it is stale. Raises KeyError when the region cannot be
+        forecast at all.
+        """
+        table = self.published(region)
+        source = self.forecaster.source_key(region)
+        if (self._stale(table, steps, source) or self._model_changed(table, region)) and self.is_producer():
+            with self._produce_lock:
+                table = self.published(region)
+                if self._stale(table, steps, source) or self._model_changed(table, region):
+                    model = self.forecaster.model_version(region)
+                    forecast, tier = self.forecaster.forecast(region, steps)
+                    self.publish(region, forecast, tier, source, model)
+                    table = self.published(region)
+
+        if table is None or len(table) < steps:
+            # Nothing published yet: answer from this worker's seasonal profile
+            # rather than loading a SARIMAX model in every process
+            return self.forecaster.profile(region).forecast(steps), TIER_PROFILE
+
+        forecast = pd.Series(table['forecast_load_mw'][:steps], index=pd.DatetimeIndex(table['ds'][:steps]))
+        return forecast, table.meta.get('tier', TIER_PROFILE)
+
+    def status(self) -> Dict:
+        return {
+            'pid': os.getpid(),
+            'producer': self._lock_fd is not None or fcntl is None,
+            'published': {
+                Path(key).name: {'version': table.version, 'sequence': table.meta.get('sequence'),
+                                 'tier': table.meta.get('tier')}
+                for key, table in list(self._tables.items())
+            },
+        }
@@ -0,0 +1,188 @@
+"""
+Tiered demand forecasting.
+
+SARIMAX is the accurate tier but a model can take seconds to load. The fast
+tier is a seasonal profile: the mean load of the same hour of the week over
+the last PROFILE_WEEKS weeks, precomputed once per load series, so a forecast
+is a single array lookup. Requests are answered by SARIMAX when the region's
+model is already in memory; otherwise the model is loaded in the background
+and the profile answers, until the model is warm or whenever SARIMAX fails.
+
+When the load series runs past the end of a model's sample (live readings),
+the model is filtered through the new hours with its fitted parameters before
+forecasting, so forecasts always start after the latest reading.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from backend.columnar import current_version
+from backend.fourier import forecast_mean, fourier_terms, model_exog_names
+from backend.history import HISTORY_DIR, get_history_table
+from backend.registry import region_slug
+from backend.seasonal import DEFAULT_REGION
+
+PROFILE_WEEKS = int(os.environ.get('AURA_PROFILE_WEEKS', 4))
+HOURS_PER_WEEK = 168
+TIER_SARIMAX = 'sarimax'
+TIER_PROFILE = 'seasonal_profile'
+
+
+def hour_of_week(ds: np.ndarray) -> np.ndarray:
+    """0 = Monday 00:00 ... 167 = Sunday 23:00"""
+    hours = np.asarray(ds).astype('datetime64[h]').astype(np.int64)
+    # 1970-01-01 was a Thursday, three days after Monday
+    return (hours + 3 * 24) % HOURS_PER_WEEK
+
+
+def catch_up(model, ds: np.ndarray, y: np.ndarray):
+    """
+    A fitted SARIMAX filtered, with its own parameters, through the hours of
+    (ds, y) after the end of its sample. Returns the model itself when the
+    series has nothing newer or does not continue the sample without a gap.
+    """
+    dates = getattr(getattr(model, 'data', None), 'dates', None)
+    if dates is None or len(dates) == 0:
+        return model
+    ds = np.asarray(ds, dtype='datetime64[ns]')
+    sample_end = pd.Timestamp(dates[-1]).to_datetime64().astype('datetime64[ns]')
+    lo = int(np.searchsorted(ds, sample_end, side='right'))
+    if lo == len(ds) or ds[lo] != sample_end + np.timedelta64(1, 'h'):
+        return model
+    if ds[-1] - ds[lo] != np.timedelta64(len(ds) - lo - 1, 'h'):
+        return model
+    index = pd.DatetimeIndex(ds[lo:], freq='h')
+    names = model_exog_names(model)
+    exog = fourier_terms(index, names) if names else None
+    return model.extend(pd.Series(np.asarray(y[lo:], dtype=float), index=index), exog=exog)
+
+
+class SeasonalProfile:
+    """Mean load per hour of the week over the most recent weeks of a series."""
+
+    def __init__(self, values: np.ndarray, last_ds: np.datetime64, weeks: int):
+        self.values = values
+        self.last_ds = last_ds
+        self.weeks = weeks
+
+    @classmethod
+    def from_series(cls, ds: np.ndarray, y: np.ndarray, weeks: int = PROFILE_WEEKS) -> 'SeasonalProfile':
+        ds = np.asarray(ds, dtype='datetime64[ns]')
+        y = np.asarray(y, dtype=float)
+        valid = ~np.isnan(y)
+        ds, y = ds[valid], y[valid]
+        if len(ds) == 0:
+            raise ValueError('Cannot build a seasonal profile from an empty series')
+        recent = ds > ds[-1] - np.timedelta64(weeks * HOURS_PER_WEEK, 'h')
+        slots = hour_of_week(ds[recent])
+        counts = np.bincount(slots, minlength=HOURS_PER_WEEK)
+        sums = np.bincount(slots, weights=y[recent], minlength=HOURS_PER_WEEK)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            values = sums / counts
+        # Hours never seen in the window (short series) fall back to the overall mean
+        values[counts == 0] = y[recent].mean()
+        return cls(values, ds[-1], weeks)
+
+    def forecast(self, steps: int = 24, start: Optional[np.datetime64] = None) -> pd.Series:
+        """Forecast for steps hours from start (default: the hour after the series ends)."""
+        start = self.last_ds + np.timedelta64(1, 'h') if start is None else np.datetime64(start, 'ns')
+        index = start + np.arange(steps) * np.timedelta64(1, 'h')
+        return pd.Series(self.values[hour_of_week(index)], index=pd.DatetimeIndex(index, freq='h'))
+
+
+class TieredForecaster:
+    """SARIMAX when the region's model is warm, the seasonal profile otherwise."""
+
+    def __init__(self, registry, load_series: Callable[[], pd.DataFrame], data_path: Path,
+                 history_dir: Path = HISTORY_DIR, weeks: int = PROFILE_WEEKS,
+                 series_version: Optional[Callable[[], str]] = None):
+        self.registry = registry
+        self.load_series = load_series
+        self.data_path = Path(data_path)
+        self.history_dir = Path(history_dir)
+        self.weeks = weeks
+        # Version of the default region's series when it changes without the CSV (live readings)
+        self.series_version = series_version
+        self._profiles: Dict[str, Tuple[str, SeasonalProfile]] = {}
+        self._extended: Dict[str, Tuple[str, object, object]] = {}
+        self._lock = threading.Lock()
+
+    def _source(self, region: Optional[str]) -> Tuple[str, Callable]:
+        """Version key and loader of the load series behind region's profile."""
+        slug = region_slug(region)
+        default = slug == region_slug(DEFAULT_REGION) and self.data_path.exists()
+
+        def from_csv():
+            df = self.load_series()
+            return df.index.values, df['y'].to_numpy()
+
+        if default and self.series_version is not None:
+            # Live readings make the default region's series newer than its history table
+            return f'live:{self.series_version()}', from_csv
+        version = current_version(self.history_dir / slug)
+        if version is not None:
+            def from_history():
+                table = get_history_table(region, self.history_dir)
+                return table['ds'], table['load_mw']
+            return f'history:{version}', from_history
+        if default:
+            return f'csv:{self.data_path.stat().st_mtime_ns}', from_csv
+        raise KeyError(region or DEFAULT_REGION)
+
+    def source_key(self, region: Optional[str] = None) -> Optional[str]:
+        """Version of the load series behind region's forecasts (None if it has none)."""
+        try:
+            return self._source(region)[0]
+        except KeyError:
+            return None
+
+    def model_version(self, region: Optional[str] = None) -> Optional[str]:
+        """Version of the SARIMAX model forecast() would use now; None while none is loaded (never blocks)."""
+        if self.registry.get_if_loaded(region) is None:
+            return None
+        return self.registry.served_version(region)
+
+    def profile(self, region: Optional[str] = None) -> SeasonalProfile:
+        """The region's profile, rebuilt only when its load series changes. Raises KeyError if none."""
+        slug = region_slug(region)
+        key, loader = self._source(region)
+        cached = self._profiles.get(slug)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with self._lock:
+            cached = self._profiles.get(slug)
+            if cached is None or cached[0] != key:
+                cached = (key, SeasonalProfile.from_series(*loader(), weeks=self.weeks))
+                self._profiles[slug] = cached
+        return cached[1]
+
+    def forecast(self, region: Optional[str] = None, steps: int = 24) -> Tuple[pd.Series, str]:
+        """
+        Forecast steps hours for region and report which tier produced it.
+        Raises KeyError when the region has neither a model nor a load series.
+        """
+        model = self.registry.get_if_loaded(region)
+        if model is not None:
+            try:
+                return forecast_mean(self._caught_up(model, region), steps), TIER_SARIMAX
+            except Exception as e:
+                print(f'SARIMAX forecast failed for {region or DEFAULT_REGION}, using seasonal profile: {e}')
+        return self.profile(region).forecast(steps), TIER_PROFILE
+
+    def _caught_up(self, model, region: Optional[str]):
+        """catch_up() of model with region's series, cached per model and series version."""
+        try:
+            key, loader = self._source(region)
+        except KeyError:
+            return model
+        slug = region_slug(region)
+        cached = self._extended.get(slug)
+        if cached is not None and cached[0] == key and cached[1] is model:
+            return cached[2]
+        extended = catch_up(model, *loader())
+        self._extended[slug] = (key, model, extended)
+        return extended
@@ -0,0 +1,75 @@
+"""
+Fourier exogenous regressors for long seasonal cycles.
+
+A seasonal SARIMAX with s=168 (weekly) is far too slow to fit on hourly data,
+so the weekly and annual cycles are instead modelled as sin/cos regressors on
+absolute time. Columns are named <cycle>_<sin|cos><k> (e.g. weekly_sin1), so
+the exog a trained model needs at forecast time can be regenerated from its
+exog_names alone - no extra metadata travels with the artifact.
+"""
+import re
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+# Cycle lengths in hours
+PERIODS: Dict[str, float] = {'weekly': 168.0, 'annual': 365.25 * 24}
+COLUMN_PATTERN = re.compile(r'^(?P<cycle>[a-z]+)_(?P<fn>sin|cos)(?P<k>\d+)$')
+
+
+def fourier_names(weekly_order: int = 3, annual_order: int = 2) -> List[str]:
+    """Column names for the given number of harmonics per cycle."""
+    names = []
+    for cycle, order in (('weekly', weekly_order), ('annual', annual_order)):
+        for k in range(1, order + 1):
+            names += [f'{cycle}_sin{k}', f'{cycle}_cos{k}']
+    return names
+
+
+def fourier_terms(ds, names: Sequence[str]) -> pd.DataFrame:
+    """
+    Fourier columns for timestamps ds, in the order of names.
+
+    Args:
+        ds: datetime-like array or DatetimeIndex
+        names: column names as produced by fourier_names (or a model's exog_names)
+
+    Returns:
+        pd.DataFrame: one column per name, indexed by ds
+    """
+    index = pd.DatetimeIndex(ds)
+    hours = index.values.astype('datetime64[h]').astype(np.int64).astype(float)
+    columns = {}
+    for name in names:
+        match = COLUMN_PATTERN.match(name)
+        if match is None or match['cycle'] not in PERIODS:
+            raise ValueError(f'Not a Fourier column: {name!r}')
+        angle = 2 * np.pi * int(match['k']) * hours / PERIODS[match['cycle']]
+        columns[name] = np.sin(angle) if match['fn'] == 'sin' else np.cos(angle)
+    return pd.DataFrame(columns, index=index)
+
+
+def model_exog_names(results) -> List[str]:
+    """Exogenous column names a fitted SARIMAX expects (empty for a pure SARIMAX)."""
+    return list(getattr(getattr(results, 'model', None), 'exog_names', None) or [])
+
+
+def forecast_exog(results, steps: int) -> Optional[pd.DataFrame]:
+    """
+    Exog for the steps hours after the end of a fitted model's sample, or None
+    when the model was trained without exogenous regressors.
+    """
+    names = model_exog_names(results)
+    if not names:
+        return None
+    dates = getattr(results.data, 'dates', None)
+    if dates is None or len(dates) == 0:
+        raise ValueError('Model has no time index to extend Fourier terms from')
+    future = pd.date_range(start=dates[-1], periods=steps + 1, freq='h')[1:]
+    return fourier_terms(future, names)
+
+
+def forecast_mean(results, steps: int) -> pd.Series:
+    """results.get_forecast(steps).predicted_mean, supplying Fourier exog when the model uses it."""
+    return results.get_forecast(steps=steps, exog=forecast_exog(results, steps)).predicted_mean
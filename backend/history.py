@@ -0,0 +1,102 @@
+"""
+Time-range queries over the carbon-intensity history written by
+ml_models/carbon_history_backfill.py.
+
+The table is memory-mapped once per published version. Range lookups are a
+binary search (np.searchsorted) on the sorted timestamp column, and coarser
+resolutions are aggregated with np.*.reduceat over bucket boundaries.
+"""
+import threading
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from backend.columnar import ColumnTable, current_version, open_table
+from backend.registry import region_slug
+
+ROOT = Path(__file__).parent.parent
+HISTORY_DIR = ROOT / 'outputs' / 'carbon_history'
+RESOLUTIONS = ('hour', 'day', 'week', 'month')
+
+_tables: Dict[str, ColumnTable] = {}
+_tables_lock = threading.Lock()
+
+
+def get_history_table(region: Optional[str] = None, history_dir: Path = HISTORY_DIR) -> ColumnTable:
+    """Return the published history table for region, reopening it only when a new version lands."""
+    table_dir = Path(history_dir) / region_slug(region)
+    version = current_version(table_dir)
+    if version is None:
+        raise FileNotFoundError(table_dir)
+    key = str(table_dir)
+    table = _tables.get(key)
+    if table is None or table.version != version:
+        with _tables_lock:
+            table = _tables.get(key)
+            if table is None or table.version != version:
+                table = open_table(table_dir, version)
+                _tables[key] = table
+    return table
+
+
+def time_slice(ds: np.ndarray, start: Optional[np.datetime64], end: Optional[np.datetime64]) -> Tuple[int, int]:
+    """Index range [lo, hi) of timestamps within [start, end] via binary search."""
+    lo = 0 if start is None else int(np.searchsorted(ds, start, side='left'))
+    hi = len(ds) if end is None else int(np.searchsorted(ds, end, side='right'))
+    return lo, max(lo, hi)
+
+
+def bucket_keys(ds: np.ndarray, resolution: str) -> np.ndarray:
+    """Integer bucket id per timestamp; equal ids are contiguous because ds is sorted."""
+    if resolution == 'hour':
+        return ds.astype('datetime64[h]').astype(np.int64)
+    if resolution == 'day':
+        return ds.astype('datetime64[D]').astype(np.int64)
+    if resolution == 'week':
+        # Weeks start on Monday; 1970-01-01 was a Thursday
+        return (ds.astype('datetime64[D]').astype(np.int64) + 3) // 7
+    if resolution == 'month':
+        return ds.astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f'Unknown resolution {resolution!r}; expected one of {RESOLUTIONS}')
+
+
+def aggregate(columns: Dict[str, np.ndarray], resolution: str) -> Dict[str, np.ndarray]:
+    """Aggregate hourly history columns into buckets of the given resolution."""
+    ds = columns['ds']
+    if len(ds) == 0:
+        return {'start': ds[:0], 'hours': np.zeros(0, dtype=np.int64)}
+    keys = bucket_keys(ds, resolution)
+    starts = np.concatenate(([0], np.flatnonzero(np.diff(keys)) + 1))
+    hours = np.diff(np.append(starts, len(ds)))
+
+    intensity = np.asarray(columns['carbon_intensity'], dtype=float)
+    valid = ~np.isnan(intensity)
+    ci_sum = np.add.reduceat(np.where(valid, intensity, 0.0), starts)
+    ci_count = np.add.reduceat(valid.astype(np.int64), starts)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        avg_ci = ci_sum / ci_count
+
+    return {
+        'start': ds[starts],
+        'hours': hours,
+        'avg_load_mw': np.add.reduceat(columns['load_mw'], starts) / hours,
+        'avg_renewable_mw': np.add.reduceat(columns['renewable_mw'], starts) / hours,
+        'avg_fossil_mw': np.add.reduceat(columns['fossil_mw'], starts) / hours,
+        'avg_carbon_intensity': avg_ci,
+        'min_carbon_intensity': np.fmin.reduceat(intensity, starts),
+        'max_carbon_intensity': np.fmax.reduceat(intensity, starts),
+        'green_hours': np.add.reduceat(columns['green'].astype(np.int64), starts),
+    }
+
+
+def query_history(table: ColumnTable, start: Optional[np.datetime64] = None,
+                  end: Optional[np.datetime64] = None, resolution: str = 'hour') -> Dict[str, np.ndarray]:
+    """Columns for [start, end] at the requested resolution."""
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f'Unknown resolution {resolution!r}; expected one of {RESOLUTIONS}')
+    lo, hi = time_slice(table['ds'], start, end)
+    window = {name: values[lo:hi] for name, values in table.columns.items()}
+    if resolution == 'hour':
+        return window
+    return aggregate(window, resolution)
@@ -0,0 +1,292 @@
+"""
+Background jobs for expensive computations.
+
+Submitting a job returns its id at once; a bounded thread pool runs at most
+JOB_WORKERS computations at a time per process and up to JOB_MAX_QUEUED more
+wait their turn. Jobs are keyed by kind and parameters: submitting the same
+parameters while an identical job is queued or running - or finished
+successfully less than JOB_DEDUPE_S seconds ago - returns that job instead of
+starting another.
+
+Job records are JSON files in the jobs directory, replaced atomically on every
+update, so with several worker processes any of them can report a job's
+progress and identical submissions are deduplicated across processes.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: deduplication is per process only
+    fcntl = None
+
+ROOT = Path(__file__).parent.parent
+JOBS_DIR = Path(os.environ.get('AURA_JOBS_DIR', ROOT / 'outputs' / 'jobs'))
+# Each green-window computation loads the full SARIMAX model, so run one at a time
+JOB_WORKERS = int(os.environ.get('AURA_JOB_WORKERS', 1))
+JOB_MAX_QUEUED = int(os.environ.get('AURA_JOB_MAX_QUEUED', 8))
+JOB_DEDUPE_S = float(os.environ.get('AURA_JOB_DEDUPE_S', 60))
+JOB_RETAIN_S = float(os.environ.get('AURA_JOB_RETAIN_S', 24 * 3600))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+ACTIVE = (QUEUED, RUNNING)
+
+JOB_ID_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class JobQueueFull(RuntimeError):
+    """Raised when a process already has JOB_MAX_QUEUED jobs waiting."""
+
+
+def job_key(kind: str, params: Dict) -> str:
+    """Identity of a computation: identical kind and parameters share a key."""
+    payload = json.dumps({'kind': kind, 'params': params}, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode()).hexdigest()
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobQueue:
+    """
+    Deduplicating job queue for one kind of computation.
+
+    run(params, progress) performs the computation and returns a JSON-serialisable
+    result; it may call progress(fraction, stage) as it goes. Exceptions mark the
+    job failed with their message. A finished job is only reused while
+    still_valid(result) holds, e.g. while its output is still the published one.
+    """
+
+    def __init__(self, kind: str, run: Callable[[Dict, Callable[[float, str], None]], Dict],
+                 jobs_dir: Path = JOBS_DIR, workers: int = JOB_WORKERS, max_queued: int = JOB_MAX_QUEUED,
+                 dedupe_s: float = JOB_DEDUPE_S, retain_s: float = JOB_RETAIN_S,
+                 still_valid: Optional[Callable[[Dict], bool]] = None):
+        self.kind = kind
+        self.run = run
+        self.still_valid = still_valid
+        self.jobs_dir = Path(jobs_dir)
+        self.workers = workers
+        self.max_queued = max_queued
+        self.dedupe_s = dedupe_s
+        self.retain_s = retain_s
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'job-{kind}')
+        self._futures: Dict[str, Future] = {}
+        self._queued = 0
+        self._running = 0
+        self._lock = threading.RLock()
+        self._lock_depth = 0
+        self._count_lock = threading.Lock()
+
+    @contextmanager
+    def _locked(self):
+        """
+        Serialise submissions and record updates within the process and, where
+        flock exists, across processes. Re-entrant within a thread: a submission
+        may update the record of a job it finds abandoned.
+        """
+        with self._lock:
+            self._lock_depth += 1
+            try:
+                if fcntl is None or self._lock_depth > 1:
+                    yield
+                    return
+                self.jobs_dir.mkdir(parents=True, exist_ok=True)
+                with open(self.jobs_dir / '.lock', 'a') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                    try:
+                        yield
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+            finally:
+                self._lock_depth -= 1
+
+    def _path(self, job_id: str) -> Path:
+        return self.jobs_dir / f'{job_id}.json'
+
+    def _key_path(self, key: str) -> Path:
+        return self.jobs_dir / 'keys' / key
+
+    def _write(self, job: Dict):
+        path = self._path(job['job_id'])
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f'.{path.name}.{os.getpid()}.{threading.get_ident()}')
+        with open(tmp, 'w') as f:
+            json.dump(job, f)
+        os.replace(tmp, path)
+
+    def _update(self, job_id: str, **changes) -> Optional[Dict]:
+        """Apply changes to a job's record; a record that has disappeared (e.g. pruned) is left alone."""
+        with self._locked():
+            job = self._read(job_id)
+            if job is None:
+                return None
+            job.update(changes)
+            self._write(job)
+            return job
+
+    def _read(self, job_id: str) -> Optional[Dict]:
+        try:
+            with open(self._path(job_id)) as f:
+                return json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """The job's current record, or None if the id is unknown (or malformed)."""
+        if not JOB_ID_PATTERN.match(job_id or ''):
+            return None
+        job = self._read(job_id)
+        if job is not None and job['status'] in ACTIVE and not _pid_alive(job['owner_pid']):
+            # The process running it exited before finishing
+            job = self._update(job_id, status=FAILED, finished_at=time.time(),
+                               error='Worker process exited before the job finished')
+        return job
+
+    def _reusable(self, job: Optional[Dict]) -> bool:
+        if job is None:
+            return False
+        if job['status'] in ACTIVE:
+            return True
+        if job['status'] != SUCCEEDED or time.time() - job['finished_at'] >= self.dedupe_s:
+            return False
+        return self.still_valid is None or self.still_valid(job['result'])
+
+    def submit(self, params: Dict) -> Tuple[Dict, bool]:
+        """
+        Queue a computation, or find an identical queued, running or recent one.
+
+        Returns:
+            (job record, True if a new job was created)
+
+        Raises:
+            JobQueueFull: too many jobs already waiting in this process
+        """
+        key = job_key(self.kind, params)
+        with self._locked():
+            try:
+                existing = self.get(self._key_path(key).read_text().strip())
+            except FileNotFoundError:
+                existing = None
+            if self._reusable(existing):
+                return existing, False
+
+            with self._count_lock:
+                if self._queued >= self.max_queued:
+                    raise JobQueueFull(f'{self._queued} {self.kind} jobs already queued')
+                self._queued += 1
+
+            self._prune()
+            job = {
+                'job_id': os.urandom(16).hex(),
+                'kind': self.kind,
+                'params': params,
+                'status': QUEUED,
+                'progress': 0.0,
+                'stage': QUEUED,
+                'created_at': time.time(),
+                'started_at': None,
+                'finished_at': None,
+                'error': None,
+                'result': None,
+                'owner_pid': os.getpid(),
+            }
+            self._write(job)
+            key_path = self._key_path(key)
+            key_path.parent.mkdir(parents=True, exist_ok=True)
+            key_path.write_text(job['job_id'])
+
+        future = self._pool.submit(self._execute, job['job_id'])
+        self._futures[job['job_id']] = future
+        future.add_done_callback(lambda _, job_id=job['job_id']: self._futures.pop(job_id, None))
+        return job, True
+
+    def _execute(self, job_id: str) -> Optional[Dict]:
+        job = self._update(job_id, status=RUNNING, stage=RUNNING, started_at=time.time())
+        with self._count_lock:
+            self._queued -= 1
+            if job is None:
+                return None
+            self._running += 1
+
+        record_lost = False
+
+        def progress(fraction: float, stage: str):
+            nonlocal record_lost
+            if record_lost:
+                return
+            if self._update(job_id, progress=round(float(fraction), 3), stage=stage) is None:
+                # Pruned while running: stop reporting progress for it
+                record_lost = True
+                print(f'Warning: {self.kind} job {job_id} has no record; progress no longer reported')
+
+        try:
+            result = self.run(job['params'], progress)
+        except Exception as e:
+            job = self._update(job_id, status=FAILED, stage=FAILED, finished_at=time.time(), error=str(e))
+        else:
+            job = self._update(job_id, status=SUCCEEDED, stage=SUCCEEDED, progress=1.0,
+                               finished_at=time.time(), result=result)
+        finally:
+            with self._count_lock:
+                self._running -= 1
+        return job
+
+    async def wait(self, job_id: str, poll_s: float = 0.5) -> Dict:
+        """Wait for a job to finish and return its final record."""
+        future = self._futures.get(job_id)
+        if future is not None:
+            try:
+                return await asyncio.wrap_future(future)
+            except Exception:
+                pass
+        # Owned by another process (or already finished): follow its record
+        while True:
+            job = self.get(job_id)
+            if job is None or job['status'] not in ACTIVE:
+                return job
+            await asyncio.sleep(poll_s)
+
+    def _prune(self):
+        """Drop finished job records older than retain_s, and keys pointing at them."""
+        cutoff = time.time() - self.retain_s
+        for path in self.jobs_dir.glob('*.json'):
+            try:
+                if path.stat().st_mtime < cutoff:
+                    job = json.loads(path.read_text())
+                    if job['status'] not in ACTIVE:
+                        path.unlink()
+            except (OSError, ValueError, KeyError):
+                continue
+        for key_path in self.jobs_dir.glob('keys/*'):
+            try:
+                if not self._path(key_path.read_text().strip()).exists():
+                    key_path.unlink()
+            except OSError:
+                continue
+
+    def status(self) -> Dict:
+        return {
+            'kind': self.kind,
+            'workers': self.workers,
+            'queued': self._queued,
+            'running': self._running,
+        }
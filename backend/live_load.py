@@ -0,0 +1,243 @@
+"""
+Live hourly load readings on top of the static load CSV.
+
+Ingested readings are appended to an append-only binary log
+(<live dir>/readings.bin, fixed-size records of hour-since-epoch and MW), so
+an ingest never rewrites earlier data. LiveLoadSeries parses the CSV once and
+then folds in only the log records it has not seen yet, tracked by byte
+offset, so every worker process catches up with readings ingested by any of
+them at the cost of the new records alone.
+
+The series stays a contiguous hourly grid. A reading for an hour that is
+already observed is a duplicate and ignored (first reading wins, as for the
+CSV). Hours skipped between readings are filled by linear interpolation and
+replaced once their own reading arrives.
+"""
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:  # Windows: appends from one process at a time
+    fcntl = None
+
+ROOT = Path(__file__).parent.parent
+LIVE_DIR = Path(os.environ.get('AURA_LIVE_LOAD_DIR', ROOT / 'outputs' / 'live_load'))
+LOG_NAME = 'readings.bin'
+RECORD_DTYPE = np.dtype([('hour', '<i8'), ('load_mw', '<f8')])
+# Longest run of missing hours a batch may open up after the end of the series
+MAX_GAP_HOURS = int(os.environ.get('AURA_LIVE_MAX_GAP_HOURS', 24 * 31))
+# Backwards search step when looking for the last observed hour before a change
+_SCAN_BLOCK = 256
+
+
+def to_hours(ds) -> np.ndarray:
+    """Hours since the epoch for datetime-like values."""
+    return np.asarray(ds, dtype='datetime64[ns]').astype('datetime64[h]').astype(np.int64)
+
+
+def append_readings(hours: np.ndarray, loads: np.ndarray, root: Path = LIVE_DIR) -> int:
+    """Append readings to the log (durably) and return its new size in bytes."""
+    records = np.empty(len(hours), dtype=RECORD_DTYPE)
+    records['hour'] = hours
+    records['load_mw'] = loads
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    with open(root / LOG_NAME, 'ab') as f:
+        if fcntl is not None:
+            fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(records.tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+            return f.tell()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def read_readings(offset: int = 0, root: Path = LIVE_DIR) -> Tuple[np.ndarray, int]:
+    """
+    Log records after byte offset, and the offset to continue from. A record
+    still being written (partial trailing bytes) is left for the next read.
+    """
+    path = Path(root) / LOG_NAME
+    try:
+        size = path.stat().st_size
+    except FileNotFoundError:
+        return np.empty(0, dtype=RECORD_DTYPE), 0
+    end = size - (size - offset) % RECORD_DTYPE.itemsize
+    if end <= offset:
+        return np.empty(0, dtype=RECORD_DTYPE), offset
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        data = f.read(end - offset)
+    return np.frombuffer(data, dtype=RECORD_DTYPE), end
+
+
+class LiveLoadSeries:
+    """The hourly load series: the CSV parsed once plus the readings log, applied incrementally."""
+
+    def __init__(self, load_base: Callable[[], pd.DataFrame], base_path: Path, root: Path = LIVE_DIR):
+        self.load_base = load_base
+        self.base_path = Path(base_path)
+        self.root = Path(root)
+        self._lock = threading.Lock()
+        self._base_mtime: Optional[int] = None
+        self._offset = 0
+        self._start = 0
+        self._n = 0
+        self._y = np.empty(0)
+        self._observed = np.empty(0, dtype=bool)
+
+    def _load_base(self, mtime: int):
+        df = self.load_base()
+        hours = to_hours(df.index.values)
+        self._start = int(hours[0])
+        self._n = 0
+        self._y = np.empty(0)
+        self._observed = np.empty(0, dtype=bool)
+        self._grow(len(df))
+        self._y[:len(df)] = df['y'].to_numpy(dtype=float)
+        self._observed[:len(df)] = True
+        self._n = len(df)
+        self._base_mtime = mtime
+        self._offset = 0
+
+    def _grow(self, n: int):
+        """Make room for n hours, doubling capacity so appends are amortised O(1)."""
+        if n <= len(self._y):
+            return
+        capacity = max(n, 2 * len(self._y))
+        y = np.empty(capacity)
+        observed = np.zeros(capacity, dtype=bool)
+        y[:self._n] = self._y[:self._n]
+        observed[:self._n] = self._observed[:self._n]
+        self._y, self._observed = y, observed
+
+    def _last_observed_before(self, position: int) -> int:
+        """Index of the last observed hour before position (-1 if none), scanning back in blocks."""
+        hi = position
+        while hi > 0:
+            lo = max(0, hi - _SCAN_BLOCK)
+            found = np.flatnonzero(self._observed[lo:hi])
+            if len(found):
+                return lo + int(found[-1])
+            hi = lo
+        return -1
+
+    def _apply(self, hours: np.ndarray, loads: np.ndarray) -> Dict[str, Optional[int]]:
+        """
+        Fold readings into the series. changed_from in the stats is the first
+        hour (since the epoch) whose value changed, including interpolated
+        hours re-interpolated around the new readings; None when none did.
+        """
+        stats = {'accepted': 0, 'duplicates': 0, 'before_start': 0, 'interpolated_hours': 0, 'changed_from': None}
+        if len(hours) == 0:
+            return stats
+        # Sorted, first reading per hour wins
+        batch = len(hours)
+        hours, first = np.unique(hours, return_index=True)
+        loads = loads[first]
+        positions = hours - self._start
+        before = positions < 0
+        stats['before_start'] = int(before.sum())
+        positions, loads = positions[~before], loads[~before]
+
+        known = np.zeros(len(positions), dtype=bool)
+        inside = positions < self._n
+        known[inside] = self._observed[positions[inside]]
+        stats['duplicates'] = int(batch - len(hours) + known.sum())
+        positions, loads = positions[~known], loads[~known]
+        if len(positions) == 0:
+            return stats
+
+        n = max(self._n, int(positions[-1]) + 1)
+        self._grow(n)
+        self._observed[self._n:n] = False
+        self._y[positions] = loads
+        self._observed[positions] = True
+        self._n = n
+        stats['accepted'] = len(positions)
+
+        # Re-interpolate unobserved hours from the last observed hour before the change
+        lo = max(0, self._last_observed_before(int(positions[0])))
+        stats['changed_from'] = self._start + min(int(positions[0]), lo + 1)
+        observed = self._observed[lo:n]
+        gaps = np.flatnonzero(~observed)
+        if len(gaps):
+            points = np.flatnonzero(observed)
+            self._y[lo + gaps] = np.interp(gaps, points, self._y[lo:n][points])
+        stats['interpolated_hours'] = int(len(gaps))
+        return stats
+
+    def refresh(self) -> Dict[str, Optional[int]]:
+        """Fold in log records not seen yet (reloading everything only if the CSV changed)."""
+        with self._lock:
+            mtime = self.base_path.stat().st_mtime_ns
+            if mtime != self._base_mtime:
+                self._load_base(mtime)
+            records, self._offset = read_readings(self._offset, self.root)
+            return self._apply(records['hour'].astype(np.int64), records['load_mw'].astype(float))
+
+    def reload(self):
+        """Drop the in-memory series; the next access re-reads the CSV and the whole log."""
+        with self._lock:
+            self._base_mtime = None
+
+    def version(self) -> str:
+        """Changes whenever the series does; identical in every process that has caught up."""
+        self.refresh()
+        return f'{self._base_mtime}:{self._offset}'
+
+    def start(self) -> np.datetime64:
+        self.refresh()
+        return np.datetime64(self._start, 'h')
+
+    def end(self) -> np.datetime64:
+        """Last hour of the series (observed or interpolated)."""
+        self.refresh()
+        return np.datetime64(self._start + self._n - 1, 'h')
+
+    def observed(self, hours: np.ndarray) -> np.ndarray:
+        """Whether each hour (since the epoch) already has a reading."""
+        self.refresh()
+        positions = np.asarray(hours, dtype=np.int64) - self._start
+        result = np.zeros(len(positions), dtype=bool)
+        inside = (positions >= 0) & (positions < self._n)
+        result[inside] = self._observed[positions[inside]]
+        return result
+
+    def changed_from(self, hours: np.ndarray) -> int:
+        """
+        First hour (since the epoch) whose value depends on readings for hours,
+        whichever thread folded them in; the interpolated hours before the
+        earliest of them are included.
+        """
+        self.refresh()
+        with self._lock:
+            position = max(0, int(np.min(hours)) - self._start)
+            lo = max(0, self._last_observed_before(position))
+            return self._start + min(position, lo + 1)
+
+    def arrays(self) -> Tuple[np.ndarray, np.ndarray]:
+        """(ds, y) of the current series; y is a snapshot copy."""
+        self.refresh()
+        with self._lock:
+            ds = (np.datetime64(self._start, 'h') + np.arange(self._n)).astype('datetime64[ns]')
+            return ds, self._y[:self._n].copy()
+
+    def frame(self) -> pd.DataFrame:
+        """The series in the shape of load_load_series(): column y on an hourly DatetimeIndex."""
+        ds, y = self.arrays()
+        return pd.DataFrame({'y': y}, index=pd.DatetimeIndex(ds, name='ds', freq='h'))
+
+
+def with_live_readings(df: pd.DataFrame, base_path: Path, root: Path = LIVE_DIR) -> pd.DataFrame:
+    """A parsed load series with the ingested readings folded in (for offline scripts)."""
+    return LiveLoadSeries(lambda: df, base_path, root).frame()
@@ -0,0 +1,282 @@
+"""
+HTTP load generator for the backend API.
+
+Virtual users (--concurrency of them, on one asyncio event loop with httpx)
+repeatedly run scripted sessions that replay the frontend's request
+patterns: the dashboard's page load, a chatbot optimization and an analytics
+view. A mix weights the scripts. Requests a page sends together are sent
+concurrently, as the frontend does. After --duration seconds every route
+gets its throughput, latency percentiles, error rate and status codes,
+printed as a table and optionally written as JSON.
+
+The client shares the machine with the server; on a small host, pin them to
+different cores or lower --concurrency so the client is not the bottleneck.
+Admission control (backend/admission.py) rejects a single client's bursts
+with 429, counted as rejected; --no-admission lifts the limits of a server
+started with --start-server to measure the raw ceiling.
+
+Usage (from the project root):
+    python -m backend.loadtest --start-server --mix mixed --concurrency 32 --duration 30 --output load.json
+    python -m backend.loadtest --url http://127.0.0.1:8000 --mix chatbot --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import numpy as np
+
+from backend.admission import ROUTE_LIMITS
+from backend.appliances import APPLIANCE_CONSUMPTION
+
+ROOT = Path(__file__).parent.parent
+DEFAULT_URL = 'http://127.0.0.1:8000'
+REJECTED = (429, 503)
+PERCENTILES = (50, 90, 99)
+
+
+def request(method: str, path: str, params: Optional[Dict] = None, json_body: Optional[Dict] = None) -> Dict:
+    return {'method': method, 'path': path, 'params': params, 'json': json_body}
+
+
+def dashboard_session(rng: random.Random) -> List[List[Dict]]:
+    """Dashboard page load: forecast and demand together, then the carbon timeline's baseline."""
+    return [
+        [request('GET', '/api/forecast-24h'), request('GET', '/api/predict-demand')],
+        [request('GET', '/api/seasonal-baseline')],
+    ]
+
+
+def chatbot_session(rng: random.Random) -> List[List[Dict]]:
+    """A parsed chatbot request turned into an optimization, sometimes followed by a schedule."""
+    appliances = rng.sample(sorted(APPLIANCE_CONSUMPTION), rng.randint(1, 3))
+    stages = [[request('POST', '/api/optimize-windows', json_body={
+        'start_time': '00:00',
+        'end_time': rng.choice(['06:00', '23:59']),
+        'number_of_windows': len(appliances),
+        'appliances': appliances,
+    })]]
+    if rng.random() < 0.3:
+        start = rng.randint(0, 20)
+        stages.append([request('POST', '/api/schedule-appliances', json_body={
+            'schedule': [{
+                'appliance': name,
+                'window_start': f'{start:02d}:00',
+                'window_end': f'{start + 2:02d}:00',
+                'duration_minutes': 60,
+            } for name in appliances],
+            'user_preferences': {'allow_overnight': True, 'max_carbon_intensity': 500.0},
+        })])
+    return stages
+
+
+def analytics_session(rng: random.Random) -> List[List[Dict]]:
+    """Analytics view: a week of hourly history and the daily rollups."""
+    start = np.datetime64('2024-01-01') + np.timedelta64(rng.randint(0, 358), 'D')
+    end = start + np.timedelta64(7, 'D')
+    return [[
+        request('GET', '/api/history', params={'start': str(start), 'end': str(end), 'resolution': 'hour'}),
+        request('GET', '/api/analytics/rollups', params={'granularity': 'day'}),
+    ]]
+
+
+SCRIPTS: Dict[str, Callable[[random.Random], List[List[Dict]]]] = {
+    'dashboard': dashboard_session,
+    'chatbot': chatbot_session,
+    'analytics': analytics_session,
+}
+MIXES = {
+    'dashboard': {'dashboard': 1.0},
+    'chatbot': {'chatbot': 1.0},
+    'analytics': {'analytics': 1.0},
+    'mixed': {'dashboard': 0.6, 'chatbot': 0.3, 'analytics': 0.1},
+}
+
+
+class RouteStats:
+    """Latencies and status codes of one route."""
+
+    __slots__ = ('latencies', 'statuses')
+
+    def __init__(self):
+        self.latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+
+    def record(self, latency_s: float, status):
+        self.latencies.append(latency_s)
+        self.statuses[str(status)] = self.statuses.get(str(status), 0) + 1
+
+    def merge(self, other: 'RouteStats'):
+        self.latencies.extend(other.latencies)
+        for status, count in other.statuses.items():
+            self.statuses[status] = self.statuses.get(status, 0) + count
+
+    def summary(self, elapsed_s: float) -> Dict:
+        n = len(self.latencies)
+        ok = sum(count for status, count in self.statuses.items() if status.isdigit() and int(status) < 400)
+        rejected = sum(self.statuses.get(str(code), 0) for code in REJECTED)
+        latencies_ms = np.asarray(self.latencies) * 1000
+        result = {
+            'requests': n,
+            'throughput_rps': round(n / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+            'ok': ok,
+            'rejected': rejected,
+            'errors': n - ok - rejected,
+            'error_rate': round((n - ok) / n, 4) if n else 0.0,
+            'latency_ms_mean': round(float(latencies_ms.mean()), 2) if n else None,
+        }
+        for p in PERCENTILES:
+            result[f'latency_ms_p{p}'] = round(float(np.percentile(latencies_ms, p)), 2) if n else None
+        result['latency_ms_max'] = round(float(latencies_ms.max()), 2) if n else None
+        result['statuses'] = dict(sorted(self.statuses.items()))
+        return result
+
+
+async def send(client: httpx.AsyncClient, req: Dict, stats: Dict[str, RouteStats]):
+    """Send one request and record its latency and status (or exception name) under its route."""
+    route = f"{req['method']} {req['path']}"
+    start = time.perf_counter()
+    try:
+        response = await client.request(req['method'], req['path'], params=req['params'], json=req['json'])
+        status = response.status_code
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    stats.setdefault(route, RouteStats()).record(time.perf_counter() - start, status)
+
+
+async def virtual_user(client: httpx.AsyncClient, rng: random.Random, mix: Dict[str, float], deadline: float,
+                       stats: Dict[str, RouteStats], think_s: float = 0.0):
+    """Run sessions drawn from the mix until the deadline."""
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        for stage in SCRIPTS[rng.choices(names, weights)[0]](rng):
+            await asyncio.gather(*(send(client, req, stats) for req in stage))
+        if think_s:
+            await asyncio.sleep(rng.expovariate(1.0 / think_s))
+
+
+async def run_load(url: str = DEFAULT_URL, mix: str = 'mixed', concurrency: int = 16, duration_s: float = 30.0,
+                   think_s: float = 0.0, warmup: bool = True, seed: int = 0, timeout_s: float = 60.0,
+                   transport: Optional[httpx.AsyncBaseTransport] = None) -> Dict:
+    """
+    Run the load test and return the report: the configuration, the elapsed
+    time and per-route (plus overall) summaries.
+    """
+    weights = MIXES[mix]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, transport=transport, limits=limits, timeout=timeout_s) as client:
+        if warmup:
+            # One pass of every script in the mix, not measured: first calls load models and tables
+            rng = random.Random(seed)
+            for name in weights:
+                for stage in SCRIPTS[name](rng):
+                    await asyncio.gather(*(send(client, req, {}) for req in stage))
+
+        stats_per_user = [{} for _ in range(concurrency)]
+        start = time.perf_counter()
+        deadline = start + duration_s
+        await asyncio.gather(*(
+            virtual_user(client, random.Random(seed * 100_003 + i), weights, deadline, stats_per_user[i], think_s)
+            for i in range(concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+
+    routes: Dict[str, RouteStats] = {}
+    total = RouteStats()
+    for stats in stats_per_user:
+        for route, route_stats in stats.items():
+            routes.setdefault(route, RouteStats()).merge(route_stats)
+            total.merge(route_stats)
+    return {
+        'config': {'url': url, 'mix': mix, 'concurrency': concurrency, 'duration_s': duration_s,
+                   'think_s': think_s, 'seed': seed},
+        'elapsed_s': round(elapsed, 3),
+        'routes': {route: routes[route].summary(elapsed) for route in sorted(routes)},
+        'total': total.summary(elapsed),
+    }
+
+
+def format_table(report: Dict) -> str:
+    columns = ['route', 'requests', 'throughput_rps', 'error_rate', 'rejected', 'errors',
+               'latency_ms_p50', 'latency_ms_p90', 'latency_ms_p99', 'latency_ms_max']
+    rows = [{'route': route, **summary} for route, summary in report['routes'].items()]
+    rows.append({'route': 'ALL', **report['total']})
+    cells = [[str(row.get(c, '-')) for c in columns] for row in rows]
+    widths = [max(len(c), *(len(row[i]) for row in cells)) for i, c in enumerate(columns)]
+    lines = ['  '.join(c.ljust(w) for c, w in zip(columns, widths))]
+    lines.append('  '.join('-' * w for w in widths))
+    lines.extend('  '.join(v.ljust(w) for v, w in zip(row, widths)) for row in cells)
+    return '\n'.join(lines)
+
+
+def start_server(port: int, workers: int, admission: bool = True, timeout_s: float = 120.0) -> subprocess.Popen:
+    """Start uvicorn on localhost and wait until it answers."""
+    env = dict(os.environ)
+    if not admission:
+        env['AURA_ADMISSION_LIMITS'] = json.dumps({path: None for path in ROUTE_LIMITS})
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'backend.main:app', '--host', '127.0.0.1', '--port', str(port),
+         '--workers', str(workers), '--log-level', 'warning'],
+        cwd=ROOT, env=env,
+    )
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f'server exited with code {server.returncode}')
+        try:
+            if httpx.get(f'http://127.0.0.1:{port}/', timeout=1.0).status_code == 200:
+                return server
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f'server did not answer within {timeout_s:.0f}s')
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    ap.add_argument('--url', default=DEFAULT_URL, help='base URL of a running server')
+    ap.add_argument('--start-server', action='store_true', help='start a local uvicorn server for the run')
+    ap.add_argument('--port', type=int, default=8765, help='port of the server started with --start-server')
+    ap.add_argument('--server-workers', type=int, default=1, help='uvicorn workers with --start-server')
+    ap.add_argument('--no-admission', action='store_true', help='lift admission limits (with --start-server)')
+    ap.add_argument('--mix', choices=sorted(MIXES), default='mixed', help='weighting of the session scripts')
+    ap.add_argument('--concurrency', type=int, default=16, help='virtual users')
+    ap.add_argument('--duration', type=float, default=30.0, help='measured seconds')
+    ap.add_argument('--think-ms', type=float, default=0.0, help='mean pause between a user\'s sessions')
+    ap.add_argument('--no-warmup', action='store_true', help='measure the first requests too')
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--output', help='write the report as JSON to this path')
+    args = ap.parse_args(argv)
+
+    server = None
+    url = args.url
+    if args.start_server:
+        server = start_server(args.port, args.server_workers, admission=not args.no_admission)
+        url = f'http://127.0.0.1:{args.port}'
+    try:
+        print(f'{args.concurrency} users, {args.mix} mix, {args.duration:.0f}s against {url}', file=sys.stderr)
+        report = asyncio.run(run_load(url, args.mix, args.concurrency, args.duration, args.think_ms / 1000,
+                                      warmup=not args.no_warmup, seed=args.seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    print(format_table(report))
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print('Wrote', args.output)
+    return report
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,60 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from backend.models import (
-    OptimizeRequest, OptimizeResponse, TimeWindow,
+    OptimizeRequest, OptimizeBatchRequest, OptimizeResponse,
     AvailableTimeRangesResponse, TimeRange,
     ScheduleAppliancesRequest, ScheduleAppliancesResponse,
-    GreenWindowRequest, GreenWindow, GreenWindowsResponse, PredictDemandResponse
+    GreenWindowRequest, GreenWindowJobRequest, GreenWindowsResponse, PredictDemandResponse,
+    IngestLoadRequest, ScenarioRequest, ScenarioResponse
 )
+from backend.appliances import APPLIANCE_CONSUMPTION, appliance_profile, start_emissions, SLOTS_PER_HOUR
+from backend.seasonal import get_baseline_table, normalize_region, DEFAULT_REGION
+from backend.registry import model_registry, region_slug
+from backend.forecasters import TieredForecaster, TIER_SARIMAX
+from backend.forecast_state import SharedForecast
+from backend.dispatch import load_dispatch
+from backend.forecast_records import ForecastRecords, GREEN, WINDOW_TYPES, forecast_rows, window_types
+from backend.snapshot import ensure_snapshot, get_snapshot, read_snapshot, hourly_records, window_records, SNAPSHOT_DIR
+from backend.columnar import current_version
+from backend.jobs import JobQueue, JobQueueFull, SUCCEEDED
+from backend.admission import AdmissionController, AdmissionMiddleware, load_limits
+from backend.live_load import LiveLoadSeries, append_readings, to_hours, MAX_GAP_HOURS
+from backend.history import get_history_table, query_history, RESOLUTIONS, HISTORY_DIR
+from backend.rollups import get_rollups, bucket_start, GRANULARITIES, METRICS, ROLLUPS_DIR
+from ml_models.carbon_history_backfill import backfill
+from backend.scenarios import evaluate_scenarios, grid_size, scenario_grid, PARAMETERS, DEFAULTS as SCENARIO_DEFAULTS
 import json
 import os
 import time
 import pandas as pd
 import numpy as np
 from pathlib import Path
-import joblib
 import uuid
-from typing import List
+from typing import List, Optional
 import subprocess
+import threading
+from contextlib import asynccontextmanager
 
-app = FastAPI(title="AURA Energy Optimization API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Publish the committed classification as the first snapshot when none exists,
+    and start loading the default region's model so SARIMAX takes over from the
+    seasonal profile. Only the worker that produces the shared forecast loads it.
+    """
+    ensure_snapshot()
+    if shared_forecast.is_producer():
+        model_registry.preload(DEFAULT_REGION)
+    yield
+
+app = FastAPI(title="AURA Energy Optimization API", version="1.0.0", lifespan=lifespan)
+
+# Token buckets and concurrency caps for the expensive routes. Added before
+# CORS so that 429/503 responses still carry the CORS headers.
+admission = AdmissionController(
+    load_limits(), trust_forwarded=os.environ.get('AURA_ADMISSION_TRUST_FORWARDED') == '1'
+)
+app.add_middleware(AdmissionMiddleware, controller=admission)
 
 origins = [
     "http://localhost",
@@ -36,26 +73,16 @@ app.add_middleware(
 # Constants
 ROOT = Path(__file__).parent.parent
 DATA = ROOT / 'data' / 'hourly_load_data.csv'
-MODEL = ROOT / 'outputs' / 'aura_model.joblib'
-SEASONAL = ROOT / 'outputs' / 'seasonal_baseline.json'
-
-# Appliance energy consumption (kWh per hour) - approximate values
-APPLIANCE_CONSUMPTION = {
-    "washer": 0.5,
-    "dryer": 3.0,
-    "dishwasher": 1.8,
-    "ev_charger": 7.2,
-    "oven": 2.3,
-    "microwave": 1.2,
-    "refrigerator": 0.1,
-    "ac": 1.5,
-    "heater": 1.5,
-    "water_heater": 4.0
-}
+MAX_HISTORY_POINTS = 50_000
 
 def time_to_minutes(time_str: str) -> int:
-    """Convert HH:MM to minutes since midnight"""
-    hours, minutes = map(int, time_str.split(':'))
+    """Convert HH:MM to minutes since midnight; ValueError unless 00:00 <= time <= 23:59"""
+    try:
+        hours, minutes = (int(part) for part in time_str.split(':'))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid time {time_str!r}: expected HH:MM") from None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Invalid time {time_str!r}: expected HH:MM between 00:00 and 23:59")
     return hours * 60 + minutes
 
 def minutes_to_time(minutes: int) -> str:
@@ -65,7 +92,7 @@ def minutes_to_time(minutes: int) -> str:
     return f"{hours:02d}:{mins:02d}"
 
 def load_load_series():
-    """Load and preprocess load data"""
+    """Load and preprocess load data (the CSV alone; live_load adds ingested readings)"""
     if not DATA.exists():
         raise FileNotFoundError(DATA)
     # Simplified version - assuming standard format
@@ -87,57 +114,49 @@ def load_load_series():
     df['y'] = df['y'].fillna(df['y'].mean())
     return df
 
-def get_forecast_data():
-    """Get 24-hour forecast data"""
-    try:
-        # Load data
-        df = load_load_series()
-
-        # Load seasonal baseline
-        with open(SEASONAL, 'r') as f:
-            seasonal = json.load(f)
-
-        # Load model
-        results = joblib.load(MODEL)
-
-        # Forecast next 24 hours
-        steps = 24
-        forecast_res = results.get_forecast(steps=steps)
-        forecast_mean = forecast_res.predicted_mean
-
-        last_ts = df.index.max()
-        future_index = pd.date_range(start=last_ts + pd.Timedelta(hours=1), periods=steps, freq='h')
-        forecast_df = pd.DataFrame({'ds': future_index, 'Forecast_Load_MW': np.round(forecast_mean.values, 2)})
-
-        # Map seasonal baseline per month
-        def baseline_for_ts(ts):
-            m = ts.month
-            return float(seasonal.get(str(m)) or seasonal.get(m) or 0.0)
-
-        forecast_df['Renewable_Baseload_MW'] = forecast_df['ds'].map(baseline_for_ts).astype(float)
-        forecast_df['Fossil_Fuel_MW'] = forecast_df['Forecast_Load_MW'] - forecast_df['Renewable_Baseload_MW']
-        forecast_df['Fossil_Fuel_MW'] = forecast_df['Fossil_Fuel_MW'].clip(lower=0.0)
-
-        # Compute carbon intensity (gCO2/kWh)
-        def compute_ci(row):
-            load = row['Forecast_Load_MW']
-            if load <= 0:
-                return np.nan
-            fossil = row['Fossil_Fuel_MW']
-            return (fossil * 700.0) / load
+# The CSV parsed once plus readings ingested through /api/ingest/load
+live_load = LiveLoadSeries(load_load_series, DATA)
+forecaster = TieredForecaster(model_registry, live_load.frame, DATA, series_version=live_load.version)
+shared_forecast = SharedForecast(forecaster)
+# Merit order of the fossil units (AURA_DISPATCH_UNITS); None keeps one emission factor
+dispatch_model = load_dispatch()
 
-        forecast_df['Carbon_Intensity_gCO2_per_kWh'] = forecast_df.apply(compute_ci, axis=1)
-
-        # Add hour of day for filtering
-        forecast_df['hour'] = forecast_df['ds'].dt.hour
-        forecast_df['minute'] = forecast_df['ds'].dt.minute
-        forecast_df['time_minutes'] = forecast_df['hour'] * 60 + forecast_df['minute']
+def region_baselines(region: Optional[str] = None) -> np.ndarray:
+    """Monthly renewable baselines (index 0 = January) for a region"""
+    try:
+        return get_baseline_table().row(region)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Unknown region: {region}")
 
-        return forecast_df
+def get_forecast_records(region: Optional[str] = None, steps: int = 24) -> ForecastRecords:
+    """Get the forecast for the next steps hours as compact records"""
+    try:
+        # Seasonal baseline for the region, from the preloaded table
+        baselines = region_baselines(region)
+
+        # Published by the producer worker (SARIMAX once warm, seasonal profile
+        # until then) and read zero-copy by every worker
+        try:
+            forecast_mean, tier = shared_forecast.get(region, steps)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"No forecast model for region: {region or DEFAULT_REGION}")
+
+        if isinstance(forecast_mean.index, pd.DatetimeIndex):
+            # The model carries its own time index; forecasts start right after its data
+            ds = forecast_mean.index.values
+        else:
+            ds = live_load.end() + np.arange(1, steps + 1)
+        return ForecastRecords.from_forecast(ds, forecast_mean.to_numpy(), baselines, tier, dispatch_model)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to generate forecast: {str(e)}")
 
+def get_forecast_data(region: Optional[str] = None):
+    """Get 24-hour forecast data as a DataFrame (load, mix, intensity and time columns)"""
+    return get_forecast_records(region).frame()
+
 def calculate_energy_savings(carbon_intensity: float, appliances: List[str], duration_hours: float) -> float:
     """Calculate CO2 savings in kg for given appliances and duration"""
     total_kwh = sum(APPLIANCE_CONSUMPTION.get(app, 1.0) for app in appliances) * duration_hours
@@ -149,15 +168,24 @@ def calculate_renewable_percentage(row) -> float:
     renewable = row['Renewable_Baseload_MW']
     return (renewable / load * 100) if load > 0 else 0
 
+def forecast_cache_file(region: Optional[str] = None) -> Path:
+    """Per-region cache file for /api/predict-demand responses (separate for merit-order intensities)"""
+    key = normalize_region(region or DEFAULT_REGION)
+    suffix = '' if dispatch_model is None else '_merit_order'
+    if key == normalize_region(DEFAULT_REGION):
+        return Path(__file__).parent / f'.forecast_cache{suffix}.json'
+    slug = key.replace(' ', '_')
+    return Path(__file__).parent / f'.forecast_cache_{slug}{suffix}.json'
+
 @app.get("/api/predict-demand", response_model=PredictDemandResponse)
-async def predict_demand():
+async def predict_demand(region: Optional[str] = None):
     """
     Scenario 1: Predict next 24 hours demand with carbon intensity.
     Generates fresh forecast data and returns it.
     """
     try:
         # Check if we have cached forecast data that's less than 15 minutes old
-        cache_file = Path(__file__).parent / '.forecast_cache.json'
+        cache_file = forecast_cache_file(region)
         if cache_file.exists():
             cache_age = time.time() - cache_file.stat().st_mtime
             if cache_age < 900:  # 15 minutes in seconds
@@ -165,45 +193,50 @@ async def predict_demand():
                     return PredictDemandResponse(**json.load(f))
 
         # Generate fresh forecast data
-        forecast_df = get_forecast_data()
+        records = get_forecast_records(region)
 
-        # Get current month baseline
+        # Baseline of the first forecast hour's month; each hour is classified
+        # against its own month's baseline, as in the pipeline snapshot
         current_month = pd.Timestamp.now().month
-        seasonal = json.loads((ROOT / 'outputs' / 'seasonal_baseline.json').read_text())
-        baseline_value = float(seasonal.get(str(current_month)) or seasonal.get(current_month) or 0.0)
+        baseline_value = records.baseline_threshold()
 
         # Classify windows
-        forecast_df['window_type'] = forecast_df['Carbon_Intensity_gCO2_per_kWh'].apply(
-            lambda ci: 'green_window' if ci < baseline_value else 'dirty_window'
-        )
+        load, renewable = records.load(), records.renewable()
+        intensity = records.carbon_intensity()
+        classes = records.classes(intensity)
+        green_count = int(np.count_nonzero(classes == GREEN))
 
         # Prepare response data
-        hourly_data = []
-        for _, row in forecast_df.iterrows():
-            hourly_data.append({
-                "timestamp": row['ds'].isoformat(),
-                "hour": row['ds'].hour,
-                "demand_mw": round(row['Forecast_Load_MW'], 2),
-                "renewable_baseload_mw": round(row['Renewable_Baseload_MW'], 2),
-                "fossil_fuel_mw": round(row['Fossil_Fuel_MW'], 2),
-                "carbon_intensity_gco2_per_kwh": round(row['Carbon_Intensity_gCO2_per_kWh'], 2),
-                "window_type": row['window_type']
-            })
+        timestamps = np.datetime_as_string(records.ds, unit='s').tolist()
+        hourly_data = forecast_rows({
+            "timestamp": timestamps,
+            "hour": (records.hours % 24).tolist(),
+            "demand_mw": np.round(load, 2).tolist(),
+            "renewable_baseload_mw": np.round(renewable, 2).tolist(),
+            "fossil_fuel_mw": np.round(records.fossil(load, renewable), 2).tolist(),
+            "carbon_intensity_gco2_per_kwh": np.round(intensity, 2).tolist(),
+            "window_type": window_types(classes),
+            **({"marginal_intensity_gco2_per_kwh": np.round(records.marginal_intensity(), 2).tolist()}
+               if records.dispatch is not None else {})
+        })
 
         response_data = {
             "forecast_period": {
-                "start": forecast_df['ds'].min().isoformat(),
-                "end": forecast_df['ds'].max().isoformat(),
+                "start": timestamps[0],
+                "end": timestamps[-1],
                 "baseline_threshold": baseline_value,
-                "current_month": current_month
+                "current_month": current_month,
+                "region": region or DEFAULT_REGION,
+                "forecast_tier": records.tier,
+                "intensity_model": "single_factor" if records.dispatch is None else "merit_order"
             },
             "hourly_forecast": hourly_data,
             "summary": {
                 "total_hours": len(hourly_data),
-                "avg_demand_mw": round(forecast_df['Forecast_Load_MW'].mean(), 2),
-                "avg_carbon_intensity": round(forecast_df['Carbon_Intensity_gCO2_per_kWh'].mean(), 2),
-                "green_windows": sum(1 for h in hourly_data if h["window_type"] == "green_window"),
-                "dirty_windows": sum(1 for h in hourly_data if h["window_type"] == "dirty_window")
+                "avg_demand_mw": float(np.round(load.mean(), 2)),
+                "avg_carbon_intensity": float(np.round(np.nanmean(intensity), 2)),
+                "green_windows": green_count,
+                "dirty_windows": len(hourly_data) - green_count
             }
         }
 
@@ -213,98 +246,75 @@ async def predict_demand():
             message="Successfully predicted 24-hour demand with carbon intensity"
         )
 
-        # Cache the response
-        cache_file = Path(__file__).parent / '.forecast_cache.json'
-        with open(cache_file, 'w') as f:
-            json.dump(response.model_dump(), f)
+        # Cache the response; seasonal-profile answers are not cached so the
+        # SARIMAX forecast is served as soon as the model is warm
+        if records.tier == TIER_SARIMAX:
+            with open(cache_file, 'w') as f:
+                json.dump(response.model_dump(), f)
 
         return response
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to predict demand: {str(e)}")
 
 @app.get("/api/find-green-windows", response_model=GreenWindowsResponse)
-async def find_green_windows():
+async def find_green_windows(region: Optional[str] = None):
     """
     Scenario 2: Find green windows without filters.
     Shows green windows only, or offers least carbon intensive windows if none found.
     """
     try:
         # Get forecast data
-        forecast_df = get_forecast_data()
+        records = get_forecast_records(region)
 
-        # Get current month baseline
-        current_month = pd.Timestamp.now().month
-        seasonal = json.loads((ROOT / 'outputs' / 'seasonal_baseline.json').read_text())
-        baseline_value = float(seasonal.get(str(current_month)) or seasonal.get(current_month) or 0.0)
+        # Baseline reported with the windows (each hour uses its own month's)
+        baseline_value = records.baseline_threshold()
 
         # Classify all windows
-        forecast_df['window_type'] = forecast_df['Carbon_Intensity_gCO2_per_kWh'].apply(
-            lambda ci: 'green_window' if ci < baseline_value else 'dirty_window'
-        )
-
-        # Find green windows
-        green_windows_df = forecast_df[forecast_df['window_type'] == 'green_window'].copy()
-
-        if len(green_windows_df) > 0:
-            # Return green windows
-            green_windows = []
-            for _, row in green_windows_df.iterrows():
-                window_start = minutes_to_time(int(row['time_minutes']))
-                window_end_minutes = (row['time_minutes'] + 60) % (24 * 60)
-                window_end = minutes_to_time(window_end_minutes)
-
-                renewable_pct = calculate_renewable_percentage(row)
-
-                window = GreenWindow(
-                    start_time=window_start,
-                    end_time=window_end,
-                    carbon_intensity=round(row['Carbon_Intensity_gCO2_per_kWh'], 1),
-                    renewable_percentage=round(renewable_pct, 1),
-                    window_type="green_window"
-                )
-                green_windows.append(window)
-
+        intensity = records.carbon_intensity()
+        classes = records.classes(intensity)
+
+        # Find green windows (in forecast order), else the 3 least carbon intensive hours
+        positions = np.flatnonzero(classes == GREEN)
+        found = len(positions) > 0
+        if not found:
+            positions = np.argsort(intensity, kind='stable')[:3]
+
+        start_minutes = records.time_minutes[positions]
+        windows = forecast_rows({
+            "start_time": [minutes_to_time(m) for m in start_minutes.tolist()],
+            "end_time": [minutes_to_time((m + 60) % (24 * 60)) for m in start_minutes.tolist()],
+            "carbon_intensity": np.round(intensity[positions], 1).tolist(),
+            "renewable_percentage": np.round(records.renewable_percentage()[positions], 1).tolist(),
+            "window_type": window_types(classes[positions])
+        })
+
+        if found:
             response_data = {
-                "green_windows": [w.model_dump() for w in green_windows],
+                "green_windows": windows,
                 "baseline_threshold": baseline_value,
-                "total_green_windows": len(green_windows),
-                "fallback_available": False
+                "total_green_windows": len(windows),
+                "fallback_available": False,
+                "forecast_tier": records.tier
             }
 
             return GreenWindowsResponse(
                 success=True,
                 data=response_data,
-                message=f"Found {len(green_windows)} green windows available"
+                message=f"Found {len(windows)} green windows available"
             )
 
         else:
             # No green windows found - offer least carbon intensive
-            least_carbon_windows = forecast_df.nsmallest(3, 'Carbon_Intensity_gCO2_per_kWh').copy()
-
-            fallback_windows = []
-            for _, row in least_carbon_windows.iterrows():
-                window_start = minutes_to_time(int(row['time_minutes']))
-                window_end_minutes = (row['time_minutes'] + 60) % (24 * 60)
-                window_end = minutes_to_time(window_end_minutes)
-
-                renewable_pct = calculate_renewable_percentage(row)
-
-                window = GreenWindow(
-                    start_time=window_start,
-                    end_time=window_end,
-                    carbon_intensity=round(row['Carbon_Intensity_gCO2_per_kWh'], 1),
-                    renewable_percentage=round(renewable_pct, 1),
-                    window_type="dirty_window"
-                )
-                fallback_windows.append(window)
-
             response_data = {
-                "fallback_windows": [w.model_dump() for w in fallback_windows],
+                "fallback_windows": windows,
                 "baseline_threshold": baseline_value,
-                "total_fallback_windows": len(fallback_windows),
+                "total_fallback_windows": len(windows),
                 "fallback_available": True,
-                "fallback_reason": "No green windows found for today"
+                "fallback_reason": "No green windows found for today",
+                "forecast_tier": records.tier
             }
 
             return GreenWindowsResponse(
@@ -313,9 +323,107 @@ async def find_green_windows():
                 message="No green windows found. Here are the 3 least carbon intensive windows available."
             )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to find green windows: {str(e)}")
 
+DEFAULT_OPTIMIZE_APPLIANCES = ["washer", "dryer"]
+
+def optimize_forecast(records: ForecastRecords, baseline_value: float, requests: List[OptimizeRequest]) -> List[dict]:
+    """
+    Evaluate optimize requests against one forecast, as array operations over
+    the request list: a (requests x hours) mask of each request's time range,
+    the green hours within it (or, failing any, all of it), and the
+    number_of_windows candidates whose appliance cycles emit the least.
+
+    Each appliance's cycle emissions for every start hour come from one
+    convolution of its power profile with the intensity series; a request's
+    emissions are the sum over its appliances (one matrix product), so a
+    multi-hour cycle such as EV charging is ranked by the hours it spans.
+
+    Returns one {"success", "data", "message"} result per request, in order;
+    a request whose time range holds no forecast hour gets success False with
+    status_code 400.
+    """
+    ci = records.carbon_intensity()
+    hour_minutes = records.time_minutes
+    green = records.classes(ci) == GREEN
+
+    starts = np.array([time_to_minutes(r.start_time) for r in requests], dtype=np.int64)[:, None]
+    ends = np.array([time_to_minutes(r.end_time) for r in requests], dtype=np.int64)[:, None]
+    counts = np.array([r.number_of_windows for r in requests], dtype=np.int64)[:, None]
+    appliances = [r.appliances or DEFAULT_OPTIMIZE_APPLIANCES for r in requests]
+
+    names = sorted({app for apps in appliances for app in apps})
+    column = {name: k for k, name in enumerate(names)}
+    uses = np.zeros((len(requests), len(names)))
+    for i, apps in enumerate(appliances):
+        np.add.at(uses[i], [column[app] for app in apps], 1)
+    profiles = [appliance_profile(name) for name in names]
+    emissions = uses @ np.stack([start_emissions(profile, ci) for profile in profiles])
+    # Windows end on the hour after the longest cycle of the request finishes
+    cycle_slots = np.where(uses > 0, [len(profile) for profile in profiles], 0).max(axis=1)
+    cycle_minutes = -(-cycle_slots // SLOTS_PER_HOUR) * 60
+
+    # Handle overnight ranges
+    after_start = hour_minutes >= starts
+    before_end = hour_minutes <= ends
+    in_range = np.where(ends <= starts, after_start | before_end, after_start & before_end)
+    has_green = (in_range & green).any(axis=1)
+    candidates = in_range & (green | ~has_green[:, None])
+
+    # Lowest emissions first; take the first number_of_windows candidates per request
+    order = np.argsort(emissions, axis=1, kind='stable')
+    ranked = np.take_along_axis(candidates, order, axis=1)
+    chosen = ranked & (np.cumsum(ranked, axis=1) <= counts)
+
+    # Per-hour fields, formatted once for all requests
+    window_starts = [minutes_to_time(int(m)) for m in hour_minutes]
+    intensities = np.round(ci, 1).tolist()
+    renewable_pct = np.round(records.renewable_percentage(), 1).tolist()
+    tier = records.tier
+
+    results = []
+    for i, request in enumerate(requests):
+        if not in_range[i].any():
+            results.append({"success": False, "status_code": 400, "data": None,
+                            "message": "No data available for the specified time range"})
+            continue
+        picked = order[i, chosen[i]]
+        request_savings = emissions[i, picked]
+        optimal_windows = [
+            {
+                "start_time": window_starts[j],
+                "end_time": minutes_to_time(int((hour_minutes[j] + cycle_minutes[i]) % (24 * 60))),
+                "carbon_intensity": intensities[j],
+                "renewable_percentage": renewable_pct[j],
+                "appliances": appliances[i],
+                "energy_savings_kg": saving,
+            }
+            for j, saving in zip(picked.tolist(), np.round(request_savings, 1).tolist())
+        ]
+        response_data = {
+            "optimal_windows": optimal_windows,
+            "total_carbon_savings": float(np.round(sum(request_savings.tolist()), 1)),
+            "time_range_used": f"{request.start_time} - {request.end_time}",
+            "baseline_threshold": baseline_value,
+            "window_breakdown": {
+                "green_windows": len(optimal_windows) if has_green[i] else 0,
+                "dirty_windows": 0 if has_green[i] else len(optimal_windows)
+            },
+            "fallback_available": not has_green[i],
+            "forecast_tier": tier
+        }
+        if has_green[i]:
+            message = f"Found {len(optimal_windows)} green windows in the specified time range"
+        else:
+            # No green windows found - offer least carbon intensive windows from the filtered range
+            response_data["fallback_reason"] = "No green windows found in the specified time range"
+            message = f"No green windows found. Showing {len(optimal_windows)} least carbon intensive windows instead."
+        results.append({"success": True, "data": response_data, "message": message})
+    return results
+
 @app.post("/api/optimize-windows", response_model=OptimizeResponse)
 async def optimize_windows(request: OptimizeRequest):
     """
@@ -324,147 +432,169 @@ async def optimize_windows(request: OptimizeRequest):
     """
     try:
         # Get forecast data
-        forecast_df = get_forecast_data()
+        records = get_forecast_records(request.region)
 
-        # Get current month baseline for classification
-        current_month = pd.Timestamp.now().month
-        seasonal = json.loads((ROOT / 'outputs' / 'seasonal_baseline.json').read_text())
-        baseline_value = float(seasonal.get(str(current_month)) or seasonal.get(current_month) or 0.0)
-
-        # Classify all windows as green or dirty
-        forecast_df['window_type'] = forecast_df['Carbon_Intensity_gCO2_per_kWh'].apply(
-            lambda ci: 'green_window' if ci < baseline_value else 'dirty_window'
-        )
-
-        # Apply time filters
-        start_minutes = time_to_minutes(request.start_time)
-        end_minutes = time_to_minutes(request.end_time)
-
-        # Handle overnight ranges
-        if end_minutes <= start_minutes:
-            mask = (forecast_df['time_minutes'] >= start_minutes) | (forecast_df['time_minutes'] <= end_minutes)
-        else:
-            mask = (forecast_df['time_minutes'] >= start_minutes) & (forecast_df['time_minutes'] <= end_minutes)
+        # Baseline reported with the windows (each hour uses its own month's)
+        baseline_value = records.baseline_threshold()
 
-        filtered_df = forecast_df[mask].copy()
+        result = optimize_forecast(records, baseline_value, [request])[0]
+        if not result["success"]:
+            raise HTTPException(status_code=result["status_code"], detail=result["message"])
+        return OptimizeResponse(**result)
 
-        if len(filtered_df) == 0:
-            raise HTTPException(status_code=400, detail="No data available for the specified time range")
-
-        # Find green windows in the filtered range
-        green_windows_df = filtered_df[filtered_df['window_type'] == 'green_window'].copy()
-
-        if len(green_windows_df) > 0:
-            # Sort green windows by carbon intensity (lowest first)
-            green_windows_df = green_windows_df.sort_values('Carbon_Intensity_gCO2_per_kWh')
-
-            # Take top N green windows (or all if fewer than requested)
-            num_windows = min(request.number_of_windows, len(green_windows_df))
-            optimal_hours = green_windows_df.head(num_windows)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Optimization failed: {str(e)}")
 
-            optimal_windows = []
-            total_savings = 0
+@app.post("/api/optimize-windows/batch", response_model=OptimizeResponse)
+async def optimize_windows_batch(request: OptimizeBatchRequest):
+    """
+    Evaluate many optimize requests in one call. Requests for the same region
+    share one forecast and baseline; results come back in request order, each
+    shaped like an /api/optimize-windows response. A request that fails (no
+    hour in its time range, unknown region) gets success False and the status
+    code it would have had on its own.
+    """
+    try:
+        by_region = {}
+        for i, item in enumerate(request.requests):
+            by_region.setdefault(item.region, []).append(i)
+
+        results = [None] * len(request.requests)
+        tiers = {}
+        for region, indices in by_region.items():
+            try:
+                records = get_forecast_records(region)
+                baseline_value = records.baseline_threshold()
+            except HTTPException as e:
+                for i in indices:
+                    results[i] = {"success": False, "status_code": e.status_code, "data": None, "message": e.detail}
+                continue
+            tiers[region or DEFAULT_REGION] = records.tier
+            group = optimize_forecast(records, baseline_value, [request.requests[i] for i in indices])
+            for i, result in zip(indices, group):
+                results[i] = result
 
-            for _, row in optimal_hours.iterrows():
-                window_start = minutes_to_time(int(row['time_minutes']))
-                window_end_minutes = (row['time_minutes'] + 60) % (24 * 60)
-                window_end = minutes_to_time(window_end_minutes)
+        failed = sum(1 for result in results if not result["success"])
+        return OptimizeResponse(
+            success=True,
+            data={"results": results, "failed": failed, "forecast_tier": tiers},
+            message=f"Evaluated {len(results)} optimize requests ({failed} failed)"
+        )
 
-                appliances = request.appliances or ["washer", "dryer"]
-                duration_hours = 1.0
-                savings = calculate_energy_savings(
-                    row['Carbon_Intensity_gCO2_per_kWh'],
-                    appliances,
-                    duration_hours
-                )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Batch optimization failed: {str(e)}")
 
-                renewable_pct = calculate_renewable_percentage(row)
+MAX_SCENARIOS = 10_000
 
-                window = TimeWindow(
-                    start_time=window_start,
-                    end_time=window_end,
-                    carbon_intensity=round(row['Carbon_Intensity_gCO2_per_kWh'], 1),
-                    renewable_percentage=round(renewable_pct, 1),
-                    appliances=appliances,
-                    energy_savings_kg=round(savings, 1)
-                )
-                optimal_windows.append(window)
-                total_savings += savings
+@app.post("/api/scenarios", response_model=ScenarioResponse)
+async def run_scenarios(request: ScenarioRequest):
+    """
+    What-if sweep over the forecast: each scenario changes the fossil emission
+    factor, scales the renewable baseload and grows demand. All scenarios are
+    evaluated against the forecast hours as one (scenarios x hours)
+    computation, returning each one's intensity, green hours and best windows.
+    Scenarios come from the explicit list, every combination in the grid, or
+    both (list first). Fossil generation is dispatched in merit order when
+    units are configured (or intensity_model is "merit_order"), in which case
+    the emission factor does not apply.
+    """
+    try:
+        # Size the request before expanding the grid
+        axes = request.grid.model_dump() if request.grid is not None else None
+        count = len(request.scenarios or []) + (grid_size(**axes) if axes is not None else 0)
+        if count == 0:
+            raise HTTPException(status_code=400, detail="Give at least one scenario or a grid")
+        if count > MAX_SCENARIOS:
+            raise HTTPException(status_code=400, detail=f"{count} scenarios requested; the limit is {MAX_SCENARIOS}")
+
+        columns = {name: [] for name in PARAMETERS}
+        for scenario in request.scenarios or []:
+            for name in PARAMETERS:
+                value = getattr(scenario, name)
+                columns[name].append(SCENARIO_DEFAULTS[name] if value is None else value)
+        if axes is not None:
+            grid = scenario_grid(**axes)
+            for name in PARAMETERS:
+                columns[name].extend(grid[name].tolist())
+        intensity_model = request.intensity_model or ("single_factor" if dispatch_model is None else "merit_order")
+        if intensity_model == "merit_order" and dispatch_model is None:
+            raise HTTPException(status_code=400, detail="No dispatch units configured (AURA_DISPATCH_UNITS)")
+        dispatch = dispatch_model if intensity_model == "merit_order" else None
+        if dispatch is not None:
+            columns["emission_factor"] = [None] * count
+
+        records = get_forecast_records(request.region, request.steps)
+        baseline_value = records.baseline_threshold()
+        result = evaluate_scenarios(
+            records.load(), records.renewable(), records.thresholds(),
+            {name: np.array(values, dtype=float) for name, values in columns.items()},
+            window_hours=request.window_hours, top_k=request.top_k, dispatch=dispatch,
+        )
 
-            response_data = {
-                "optimal_windows": [w.model_dump() for w in optimal_windows],
-                "total_carbon_savings": round(total_savings, 1),
-                "time_range_used": f"{request.start_time} - {request.end_time}",
-                "baseline_threshold": baseline_value,
-                "window_breakdown": {
-                    "green_windows": len(optimal_windows),
-                    "dirty_windows": 0
-                },
-                "fallback_available": False
+        timestamps = np.datetime_as_string(records.ds, unit='s').tolist()
+        clock = [minutes_to_time(int(m)) for m in records.time_minutes]
+        end_clock = [minutes_to_time(int((m + 60 * request.window_hours) % (24 * 60))) for m in records.time_minutes]
+        window_start = result["window_start"].tolist()
+        window_ci = np.round(result["window_avg_carbon_intensity"], 1).tolist()
+        per_scenario = zip(
+            *(columns[name] for name in PARAMETERS),
+            np.round(result["avg_carbon_intensity"], 1).tolist(),
+            np.round(result["avg_marginal_intensity"], 1).tolist(),
+            np.round(result["renewable_share"], 1).tolist(),
+            result["green_hours"].tolist(),
+        )
+        green_positions = [np.flatnonzero(row).tolist() for row in result["green"]]
+        intensity = np.round(result["intensity"], 1).tolist() if request.include_intensity else None
+        marginal = (np.round(result["marginal_intensity"], 1).tolist()
+                    if request.include_intensity and dispatch is not None else None)
+
+        scenarios = []
+        for i, (ef, scale, growth, avg_ci, avg_marginal, share, green_count) in enumerate(per_scenario):
+            scenario = {
+                "emission_factor": ef,
+                "renewable_scale": scale,
+                "demand_growth": growth,
+                "avg_carbon_intensity": avg_ci,
+                "avg_marginal_intensity": avg_marginal,
+                "renewable_share": share,
+                "green_hour_count": green_count,
+                "green_hours": green_positions[i],
+                "best_windows": [
+                    {
+                        "start": timestamps[start],
+                        "start_time": clock[start],
+                        "end_time": end_clock[start],
+                        "avg_carbon_intensity": ci,
+                    }
+                    for start, ci in zip(window_start[i], window_ci[i]) if start >= 0
+                ],
             }
+            if intensity is not None:
+                scenario["carbon_intensity"] = intensity[i]
+            if marginal is not None:
+                scenario["marginal_intensity"] = marginal[i]
+            scenarios.append(scenario)
 
-            return OptimizeResponse(
-                success=True,
-                data=response_data,
-                message=f"Found {len(optimal_windows)} green windows in the specified time range"
-            )
-
-        else:
-            # No green windows found - offer least carbon intensive windows from the filtered range
-            least_carbon_windows = filtered_df.nsmallest(request.number_of_windows, 'Carbon_Intensity_gCO2_per_kWh').copy()
-
-            optimal_windows = []
-            total_savings = 0
-
-            for _, row in least_carbon_windows.iterrows():
-                window_start = minutes_to_time(int(row['time_minutes']))
-                window_end_minutes = (row['time_minutes'] + 60) % (24 * 60)
-                window_end = minutes_to_time(window_end_minutes)
-
-                appliances = request.appliances or ["washer", "dryer"]
-                duration_hours = 1.0
-                savings = calculate_energy_savings(
-                    row['Carbon_Intensity_gCO2_per_kWh'],
-                    appliances,
-                    duration_hours
-                )
-
-                renewable_pct = calculate_renewable_percentage(row)
-
-                window = TimeWindow(
-                    start_time=window_start,
-                    end_time=window_end,
-                    carbon_intensity=round(row['Carbon_Intensity_gCO2_per_kWh'], 1),
-                    renewable_percentage=round(renewable_pct, 1),
-                    appliances=appliances,
-                    energy_savings_kg=round(savings, 1)
-                )
-                optimal_windows.append(window)
-                total_savings += savings
-
-            response_data = {
-                "optimal_windows": [w.model_dump() for w in optimal_windows],
-                "total_carbon_savings": round(total_savings, 1),
-                "time_range_used": f"{request.start_time} - {request.end_time}",
+        return ScenarioResponse(
+            success=True,
+            data={
+                "hours": timestamps,
                 "baseline_threshold": baseline_value,
-                "window_breakdown": {
-                    "green_windows": 0,
-                    "dirty_windows": len(optimal_windows)
-                },
-                "fallback_available": True,
-                "fallback_reason": "No green windows found in the specified time range"
-            }
-
-            return OptimizeResponse(
-                success=True,
-                data=response_data,
-                message=f"No green windows found. Showing {len(optimal_windows)} least carbon intensive windows instead."
-            )
+                "window_hours": request.window_hours,
+                "region": request.region or DEFAULT_REGION,
+                "forecast_tier": records.tier,
+                "intensity_model": intensity_model,
+                "scenarios": scenarios,
+            },
+            message=f"Evaluated {count} scenarios over {len(timestamps)} forecast hours"
+        )
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Optimization failed: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to evaluate scenarios: {str(e)}")
 
 @app.get("/api/available-time-ranges", response_model=AvailableTimeRangesResponse)
 async def get_available_time_ranges():
@@ -489,52 +619,56 @@ async def schedule_appliances(request: ScheduleAppliancesRequest):
         scheduled_tasks = []
         total_savings = 0
         confirmation_id = f"sched_{uuid.uuid4().hex[:8]}"
+        try:
+            windows = [(time_to_minutes(item.window_start), time_to_minutes(item.window_end))
+                       for item in request.schedule]
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
 
         # Get forecast data for validation
-        forecast_df = get_forecast_data()
+        records = get_forecast_records(request.region)
 
-        # Get current month baseline for classification
-        current_month = pd.Timestamp.now().month
-        seasonal = json.loads((ROOT / 'outputs' / 'seasonal_baseline.json').read_text())
-        baseline_value = float(seasonal.get(str(current_month)) or seasonal.get(current_month) or 0.0)
+        # Baseline reported with the schedule (each hour uses its own month's)
+        baseline_value = records.baseline_threshold()
 
         # Classify all windows
-        forecast_df['window_type'] = forecast_df['Carbon_Intensity_gCO2_per_kWh'].apply(
-            lambda ci: 'green_window' if ci < baseline_value else 'dirty_window'
-        )
+        intensity = records.carbon_intensity()
+        classes = records.classes(intensity)
+        # First forecast hour starting at each minute of the day (-1 if none)
+        first_at = np.full(24 * 60, -1, dtype=np.int64)
+        minutes, first = np.unique(records.time_minutes, return_index=True)
+        first_at[minutes] = first
+        # Cycle emissions from every start hour, per appliance and duration
+        emissions = {}
 
-        for item in request.schedule:
-            window_start_minutes = time_to_minutes(item.window_start)
-            window_end_minutes = time_to_minutes(item.window_end)
+        for item, (window_start_minutes, window_end_minutes) in zip(request.schedule, windows):
 
             if not request.user_preferences.allow_overnight:
                 if window_end_minutes < window_start_minutes:
                     continue
 
-            mask = forecast_df['time_minutes'] == window_start_minutes
-            if not mask.any():
+            position = first_at[window_start_minutes]
+            if position < 0:
                 continue
 
-            row = forecast_df[mask].iloc[0]
+            carbon_intensity = intensity[position]
 
-            if row['Carbon_Intensity_gCO2_per_kWh'] > request.user_preferences.max_carbon_intensity:
+            if carbon_intensity > request.user_preferences.max_carbon_intensity:
                 continue
 
-            duration_hours = item.duration_minutes / 60.0
-            savings = calculate_energy_savings(
-                row['Carbon_Intensity_gCO2_per_kWh'],
-                [item.appliance],
-                duration_hours
-            )
+            key = (item.appliance, item.duration_minutes)
+            if key not in emissions:
+                emissions[key] = start_emissions(appliance_profile(*key), intensity)
+            savings = emissions[key][position]
 
             task = {
                 "appliance": item.appliance,
                 "scheduled_start": item.window_start,
                 "scheduled_end": item.window_end,
                 "duration_minutes": item.duration_minutes,
-                "estimated_savings_kg": round(savings, 2),
-                "carbon_intensity": round(row['Carbon_Intensity_gCO2_per_kWh'], 1),
-                "window_type": row['window_type']
+                "estimated_savings_kg": float(np.round(savings, 2)),
+                "carbon_intensity": float(np.round(carbon_intensity, 1)),
+                "window_type": WINDOW_TYPES[classes[position]].item()
             }
             scheduled_tasks.append(task)
             total_savings += savings
@@ -551,7 +685,8 @@ async def schedule_appliances(request: ScheduleAppliancesRequest):
             "window_breakdown": {
                 "green_windows": green_count,
                 "dirty_windows": dirty_count
-            }
+            },
+            "forecast_tier": records.tier
         }
 
         return ScheduleAppliancesResponse(
@@ -560,78 +695,266 @@ async def schedule_appliances(request: ScheduleAppliancesRequest):
             message=f"Successfully scheduled {len(scheduled_tasks)} appliances ({green_count} in green windows, {dirty_count} in dirty windows)"
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Scheduling failed: {str(e)}")
 
+GREEN_WINDOW_SCRIPT = ROOT / 'ml_models' / 'compute_green_window.py'
+# Progress reported when the script prints a line starting with each marker
+GREEN_WINDOW_STAGES = (
+    ('Current month', 0.5, 'classifying windows'),
+    ('Wrote', 0.6, 'ranking windows'),
+    ('Published snapshot', 0.9, 'exporting'),
+)
+GREEN_WINDOW_TIMEOUT_S = float(os.environ.get('AURA_GREEN_WINDOW_TIMEOUT_S', 600))
+
+
+def green_window_result(snapshot) -> dict:
+    """compute-green-window response data for a published snapshot"""
+    best_window = snapshot.meta["best_window"]
+    return {
+        "green_window": {
+            "start_time": best_window["start"],
+            "end_time": best_window["end"],
+            "average_carbon_intensity": best_window["avg_carbon_intensity_gco2_per_kwh"],
+            "duration_hours": best_window["length_hours"],
+            "baseline_threshold": snapshot.meta.get("baseline_threshold", 0),
+            "window_type": best_window.get("window_type", "unknown"),
+            "hourly_data": window_records(snapshot)
+        },
+        "top_windows": snapshot.meta.get("top_windows", []),
+        "complete_forecast": {
+            "forecast_period": snapshot.meta["forecast_period"],
+            "hourly_classifications": hourly_records(snapshot)
+        },
+        "snapshot_version": snapshot.version,
+        "computation_timestamp": pd.Timestamp.now().isoformat(),
+        "status": "computed"
+    }
+
+
+def run_green_window(params: dict, progress) -> dict:
+    """
+    Run the green window pipeline script for a job and return the response data
+    of the snapshot it published. Progress follows the script's output.
+    """
+    if not GREEN_WINDOW_SCRIPT.exists():
+        raise FileNotFoundError("Green window computation script not found")
+
+    progress(0.1, 'forecasting demand')
+    process = subprocess.Popen(
+        ['python', str(GREEN_WINDOW_SCRIPT), '--steps', str(params['steps']), '--top-k', str(params['top_k'])],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+        cwd=ROOT
+    )
+    timer = threading.Timer(GREEN_WINDOW_TIMEOUT_S, process.kill)
+    timer.start()
+    version = None
+    output = []
+    try:
+        for line in process.stdout:
+            output = (output + [line.rstrip()])[-20:]
+            for marker, fraction, stage in GREEN_WINDOW_STAGES:
+                if line.startswith(marker):
+                    progress(fraction, stage)
+            if line.startswith('Published snapshot'):
+                version = line.split()[-1]
+        returncode = process.wait()
+    finally:
+        timer.cancel()
+
+    if returncode != 0:
+        tail = "\n".join(output)
+        raise RuntimeError(f"Green window computation failed: {tail}")
+    if version is None:
+        raise RuntimeError("Green window snapshot was not generated")
+    return green_window_result(read_snapshot(version))
+
+
+# A finished run is only reused while its snapshot is still the published one
+green_window_jobs = JobQueue(
+    'compute-green-window', run_green_window,
+    still_valid=lambda result: current_version(SNAPSHOT_DIR) == result['snapshot_version']
+)
+
+
+def run_history_update(params: dict, progress) -> dict:
+    """
+    Fold the hours of the live series from params['since'] (the first hour the
+    ingest changed) and any newer than the published carbon history into the
+    history table and the analytics rollups.
+    """
+    progress(0.1, 'updating history')
+    path = backfill(params['region'], HISTORY_DIR, ROLLUPS_DIR, incremental=True, dispatch=dispatch_model,
+                    series=live_load.arrays(), since=params.get('since'))
+    return {"region": params['region'], "history_version": path.name}
+
+
+# Keyed by series version: ingests that leave the series unchanged share one
+# update, reused only while the history it published is still the current one
+history_update_jobs = JobQueue(
+    'update-carbon-history', run_history_update,
+    still_valid=lambda result: current_version(HISTORY_DIR / region_slug(result['region'])) == result['history_version']
+)
+
+
 @app.post("/api/compute-green-window")
 async def compute_green_window():
     """
     Compute and return the optimal green energy window by running the ML model.
     This endpoint triggers the green window computation and returns the results.
+    The computation runs in the shared job queue, so concurrent calls reuse one run.
     """
     try:
-        # Path to the compute_green_window.py script
-        script_path = ROOT / 'ml_models' / 'compute_green_window.py'
-
-        if not script_path.exists():
-            raise HTTPException(status_code=500, detail="Green window computation script not found")
-
-        # Run the script to generate the green window JSON
-        result = subprocess.run(
-            ['python', str(script_path)],
-            capture_output=True,
-            text=True,
-            cwd=ROOT
-        )
+        try:
+            job, _ = green_window_jobs.submit(GreenWindowJobRequest().model_dump())
+        except JobQueueFull as e:
+            raise HTTPException(status_code=503, detail=f"Green window computation is busy: {str(e)}")
 
-        if result.returncode != 0:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Green window computation failed: {result.stderr}"
-            )
+        job = await green_window_jobs.wait(job["job_id"])
+        if job is None or job["status"] != SUCCEEDED:
+            error = job["error"] if job else "job record lost"
+            raise HTTPException(status_code=500, detail=error)
 
-        # Read the generated JSON file
-        green_window_file = ROOT / 'outputs' / 'aura_green_window.json'
+        response_data = {**job["result"], "job_id": job["job_id"]}
+        return {
+            "success": True,
+            "data": response_data,
+            "message": f"Successfully computed green window for {response_data['green_window']['duration_hours']} hours"
+        }
 
-        if not green_window_file.exists():
-            raise HTTPException(status_code=500, detail="Green window JSON file was not generated")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to compute green window: {str(e)}")
 
-        with open(green_window_file, 'r') as f:
-            green_window_data = json.load(f)
+@app.post("/api/jobs/compute-green-window", status_code=202)
+async def submit_green_window_job(request: Optional[GreenWindowJobRequest] = None):
+    """
+    Queue a green window computation and return its job at once. An identical
+    queued, running or just-finished computation is returned instead of a new one.
+    Poll /api/jobs/{job_id} for progress and the result.
+    """
+    try:
+        params = (request or GreenWindowJobRequest()).model_dump()
+        try:
+            job, created = green_window_jobs.submit(params)
+        except JobQueueFull as e:
+            raise HTTPException(status_code=503, detail=f"Green window computation is busy: {str(e)}")
+
+        return {
+            "success": True,
+            "data": {**job, "created": created},
+            "message": f"{'Queued' if created else 'Reusing'} green window job {job['job_id']}"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to queue green window computation: {str(e)}")
+
+@app.get("/api/jobs/{job_id}")
+async def get_job(job_id: str):
+    """
+    Status, progress and (once succeeded) result of a background job.
+    """
+    try:
+        job = green_window_jobs.get(job_id) or history_update_jobs.get(job_id)
+        if job is None:
+            raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
 
-        # Also read the complete classification data for plotting
-        complete_classification_file = ROOT / 'outputs' / 'complete_window_classification.json'
-        complete_data = None
-        if complete_classification_file.exists():
-            with open(complete_classification_file, 'r') as f:
-                complete_data = json.load(f)
+        return {
+            "success": True,
+            "data": job,
+            "message": f"Job {job_id} is {job['status']}"
+        }
 
-        # Transform the data for frontend consumption
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to retrieve job: {str(e)}")
+
+@app.post("/api/ingest/load")
+async def ingest_load(request: IngestLoadRequest):
+    """
+    Append a batch of hourly load readings to the live series. Readings for
+    hours that already have one are ignored; skipped hours are interpolated
+    until their reading arrives. Only forecasts built on the default region's
+    series are invalidated.
+    """
+    try:
+        if any(r.timestamp.tzinfo is not None for r in request.readings):
+            raise HTTPException(status_code=400, detail="Timestamps must be local hours without a UTC offset, like the load data")
+        ds = pd.DatetimeIndex([r.timestamp for r in request.readings]).values
+        loads = np.array([r.load_mw for r in request.readings], dtype=float)
+
+        off_hour = ds != ds.astype('datetime64[h]')
+        if off_hour.any():
+            bad = np.datetime_as_string(ds[off_hour][:5], unit='s').tolist()
+            raise HTTPException(status_code=400, detail=f"Readings must be on the hour: {bad}")
+
+        hours = to_hours(ds)
+        start, end = live_load.start(), live_load.end()
+        if hours.min() < start.astype(np.int64):
+            raise HTTPException(status_code=400, detail=f"Readings before the start of the series ({start}) cannot be added")
+        gap = int(hours.max() - end.astype(np.int64))
+        if gap > MAX_GAP_HOURS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Readings more than {MAX_GAP_HOURS} hours after the end of the series ({end}) are not accepted"
+            )
+
+        # Keep the log free of duplicates: first reading per hour, hours without one yet
+        new = np.zeros(len(hours), dtype=bool)
+        new[np.unique(hours, return_index=True)[1]] = True
+        new &= ~live_load.observed(hours)
+        if new.any():
+            append_readings(hours[new], loads[new], live_load.root)
+        stats = live_load.refresh()
+
+        if new.any():
+            # Only the default region's cached forecast was built on this series;
+            # the shared forecast notices the new series version by itself
+            forecast_cache_file(DEFAULT_REGION).unlink(missing_ok=True)
+
+        # Bring the published history and rollups up to date in the background,
+        # from the first hour the ingest changed (late readings replace
+        # interpolated hours), even if another thread folded the readings in
+        history_job = None
+        if new.any() and current_version(HISTORY_DIR / region_slug(DEFAULT_REGION)):
+            since = str(np.datetime64(live_load.changed_from(hours[new]), 'h'))
+            try:
+                history_job, _ = history_update_jobs.submit(
+                    {"region": DEFAULT_REGION, "series_version": live_load.version(), "since": since}
+                )
+            except JobQueueFull:
+                pass  # newer hours are picked up by the next update; replaced ones by a full backfill
+
+        accepted = int(new.sum())
         response_data = {
-            "green_window": {
-                "start_time": green_window_data["start"],
-                "end_time": green_window_data["end"],
-                "average_carbon_intensity": green_window_data["avg_carbon_intensity_gco2_per_kwh"],
-                "duration_hours": green_window_data["length_hours"],
-                "baseline_threshold": green_window_data.get("baseline_threshold", 0),
-                "window_type": green_window_data.get("window_type", "unknown"),
-                "hourly_data": green_window_data["rows"]
-            },
-            "complete_forecast": complete_data,
-            "computation_timestamp": pd.Timestamp.now().isoformat(),
-            "status": "computed"
+            "received": len(hours),
+            "accepted": accepted,
+            "duplicates": len(hours) - accepted,
+            "interpolated_hours": stats["interpolated_hours"],
+            "series_start": str(live_load.start()),
+            "series_end": str(live_load.end()),
+            "series_version": live_load.version(),
+            "history_job_id": history_job["job_id"] if history_job else None,
         }
 
         return {
             "success": True,
             "data": response_data,
-            "message": f"Successfully computed green window for {green_window_data['length_hours']} hours"
+            "message": f"Ingested {accepted} of {len(hours)} readings"
         }
 
     except HTTPException:
         raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Failed to compute green window: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to ingest load readings: {str(e)}")
 
 @app.get("/api/forecast-24h")
 async def get_24h_forecast():
@@ -640,29 +963,30 @@ async def get_24h_forecast():
     Returns the latest computed forecast without running ML computation.
     """
     try:
-        # Read the complete classification data
-        complete_classification_file = ROOT / 'outputs' / 'complete_window_classification.json'
-
-        if not complete_classification_file.exists():
+        # Latest published snapshot (memory-mapped once per version)
+        try:
+            snapshot = get_snapshot()
+        except FileNotFoundError:
             raise HTTPException(
                 status_code=404,
                 detail="24-hour forecast data not available. Please run /api/compute-green-window first."
             )
 
-        with open(complete_classification_file, 'r') as f:
-            forecast_data = json.load(f)
+        intensity = np.asarray(snapshot["carbon_intensity_gco2_per_kwh"])
+        green_hours = int(np.count_nonzero(snapshot["green"]))
 
         # Transform for frontend consumption
         response_data = {
-            "forecast_period": forecast_data["forecast_period"],
-            "hourly_data": forecast_data["hourly_classifications"],
+            "forecast_period": snapshot.meta["forecast_period"],
+            "hourly_data": hourly_records(snapshot),
+            "snapshot_version": snapshot.version,
             "summary": {
-                "total_hours": len(forecast_data["hourly_classifications"]),
-                "green_windows": sum(1 for h in forecast_data["hourly_classifications"] if h["window_type"] == "green_window"),
-                "dirty_windows": sum(1 for h in forecast_data["hourly_classifications"] if h["window_type"] == "dirty_window"),
-                "avg_carbon_intensity": round(sum(h["carbon_intensity_gco2_per_kwh"] for h in forecast_data["hourly_classifications"]) / len(forecast_data["hourly_classifications"]), 2),
-                "min_carbon_intensity": min(h["carbon_intensity_gco2_per_kwh"] for h in forecast_data["hourly_classifications"]),
-                "max_carbon_intensity": max(h["carbon_intensity_gco2_per_kwh"] for h in forecast_data["hourly_classifications"])
+                "total_hours": len(intensity),
+                "green_windows": green_hours,
+                "dirty_windows": len(intensity) - green_hours,
+                "avg_carbon_intensity": round(float(np.nanmean(intensity)), 2),
+                "min_carbon_intensity": float(np.nanmin(intensity)),
+                "max_carbon_intensity": float(np.nanmax(intensity))
             }
         }
 
@@ -679,24 +1003,200 @@ async def get_24h_forecast():
 
 
 @app.get("/api/seasonal-baseline")
-async def get_seasonal_baseline():
+async def get_seasonal_baseline(region: Optional[str] = None):
     """
-    Return the seasonal baseline JSON file (monthly carbon intensity baselines).
+    Return the seasonal baseline (monthly carbon intensity baselines) for a region.
     """
     try:
-        seasonal_file = ROOT / 'outputs' / 'seasonal_baseline.json'
-        if not seasonal_file.exists():
+        try:
+            table = get_baseline_table()
+        except FileNotFoundError:
             raise HTTPException(status_code=404, detail="seasonal_baseline.json not found")
 
-        with open(seasonal_file, 'r') as f:
-            seasonal = json.load(f)
+        try:
+            seasonal = table.to_dict(region)
+        except KeyError:
+            raise HTTPException(status_code=404, detail=f"Unknown region: {region}")
 
-        return {"success": True, "data": seasonal}
+        return {"success": True, "data": seasonal, "regions": table.regions}
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to read seasonal baseline: {str(e)}")
 
+def parse_timestamp(value: Optional[str], name: str) -> Optional[np.datetime64]:
+    """Parse an ISO timestamp query parameter"""
+    if value is None:
+        return None
+    try:
+        return np.datetime64(pd.Timestamp(value).tz_localize(None), 'ns')
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail=f"Invalid {name} timestamp: {value}")
+
+@app.get("/api/history")
+async def get_history(start: Optional[str] = None, end: Optional[str] = None,
+                      resolution: str = "hour", region: Optional[str] = None):
+    """
+    Historical carbon intensity for [start, end] at hour, day, week or month resolution.
+    Served from the columnar table written by ml_models/carbon_history_backfill.py.
+    """
+    try:
+        if resolution not in RESOLUTIONS:
+            raise HTTPException(status_code=400, detail=f"resolution must be one of {', '.join(RESOLUTIONS)}")
+        start_ts = parse_timestamp(start, "start")
+        end_ts = parse_timestamp(end, "end")
+
+        try:
+            table = get_history_table(region)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=404,
+                detail="Carbon history not available. Please run ml_models/carbon_history_backfill.py first."
+            )
+
+        result = query_history(table, start_ts, end_ts, resolution)
+        points = len(result['ds'] if resolution == 'hour' else result['start'])
+        if points > MAX_HISTORY_POINTS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Range has {points} points at {resolution} resolution (max {MAX_HISTORY_POINTS}); use a coarser resolution"
+            )
+
+        if resolution == 'hour':
+            timestamps = np.datetime_as_string(result['ds'], unit='s')
+            rows = [
+                {
+                    "timestamp": ts,
+                    "load_mw": round(load, 2),
+                    "renewable_baseload_mw": round(renewable, 2),
+                    "fossil_fuel_mw": round(fossil, 2),
+                    "carbon_intensity_gco2_per_kwh": round(ci, 2),
+                    "window_type": "green_window" if green else "dirty_window"
+                }
+                for ts, load, renewable, fossil, ci, green in zip(
+                    timestamps.tolist(), result['load_mw'].tolist(), result['renewable_mw'].tolist(),
+                    result['fossil_mw'].tolist(), result['carbon_intensity'].tolist(), result['green'].tolist()
+                )
+            ]
+        else:
+            timestamps = np.datetime_as_string(result['start'], unit='s')
+            rows = [
+                {
+                    "start": ts,
+                    "hours": hours,
+                    "avg_load_mw": round(load, 2),
+                    "avg_renewable_baseload_mw": round(renewable, 2),
+                    "avg_fossil_fuel_mw": round(fossil, 2),
+                    "avg_carbon_intensity": round(ci, 2),
+                    "min_carbon_intensity": round(ci_min, 2),
+                    "max_carbon_intensity": round(ci_max, 2),
+                    "green_hours": green
+                }
+                for ts, hours, load, renewable, fossil, ci, ci_min, ci_max, green in zip(
+                    timestamps.tolist(), result['hours'].tolist(), result['avg_load_mw'].tolist(),
+                    result['avg_renewable_mw'].tolist(), result['avg_fossil_mw'].tolist(),
+                    result['avg_carbon_intensity'].tolist(), result['min_carbon_intensity'].tolist(),
+                    result['max_carbon_intensity'].tolist(), result['green_hours'].tolist()
+                )
+            ]
+
+        return {
+            "success": True,
+            "data": {
+                "region": table.meta.get("region", region or DEFAULT_REGION),
+                "resolution": resolution,
+                "available_range": {"start": table.meta.get("start"), "end": table.meta.get("end")},
+                "history": rows
+            },
+            "message": f"Retrieved {len(rows)} {resolution} points of carbon intensity history"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to query history: {str(e)}")
+
+@app.get("/api/analytics/rollups")
+async def get_analytics_rollups(granularity: str = "month", start: Optional[str] = None,
+                                end: Optional[str] = None, region: Optional[str] = None):
+    """
+    Pre-aggregated analytics (count, sum, mean, min, max per metric and green hours)
+    by hour of day, day, week or month. Served from the rollups maintained by
+    ml_models/carbon_history_backfill.py, so no hourly data is scanned per request.
+    """
+    try:
+        if granularity not in GRANULARITIES:
+            raise HTTPException(status_code=400, detail=f"granularity must be one of {', '.join(GRANULARITIES)}")
+        start_ts = parse_timestamp(start, "start")
+        end_ts = parse_timestamp(end, "end")
+
+        try:
+            store = get_rollups(region)
+        except FileNotFoundError:
+            raise HTTPException(
+                status_code=404,
+                detail="Analytics rollups not available. Please run ml_models/carbon_history_backfill.py first."
+            )
+
+        result = store.query(granularity, start_ts, end_ts)
+        if granularity == 'hour_of_day':
+            labels = [f"{hour:02d}:00" for hour in result['bucket'].tolist()]
+        else:
+            labels = np.datetime_as_string(bucket_start(result['bucket'], granularity), unit='D').tolist()
+
+        hours = result['hours']
+        columns = {}
+        for metric in METRICS:
+            count = result[f'{metric}_count']
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = np.where(count > 0, result[f'{metric}_sum'] / count, np.nan)
+            columns[metric] = (
+                result[f'{metric}_sum'].tolist(),
+                mean.tolist(),
+                result[f'{metric}_min'].tolist(),
+                result[f'{metric}_max'].tolist(),
+            )
+
+        def stat(value):
+            return None if value != value else round(value, 2)  # NaN -> null
+
+        buckets = []
+        for i, label in enumerate(labels):
+            bucket = {"bucket": label, "hours": int(hours[i]), "green_hours": int(result['green_hours'][i])}
+            for metric, (sums, means, mins, maxes) in columns.items():
+                bucket[metric] = {"sum": stat(sums[i]), "mean": stat(means[i]), "min": stat(mins[i]), "max": stat(maxes[i])}
+            buckets.append(bucket)
+
+        return {
+            "success": True,
+            "data": {
+                "region": region or DEFAULT_REGION,
+                "granularity": granularity,
+                "last_updated": None if store.last_ds is None else str(store.last_ds.astype('datetime64[s]')),
+                "buckets": buckets
+            },
+            "message": f"Retrieved {len(buckets)} {granularity} rollup buckets"
+        }
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Failed to query rollups: {str(e)}")
+
+@app.get("/api/models")
+async def get_models():
+    """Return the forecasting models currently loaded and served per region"""
+    return {"success": True, "data": {
+        **model_registry.status(),
+        "forecast_state": shared_forecast.status(),
+        "dispatch": dispatch_model.to_dict() if dispatch_model is not None else None,
+    }}
+
+@app.get("/api/admission")
+async def get_admission():
+    """Rate and concurrency limits per route with admitted and rejected request counts"""
+    return {"success": True, "data": {"pid": os.getpid(), "routes": admission.status()}}
+
 @app.get("/")
 async def root():
     """Health check endpoint"""
@@ -1,11 +1,16 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Annotated, List, Literal, Optional
+from datetime import datetime
 
 class OptimizeRequest(BaseModel):
     start_time: str = Field(..., pattern=r"^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$")
     end_time: str = Field(..., pattern=r"^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$")
     number_of_windows: int = Field(ge=1, le=10)
     appliances: Optional[List[str]] = None
+    region: Optional[str] = None
+
+class OptimizeBatchRequest(BaseModel):
+    requests: List[OptimizeRequest] = Field(min_length=1, max_length=10_000)
 
 class TimeWindow(BaseModel):
     start_time: str
@@ -42,6 +47,7 @@ class UserPreferences(BaseModel):
 class ScheduleAppliancesRequest(BaseModel):
     schedule: List[ApplianceSchedule]
     user_preferences: UserPreferences
+    region: Optional[str] = None
 
 class ScheduleAppliancesResponse(BaseModel):
     success: bool
@@ -53,6 +59,10 @@ class GreenWindowRequest(BaseModel):
     end_time: Optional[str] = Field(None, pattern=r"^([0-1]?[0-9]|2[0-3]):[0-5][0-9]$")
     number_of_windows: Optional[int] = Field(None, ge=1, le=24)
 
+class GreenWindowJobRequest(BaseModel):
+    steps: int = Field(24, ge=1, le=168)
+    top_k: int = Field(5, ge=1, le=24)
+
 class GreenWindow(BaseModel):
     start_time: str
     end_time: str
@@ -69,3 +79,39 @@ class PredictDemandResponse(BaseModel):
     success: bool
     data: dict
     message: str
+
+class LoadReading(BaseModel):
+    timestamp: datetime
+    load_mw: float = Field(ge=0, allow_inf_nan=False)
+
+class IngestLoadRequest(BaseModel):
+    readings: List[LoadReading] = Field(min_length=1, max_length=10_000)
+
+EmissionFactor = Annotated[float, Field(ge=0, le=2000)]
+RenewableScale = Annotated[float, Field(ge=0, le=100)]
+DemandGrowth = Annotated[float, Field(gt=-1, le=10)]
+
+class Scenario(BaseModel):
+    emission_factor: Optional[EmissionFactor] = None
+    renewable_scale: Optional[RenewableScale] = None
+    demand_growth: Optional[DemandGrowth] = None
+
+class ScenarioGrid(BaseModel):
+    emission_factor: Optional[List[EmissionFactor]] = Field(None, max_length=100)
+    renewable_scale: Optional[List[RenewableScale]] = Field(None, max_length=100)
+    demand_growth: Optional[List[DemandGrowth]] = Field(None, max_length=100)
+
+class ScenarioRequest(BaseModel):
+    scenarios: Optional[List[Scenario]] = Field(None, max_length=10_000)
+    grid: Optional[ScenarioGrid] = None
+    region: Optional[str] = None
+    steps: int = Field(24, ge=1, le=168)
+    window_hours: int = Field(1, ge=1, le=24)
+    top_k: int = Field(3, ge=1, le=10)
+    include_intensity: bool = True
+    intensity_model: Optional[Literal["single_factor", "merit_order"]] = None
+
+class ScenarioResponse(BaseModel):
+    success: bool
+    data: dict
+    message: str
@@ -0,0 +1,266 @@
+"""
+Registry of trained SARIMAX results per region and version.
+
+Artifacts live at outputs/models/<region_slug>/<version>.joblib, where versions
+sort lexicographically (the trainer uses UTC timestamps). The legacy single
+model outputs/aura_model.joblib is served as DEFAULT_REGION. Models are loaded
+on first use, evicted least-recently-used when the memory budget is exceeded,
+and swapped atomically when a newer artifact appears on disk.
+"""
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Dict, List, NamedTuple, Optional
+
+import joblib
+import pandas as pd
+
+from backend.seasonal import normalize_region, DEFAULT_REGION
+
+ROOT = Path(__file__).parent.parent
+MODEL = ROOT / 'outputs' / 'aura_model.joblib'
+MODELS_DIR = ROOT / 'outputs' / 'models'
+MEMORY_BUDGET_MB = float(os.environ.get('AURA_MODEL_MEMORY_MB', 1024))
+POLL_INTERVAL_S = float(os.environ.get('AURA_MODEL_POLL_S', 5))
+
+
+class ModelArtifact(NamedTuple):
+    region: str
+    version: str
+    path: Path
+    size_bytes: int
+
+
+def region_slug(region: Optional[str]) -> str:
+    return normalize_region(region or DEFAULT_REGION).replace(' ', '_')
+
+
+def new_version() -> str:
+    return pd.Timestamp.now(tz='UTC').strftime('%Y%m%dT%H%M%S%f')
+
+
+def publish_model(results, region: Optional[str] = None, version: Optional[str] = None,
+                  models_dir: Path = MODELS_DIR) -> Path:
+    """
+    Write a trained model as a new version for region. The file is written to a
+    temporary name and renamed into place so readers never see a partial file.
+    """
+    target_dir = models_dir / region_slug(region)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    path = target_dir / f'{version or new_version()}.joblib'
+    atomic_dump(results, path)
+    return path
+
+
+def atomic_dump(obj, path: Path):
+    """joblib.dump to a temporary file in the same directory, then os.replace."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    os.close(fd)
+    try:
+        joblib.dump(obj, tmp)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+class ModelRegistry:
+    """Lazy-loading, memory-bounded LRU cache of forecasting models keyed by (region, version)."""
+
+    def __init__(self, models_dir: Path = MODELS_DIR, legacy_model: Path = MODEL,
+                 memory_budget_mb: float = MEMORY_BUDGET_MB, poll_interval_s: float = POLL_INTERVAL_S,
+                 loader: Callable = joblib.load):
+        self.models_dir = Path(models_dir)
+        self.legacy_model = Path(legacy_model)
+        self.memory_budget_bytes = int(memory_budget_mb * 1024 * 1024)
+        self.poll_interval_s = poll_interval_s
+        self.loader = loader
+        self._lock = threading.Lock()
+        self._loaded: "OrderedDict[tuple, tuple]" = OrderedDict()  # (slug, version) -> (model, artifact)
+        self._current: Dict[str, ModelArtifact] = {}  # slug -> artifact currently served
+        self._checked_at: Dict[str, float] = {}
+        self._load_locks: Dict[tuple, threading.Lock] = {}
+        self._warming: set = set()
+        self._failed: Dict[tuple, ModelArtifact] = {}  # (slug, version) -> artifact that failed to load
+        self.loads = 0
+        self.evictions = 0
+
+    def versions(self, region: Optional[str] = None) -> List[ModelArtifact]:
+        """All artifacts on disk for region, oldest first."""
+        slug = region_slug(region)
+        artifacts = []
+        region_dir = self.models_dir / slug
+        if region_dir.is_dir():
+            for path in region_dir.glob('*.joblib'):
+                try:
+                    size = path.stat().st_size
+                except FileNotFoundError:
+                    continue
+                artifacts.append(ModelArtifact(slug, path.stem, path, size))
+        if not artifacts and slug == region_slug(DEFAULT_REGION) and self.legacy_model.exists():
+            # The legacy file is versioned by its modification time, so an
+            # in-place retrain is picked up like a new artifact
+            stat = self.legacy_model.stat()
+            artifacts.append(ModelArtifact(slug, f'legacy-{stat.st_mtime_ns}', self.legacy_model, stat.st_size))
+        return sorted(artifacts, key=lambda a: a.version)
+
+    def _latest(self, slug: str, region: Optional[str]) -> ModelArtifact:
+        now = time.monotonic()
+        current = self._current.get(slug)
+        if current is not None and now - self._checked_at.get(slug, 0.0) < self.poll_interval_s:
+            return current
+        available = self.versions(region)
+        self._checked_at[slug] = now
+        if not available:
+            if current is not None:
+                return current
+            raise KeyError(region or DEFAULT_REGION)
+        return available[-1]
+
+    def get(self, region: Optional[str] = None, version: Optional[str] = None):
+        """
+        Return the model for region (latest version unless pinned), loading it
+        on first use. Raises KeyError when no artifact exists.
+        """
+        slug = region_slug(region)
+        if version is None:
+            artifact = self._latest(slug, region)
+        else:
+            artifact = next((a for a in self.versions(region) if a.version == version), None)
+            if artifact is None:
+                raise KeyError(f'{region or DEFAULT_REGION}@{version}')
+
+        key = (slug, artifact.version)
+        model = self._lookup(key)
+        if model is None:
+            model = self._load(key, artifact)
+
+        if version is None and self._current.get(slug) != artifact:
+            self._swap(slug, artifact)
+        return model
+
+    def get_if_loaded(self, region: Optional[str] = None):
+        """
+        The region's model if it is already in memory, without blocking on a
+        load. A newer or missing artifact is loaded in the background; until it
+        is ready the version currently served (if any) is returned.
+        """
+        slug = region_slug(region)
+        try:
+            artifact = self._latest(slug, region)
+        except KeyError:
+            return None
+        model = self._lookup((slug, artifact.version))
+        if model is not None:
+            if self._current.get(slug) != artifact:
+                self._swap(slug, artifact)
+            return model
+        # An artifact that failed to load is not retried until it changes on disk
+        if self._failed.get((slug, artifact.version)) != artifact:
+            self.preload(region)
+        current = self._current.get(slug)
+        return None if current is None else self._lookup((slug, current.version))
+
+    def served_version(self, region: Optional[str] = None) -> Optional[str]:
+        """Version of the model get_if_loaded() currently returns for region (None before one is loaded)."""
+        current = self._current.get(region_slug(region))
+        return None if current is None else current.version
+
+    def preload(self, region: Optional[str] = None):
+        """Load the region's latest model on a background thread (no-op while one is running)."""
+        slug = region_slug(region)
+        with self._lock:
+            if slug in self._warming:
+                return
+            self._warming.add(slug)
+
+        def warm():
+            try:
+                self.get(region)
+            except Exception as e:
+                print(f'Could not preload model for {slug}: {e}')
+            finally:
+                with self._lock:
+                    self._warming.discard(slug)
+
+        threading.Thread(target=warm, name=f'model-preload-{slug}', daemon=True).start()
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._loaded.get(key)
+            if entry is None:
+                return None
+            self._loaded.move_to_end(key)
+            return entry[0]
+
+    def _load(self, key, artifact: ModelArtifact):
+        # One loader per artifact; concurrent requests wait for it instead of loading twice
+        with self._lock:
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+        with load_lock:
+            model = self._lookup(key)
+            if model is not None:
+                return model
+            try:
+                model = self.loader(artifact.path)
+            except Exception:
+                with self._lock:
+                    self._failed[key] = artifact
+                    self._load_locks.pop(key, None)
+                raise
+            with self._lock:
+                self._failed.pop(key, None)
+                self._loaded[key] = (model, artifact)
+                self.loads += 1
+                self._evict(keep=key)
+                self._load_locks.pop(key, None)
+            return model
+
+    def _swap(self, slug: str, artifact: ModelArtifact):
+        """Point the region at the new artifact and drop the version it replaces."""
+        with self._lock:
+            previous = self._current.get(slug)
+            self._current[slug] = artifact
+            if previous is not None and previous.version != artifact.version:
+                if self._loaded.pop((slug, previous.version), None) is not None:
+                    self.evictions += 1
+
+    def _evict(self, keep):
+        """Drop least-recently-used models until the budget fits; caller holds the lock."""
+        total = sum(a.size_bytes for _, a in self._loaded.values())
+        for key in list(self._loaded):
+            if total <= self.memory_budget_bytes:
+                break
+            if key == keep:
+                continue
+            _, artifact = self._loaded.pop(key)
+            total -= artifact.size_bytes
+            self.evictions += 1
+
+    def refresh(self, region: Optional[str] = None):
+        """Check disk for a newer artifact now instead of waiting for the poll interval."""
+        self._checked_at.pop(region_slug(region), None)
+        return self.get(region)
+
+    def status(self) -> Dict:
+        with self._lock:
+            loaded = [
+                {"region": a.region, "version": a.version, "size_mb": round(a.size_bytes / 1024 / 1024, 2)}
+                for _, a in self._loaded.values()
+            ]
+            return {
+                "loaded_models": loaded,
+                "current_versions": {slug: a.version for slug, a in self._current.items()},
+                "warming": sorted(self._warming),
+                "failed": sorted(f"{slug}@{version}" for slug, version in self._failed),
+                "memory_used_mb": round(sum(m["size_mb"] for m in loaded), 2),
+                "memory_budget_mb": round(self.memory_budget_bytes / 1024 / 1024, 2),
+                "loads": self.loads,
+                "evictions": self.evictions,
+            }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,323 @@
+"""
+Materialized analytics rollups over the hourly carbon-intensity history.
+
+For each granularity (hour_of_day, day, week, month) the store keeps dense
+arrays indexed by bucket id: hour count, green-hour count, and sum/min/max of
+load, renewable share and carbon intensity. Appending hours updates only the
+buckets they fall in, and a query is a slice of those arrays, so serving
+never touches raw hourly data. Hours already folded in can be replaced by
+recomputed values: counts and sums are adjusted by the difference, and the
+min/max of a bucket are rebuilt from the history only when a replaced hour
+held one of them. Saving over the tables a store was loaded from writes only
+the buckets from the first changed one on.
+
+The carbon history names the rollup versions built with it in its meta, so
+publishing a history version publishes its rollups in the same swap; readers
+open the versions it names rather than the rollup tables' own CURRENT.
+"""
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from backend.columnar import append_table, current_version, open_table, write_table
+from backend.history import HISTORY_DIR, bucket_keys, get_history_table
+from backend.registry import region_slug
+
+ROOT = Path(__file__).parent.parent
+ROLLUPS_DIR = ROOT / 'outputs' / 'rollups'
+GRANULARITIES = ('hour_of_day', 'day', 'week', 'month')
+METRICS = ('load_mw', 'renewable_share', 'carbon_intensity')
+
+
+def rollup_keys(ds: np.ndarray, granularity: str) -> np.ndarray:
+    if granularity == 'hour_of_day':
+        return bucket_keys(ds, 'hour') % 24
+    return bucket_keys(ds, granularity)
+
+
+def bucket_start(keys: np.ndarray, granularity: str) -> np.ndarray:
+    """First timestamp of each bucket id (inverse of rollup_keys)."""
+    if granularity == 'day':
+        return keys.astype('datetime64[D]')
+    if granularity == 'week':
+        return (keys * 7 - 3).astype('datetime64[D]')
+    if granularity == 'month':
+        return keys.astype('datetime64[M]').astype('datetime64[D]')
+    raise ValueError(granularity)
+
+
+def history_metrics(columns: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """Per-hour metric values derived from history columns."""
+    load = np.asarray(columns['load_mw'], dtype=float)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        share = np.where(load > 0, np.asarray(columns['renewable_mw'], dtype=float) / load * 100, 0.0)
+    return {
+        'load_mw': load,
+        'renewable_share': share,
+        'carbon_intensity': np.asarray(columns['carbon_intensity'], dtype=float),
+    }
+
+
+class Rollup:
+    """Dense per-bucket aggregates for one granularity, starting at bucket id `offset`."""
+
+    def __init__(self, granularity: str):
+        self.granularity = granularity
+        self.offset = 0
+        self.arrays: Dict[str, np.ndarray] = self._empty(0)
+        # Published table version the arrays were loaded from, and the first
+        # bucket id changed since (None: unchanged)
+        self.version: Optional[str] = None
+        self.changed_from: Optional[int] = None
+
+    @staticmethod
+    def _empty(n: int) -> Dict[str, np.ndarray]:
+        arrays = {'hours': np.zeros(n, dtype=np.int64), 'green_hours': np.zeros(n, dtype=np.int64)}
+        for metric in METRICS:
+            arrays[f'{metric}_sum'] = np.zeros(n)
+            arrays[f'{metric}_count'] = np.zeros(n, dtype=np.int64)
+            arrays[f'{metric}_min'] = np.full(n, np.nan)
+            arrays[f'{metric}_max'] = np.full(n, np.nan)
+        return arrays
+
+    def __len__(self) -> int:
+        return len(self.arrays['hours'])
+
+    def _touch(self, keys: np.ndarray):
+        first = int(keys.min())
+        self.changed_from = first if self.changed_from is None else min(self.changed_from, first)
+
+    def _ensure_range(self, lo: int, hi: int):
+        """Grow the arrays so bucket ids lo..hi are addressable."""
+        if len(self) == 0:
+            self.offset = lo
+            self.arrays = self._empty(hi - lo + 1)
+            return
+        new_lo = min(lo, self.offset)
+        new_hi = max(hi, self.offset + len(self) - 1)
+        if new_lo == self.offset and new_hi == self.offset + len(self) - 1:
+            return
+        grown = self._empty(new_hi - new_lo + 1)
+        start = self.offset - new_lo
+        for name, values in self.arrays.items():
+            grown[name][start:start + len(values)] = values
+        self.offset = new_lo
+        self.arrays = grown
+
+    def add(self, keys: np.ndarray, green: np.ndarray, metrics: Dict[str, np.ndarray]):
+        """Fold new hours into their buckets."""
+        if len(keys) == 0:
+            return
+        self._ensure_range(int(keys.min()), int(keys.max()))
+        self._touch(keys)
+        idx = keys - self.offset
+        n = len(self)
+        self.arrays['hours'] += np.bincount(idx, minlength=n)
+        self.arrays['green_hours'] += np.bincount(idx, weights=green, minlength=n).astype(np.int64)
+        for metric, values in metrics.items():
+            finite = np.isfinite(values)
+            self.arrays[f'{metric}_sum'] += np.bincount(idx, weights=np.where(finite, values, 0.0), minlength=n)
+            self.arrays[f'{metric}_count'] += np.bincount(idx, weights=finite, minlength=n).astype(np.int64)
+            np.fmin.at(self.arrays[f'{metric}_min'], idx, values)
+            np.fmax.at(self.arrays[f'{metric}_max'], idx, values)
+
+    def subtract(self, keys: np.ndarray, green: np.ndarray, metrics: Dict[str, np.ndarray]):
+        """Take hours back out of their buckets' counts and sums; min/max are left to recompute_extremes()."""
+        if len(keys) == 0:
+            return
+        self._touch(keys)
+        idx = keys - self.offset
+        n = len(self)
+        self.arrays['hours'] -= np.bincount(idx, minlength=n)
+        self.arrays['green_hours'] -= np.bincount(idx, weights=green, minlength=n).astype(np.int64)
+        for metric, values in metrics.items():
+            finite = np.isfinite(values)
+            self.arrays[f'{metric}_sum'] -= np.bincount(idx, weights=np.where(finite, values, 0.0), minlength=n)
+            self.arrays[f'{metric}_count'] -= np.bincount(idx, weights=finite, minlength=n).astype(np.int64)
+
+    def stale_extremes(self, keys: np.ndarray, metrics: Dict[str, np.ndarray]) -> np.ndarray:
+        """Bucket ids whose min or max is one of these hours' values, i.e. needs a rebuild once they are removed."""
+        if len(keys) == 0:
+            return keys
+        idx = keys - self.offset
+        stale = np.zeros(len(keys), dtype=bool)
+        for metric, values in metrics.items():
+            stale |= (values == self.arrays[f'{metric}_min'][idx]) | (values == self.arrays[f'{metric}_max'][idx])
+        return np.unique(keys[stale])
+
+    def recompute_extremes(self, buckets: np.ndarray, keys: np.ndarray, metrics: Dict[str, np.ndarray]):
+        """Rebuild min/max of the given bucket ids from hours (keys, metrics) that include all of theirs."""
+        if len(buckets) == 0:
+            return
+        self._touch(buckets)
+        rows = np.isin(keys, buckets)
+        idx = keys[rows] - self.offset
+        for metric, values in metrics.items():
+            self.arrays[f'{metric}_min'][buckets - self.offset] = np.nan
+            self.arrays[f'{metric}_max'][buckets - self.offset] = np.nan
+            np.fmin.at(self.arrays[f'{metric}_min'], idx, values[rows])
+            np.fmax.at(self.arrays[f'{metric}_max'], idx, values[rows])
+
+    def query(self, lo: Optional[int] = None, hi: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """Non-empty buckets with ids in [lo, hi]; cost is proportional to the buckets returned."""
+        start = 0 if lo is None else max(0, lo - self.offset)
+        stop = len(self) if hi is None else max(start, min(len(self), hi - self.offset + 1))
+        window = {name: values[start:stop] for name, values in self.arrays.items()}
+        window['bucket'] = np.arange(start, stop, dtype=np.int64) + self.offset
+        filled = window['hours'] > 0
+        return {name: values[filled] for name, values in window.items()}
+
+
+class RollupStore:
+    """Rollups for every granularity, with incremental append and columnar persistence."""
+
+    def __init__(self):
+        self.rollups = {g: Rollup(g) for g in GRANULARITIES}
+        self.last_ds: Optional[np.datetime64] = None
+        self.version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_history(cls, columns: Dict[str, np.ndarray]) -> 'RollupStore':
+        store = cls()
+        store.append(columns)
+        return store
+
+    def append(self, columns: Dict[str, np.ndarray]):
+        """Add hourly history rows (ds, load_mw, renewable_mw, carbon_intensity, green)."""
+        ds = np.asarray(columns['ds'])
+        if len(ds) == 0:
+            return
+        metrics = history_metrics(columns)
+        green = np.asarray(columns['green'], dtype=np.int64)
+        with self._lock:
+            for granularity, rollup in self.rollups.items():
+                rollup.add(rollup_keys(ds, granularity), green, metrics)
+            latest = ds.max()
+            self.last_ds = latest if self.last_ds is None else max(self.last_ds, latest)
+
+    def replace(self, old: Dict[str, np.ndarray], new: Dict[str, np.ndarray],
+                history: Callable[[Optional[np.datetime64]], Dict[str, np.ndarray]]):
+        """
+        Swap hourly rows already folded in (old) for new rows, e.g. hours
+        recomputed once their real reading replaced an interpolated one.
+        history(since) returns the hourly history after the change from since
+        on (all of it for None); it is only called for buckets whose min or
+        max was one of the replaced hours, to rebuild them.
+        """
+        old_ds = np.asarray(old['ds'])
+        if len(old_ds) == 0:
+            self.append(new)
+            return
+        old_metrics = history_metrics(old)
+        old_green = np.asarray(old['green'], dtype=np.int64)
+        new_ds = np.asarray(new['ds'])
+        new_metrics = history_metrics(new)
+        new_green = np.asarray(new['green'], dtype=np.int64)
+        with self._lock:
+            for granularity, rollup in self.rollups.items():
+                old_keys = rollup_keys(old_ds, granularity)
+                stale = rollup.stale_extremes(old_keys, old_metrics)
+                rollup.subtract(old_keys, old_green, old_metrics)
+                if len(new_ds):
+                    rollup.add(rollup_keys(new_ds, granularity), new_green, new_metrics)
+                if len(stale):
+                    since = None
+                    if granularity != 'hour_of_day':
+                        since = bucket_start(stale[:1], granularity).astype('datetime64[ns]')[0]
+                    rows = history(since)
+                    rollup.recompute_extremes(stale, rollup_keys(np.asarray(rows['ds']), granularity),
+                                              history_metrics(rows))
+            if len(new_ds):
+                # The replaced rows are normally the newest ones, so new ones end the history
+                ends_history = self.last_ds is None or old_ds.max() >= self.last_ds
+                self.last_ds = new_ds.max() if ends_history else max(self.last_ds, new_ds.max())
+
+    def query(self, granularity: str, start: Optional[np.datetime64] = None,
+              end: Optional[np.datetime64] = None) -> Dict[str, np.ndarray]:
+        if granularity not in self.rollups:
+            raise ValueError(f'Unknown granularity {granularity!r}; expected one of {GRANULARITIES}')
+        rollup = self.rollups[granularity]
+        with self._lock:
+            if granularity == 'hour_of_day' or (start is None and end is None):
+                return rollup.query()
+            lo = None if start is None else int(rollup_keys(np.array([start], dtype='datetime64[ns]'), granularity)[0])
+            hi = None if end is None else int(rollup_keys(np.array([end], dtype='datetime64[ns]'), granularity)[0])
+            return rollup.query(lo, hi)
+
+    def save(self, root: Path) -> Dict[str, str]:
+        """
+        Persist each granularity as a columnar table (month last) and return
+        the versions written by granularity. Over the tables the store was
+        loaded from, only buckets from the first changed one on are written.
+        """
+        meta = {'last_ds': None if self.last_ds is None else str(self.last_ds)}
+        versions = {}
+        for granularity in GRANULARITIES:
+            rollup = self.rollups[granularity]
+            table_dir = Path(root) / granularity
+            meta['granularity'] = granularity
+            if rollup.version is not None and (table_dir / rollup.version).is_dir():
+                first = rollup.offset + len(rollup) if rollup.changed_from is None else rollup.changed_from
+                keep = int(np.count_nonzero(rollup.arrays['hours'][:max(0, first - rollup.offset)]))
+                version = append_table(table_dir, rollup.query(lo=first), keep, meta=meta, base=rollup.version)
+            else:
+                version = write_table(table_dir, rollup.query(), meta=meta)
+            rollup.version, rollup.changed_from = version, None
+            versions[granularity] = self.version = version
+        return versions
+
+    @classmethod
+    def load(cls, root: Path, versions: Optional[Dict[str, str]] = None) -> 'RollupStore':
+        """Load the given versions by granularity (the published ones by default)."""
+        store = cls()
+        for granularity in GRANULARITIES:
+            table = open_table(Path(root) / granularity, (versions or {}).get(granularity))
+            rollup = store.rollups[granularity]
+            buckets = np.asarray(table['bucket'])
+            if len(buckets):
+                rollup._ensure_range(int(buckets.min()), int(buckets.max()))
+                idx = buckets - rollup.offset
+                for name in rollup.arrays:
+                    rollup.arrays[name][idx] = table[name]
+            last_ds = table.meta.get('last_ds')
+            store.last_ds = None if last_ds is None else np.datetime64(last_ds, 'ns')
+            rollup.version = store.version = table.version
+        return store
+
+
+_stores: Dict[str, RollupStore] = {}
+_stores_lock = threading.Lock()
+
+
+def history_rollups(region: Optional[str] = None, history_dir: Path = HISTORY_DIR) -> Optional[Dict[str, str]]:
+    """Rollup versions the region's published history was built with (None if it names none)."""
+    try:
+        return get_history_table(region, history_dir).meta.get('rollups')
+    except FileNotFoundError:
+        return None
+
+
+def get_rollups(region: Optional[str] = None, rollups_dir: Path = ROLLUPS_DIR,
+                history_dir: Path = HISTORY_DIR) -> RollupStore:
+    """
+    Return the region's rollups, loading them once per published version: the
+    versions named by the published history, or the latest ones for a history
+    that names none.
+    """
+    root = Path(rollups_dir) / region_slug(region)
+    versions = history_rollups(region, history_dir)
+    version = versions[GRANULARITIES[-1]] if versions else current_version(root / GRANULARITIES[-1])
+    if version is None:
+        raise FileNotFoundError(root)
+    key = str(root)
+    store = _stores.get(key)
+    if store is None or store.version != version:
+        with _stores_lock:
+            store = _stores.get(key)
+            if store is None or store.version != version:
+                store = RollupStore.load(root, versions)
+                _stores[key] = store
+    return store
@@ -0,0 +1,148 @@
+"""
+What-if scenarios over a forecast.
+
+A scenario scales the forecast: demand_growth multiplies the load by
+(1 + growth), renewable_scale multiplies the renewable baseload (a build-out
+of 1.5 is 50% more renewable supply) and emission_factor replaces the
+gCO2/kWh of fossil generation. A batch of S scenarios is evaluated against H
+forecast hours as (S x H) arrays: intensity, green hours (intensity below the
+baseline threshold) and, per scenario, the top_k non-overlapping windows of
+window_hours consecutive hours with the lowest mean intensity.
+
+With a merit order (backend/dispatch.py) the fossil share of every scenario
+and hour is dispatched across the units in one searchsorted pass instead,
+and emission_factor does not apply.
+"""
+from typing import Dict, Tuple
+
+import numpy as np
+
+from backend.forecast_records import FOSSIL_INTENSITY
+
+PARAMETERS = ('emission_factor', 'renewable_scale', 'demand_growth')
+DEFAULTS = {'emission_factor': FOSSIL_INTENSITY, 'renewable_scale': 1.0, 'demand_growth': 0.0}
+
+
+def grid_size(emission_factor=None, renewable_scale=None, demand_growth=None) -> int:
+    """Number of scenarios scenario_grid() would build, without building them."""
+    size = 1
+    for values in (emission_factor, renewable_scale, demand_growth):
+        size *= 1 if values is None or len(values) == 0 else len(values)
+    return size
+
+
+def scenario_grid(emission_factor=None, renewable_scale=None, demand_growth=None) -> Dict[str, np.ndarray]:
+    """Every combination of the given parameter values (defaults for parameters left out)."""
+    values = {'emission_factor': emission_factor, 'renewable_scale': renewable_scale,
+              'demand_growth': demand_growth}
+    axes = [np.asarray([DEFAULTS[name]] if values[name] is None or len(values[name]) == 0 else values[name],
+                       dtype=float) for name in PARAMETERS]
+    mesh = np.meshgrid(*axes, indexing='ij')
+    return {name: grid.ravel() for name, grid in zip(PARAMETERS, mesh)}
+
+
+def scenario_intensity(load: np.ndarray, renewable: np.ndarray, emission_factor: np.ndarray,
+                       renewable_scale: np.ndarray, demand_growth: np.ndarray,
+                       dispatch=None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    (scenarios x hours) average and marginal carbon intensity in gCO2/kWh;
+    NaN where the scaled load is not positive.
+    """
+    scaled_load = np.multiply.outer(1.0 + demand_growth, load)
+    fossil = np.maximum(scaled_load - np.multiply.outer(renewable_scale, renewable), 0.0)
+    if dispatch is not None:
+        return dispatch.intensity(fossil, scaled_load)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        intensity = np.where(scaled_load > 0, fossil * emission_factor[:, None] / scaled_load, np.nan)
+    return intensity, np.where(scaled_load > 0, emission_factor[:, None], np.nan)
+
+
+def best_windows(intensity: np.ndarray, window_hours: int, top_k: int) -> Dict[str, np.ndarray]:
+    """
+    Per scenario, the top_k non-overlapping runs of window_hours hours with
+    the lowest mean intensity, cleanest first; hours with unknown intensity
+    are never chosen.
+
+    Returns:
+        dict of (scenarios x top_k) arrays: start (hour position, -1 when
+        fewer windows fit) and avg_carbon_intensity (NaN when absent)
+    """
+    scenarios, hours = intensity.shape
+    width = hours - window_hours + 1
+    start = np.full((scenarios, top_k), -1, dtype=np.int64)
+    mean = np.full((scenarios, top_k), np.nan)
+    if width <= 0:
+        return {'start': start, 'avg_carbon_intensity': mean}
+
+    # Rolling means from cumulative sums; a window with an unknown hour is unusable
+    known = np.isfinite(intensity)
+    total = np.concatenate([np.zeros((scenarios, 1)), np.cumsum(np.where(known, intensity, 0.0), axis=1)], axis=1)
+    missing = np.concatenate([np.zeros((scenarios, 1), dtype=np.int64), np.cumsum(~known, axis=1)], axis=1)
+    rolling = (total[:, window_hours:] - total[:, :width]) / window_hours
+    rolling[(missing[:, window_hours:] - missing[:, :width]) > 0] = np.inf
+
+    # Greedy selection, one window per step for all scenarios at once: take
+    # the cleanest start, then rule out the starts that would overlap it
+    rows = np.arange(scenarios)
+    offsets = np.arange(-window_hours + 1, window_hours)
+    for k in range(min(top_k, width)):
+        best = np.argmin(rolling, axis=1)
+        value = rolling[rows, best]
+        found = np.isfinite(value)
+        start[found, k] = best[found]
+        mean[found, k] = value[found]
+        blocked = best[:, None] + offsets
+        valid = (blocked >= 0) & (blocked < width)
+        rolling[np.broadcast_to(rows[:, None], blocked.shape)[valid], blocked[valid]] = np.inf
+    return {'start': start, 'avg_carbon_intensity': mean}
+
+
+def evaluate_scenarios(load: np.ndarray, renewable: np.ndarray, threshold,
+                       scenarios: Dict[str, np.ndarray], window_hours: int = 1,
+                       top_k: int = 3, dispatch=None) -> Dict[str, np.ndarray]:
+    """
+    Evaluate a batch of scenarios against a forecast.
+
+    Args:
+        load (np.ndarray): forecast load per hour (MW)
+        renewable (np.ndarray): renewable baseload per hour (MW)
+        threshold (float or np.ndarray): intensity below which an hour is
+            green (gCO2/kWh), one value or one per hour
+        scenarios (dict): parameter name -> one value per scenario (see PARAMETERS)
+        window_hours (int): length of the best windows
+        top_k (int): best windows per scenario
+        dispatch (MeritOrder): fossil units to dispatch, instead of emission_factor
+
+    Returns:
+        dict of arrays: intensity, marginal_intensity and green (scenarios
+        x hours), green_hours, avg_carbon_intensity, avg_marginal_intensity
+        and renewable_share (per scenario), and the best windows' start and avg_carbon_intensity
+        (scenarios x top_k)
+    """
+    load = np.asarray(load, dtype=float)
+    renewable = np.asarray(renewable, dtype=float)
+    n = len(next(iter(scenarios.values())))
+    params = {name: np.asarray(scenarios.get(name, np.full(n, DEFAULTS[name])), dtype=float) for name in PARAMETERS}
+
+    intensity, marginal = scenario_intensity(load, renewable, **params, dispatch=dispatch)
+    green = intensity < threshold
+    known = np.isfinite(intensity)
+    scaled_load = np.multiply.outer(1.0 + params['demand_growth'], load)
+    supplied = np.minimum(np.multiply.outer(params['renewable_scale'], renewable), scaled_load)
+    total_load = scaled_load.sum(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        renewable_share = np.where(total_load > 0, supplied.sum(axis=1) / total_load * 100, 0.0)
+        avg = np.where(known, intensity, 0.0).sum(axis=1) / known.sum(axis=1)
+        avg_marginal = np.where(known, marginal, 0.0).sum(axis=1) / known.sum(axis=1)
+    windows = best_windows(intensity, window_hours, top_k)
+    return {
+        'intensity': intensity,
+        'marginal_intensity': marginal,
+        'green': green,
+        'green_hours': green.sum(axis=1),
+        'avg_carbon_intensity': avg,
+        'avg_marginal_intensity': avg_marginal,
+        'renewable_share': renewable_share,
+        'window_start': windows['start'],
+        'window_avg_carbon_intensity': windows['avg_carbon_intensity'],
+    }
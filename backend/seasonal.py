@@ -0,0 +1,93 @@
+"""
+Region x month renewable baseline table, loaded once and shared by all requests.
+
+The table comes from outputs/seasonal_baseline_by_region.json written by
+ml_models/seasonal_supply_model_builder.py. When only the single-region
+outputs/seasonal_baseline.json exists it is served as DEFAULT_REGION.
+"""
+import json
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+SEASONAL = ROOT / 'outputs' / 'seasonal_baseline.json'
+REGIONAL_SEASONAL = ROOT / 'outputs' / 'seasonal_baseline_by_region.json'
+DEFAULT_REGION = 'Nova Scotia'
+
+
+def normalize_region(region: str) -> str:
+    """Case/separator-insensitive key, so 'nova-scotia' matches 'Nova Scotia'."""
+    return ' '.join(region.replace('-', ' ').replace('_', ' ').lower().split())
+
+
+class BaselineTable:
+    """Monthly renewable baseline (MW) per region as a dense (regions x 12) array."""
+
+    def __init__(self, regions: List[str], values: np.ndarray):
+        self.regions = list(regions)
+        self.values = np.asarray(values, dtype=float).reshape(len(self.regions), 12)
+        self._index = {normalize_region(r): i for i, r in enumerate(self.regions)}
+
+    @classmethod
+    def from_files(cls, regional_path: Path = REGIONAL_SEASONAL, seasonal_path: Path = SEASONAL) -> 'BaselineTable':
+        if regional_path.exists():
+            with open(regional_path, 'r') as f:
+                data = json.load(f)
+            months = [int(m) for m in data['months']]
+            regions = list(data['regions'])
+            values = np.zeros((len(regions), 12))
+            for i, region in enumerate(regions):
+                row = np.array([np.nan if v is None else v for v in data['regions'][region]], dtype=float)
+                values[i, np.array(months) - 1] = np.nan_to_num(row, nan=0.0)
+            return cls(regions, values)
+
+        with open(seasonal_path, 'r') as f:
+            seasonal = json.load(f)
+        row = [float(seasonal.get(str(m)) or seasonal.get(m) or 0.0) for m in range(1, 13)]
+        return cls([DEFAULT_REGION], np.array([row]))
+
+    def row(self, region: Optional[str] = None) -> np.ndarray:
+        """12 monthly values for region; raises KeyError for unknown regions."""
+        key = normalize_region(region or DEFAULT_REGION)
+        if key not in self._index:
+            raise KeyError(region)
+        return self.values[self._index[key]]
+
+    def lookup(self, region: Optional[str], months) -> np.ndarray:
+        """Vectorized baseline lookup for an array of month numbers (1-12)."""
+        return self.row(region)[np.asarray(months, dtype=int) - 1]
+
+    def to_dict(self, region: Optional[str] = None) -> Dict[str, float]:
+        """Month -> value mapping in the seasonal_baseline.json layout."""
+        return {str(m): float(v) for m, v in enumerate(self.row(region), start=1)}
+
+
+_table: Optional[BaselineTable] = None
+_table_mtime: Optional[float] = None
+_table_lock = threading.Lock()
+
+
+def _source_mtime() -> Optional[float]:
+    for path in (REGIONAL_SEASONAL, SEASONAL):
+        if path.exists():
+            return path.stat().st_mtime
+    return None
+
+
+def get_baseline_table() -> BaselineTable:
+    """
+    Return the shared baseline table, loading it on first use and reloading it
+    only when the builder has written a newer file.
+    """
+    global _table, _table_mtime
+    mtime = _source_mtime()
+    if _table is not None and mtime == _table_mtime:
+        return _table
+    with _table_lock:
+        if _table is None or mtime != _table_mtime:
+            _table = BaselineTable.from_files()
+            _table_mtime = mtime
+    return _table
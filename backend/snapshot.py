@@ -0,0 +1,153 @@
+"""
+Versioned snapshot of the green-window pipeline output.
+
+ml_models/compute_green_window.py publishes each run as one columnar table
+(outputs/snapshots/<version>/): the hourly forecast columns plus the window
+metadata in meta.json. Publishing is an atomic swap of CURRENT, so readers
+always see a complete, self-consistent set. The backend memory-maps a version
+once and serves it until a newer one is published.
+
+Snapshots are not committed. When none has been published, the backend
+publishes the committed classification JSON the pipeline also writes
+(outputs/complete_window_classification.json, plus aura_green_window.json for
+the best window) as the initial snapshot at startup; reads never write.
+"""
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from backend.columnar import ColumnTable, current_version, open_table, write_table
+
+ROOT = Path(__file__).parent.parent
+SNAPSHOT_DIR = Path(os.environ.get('AURA_SNAPSHOT_DIR', ROOT / 'outputs' / 'snapshots'))
+CLASSIFICATION_FILE = ROOT / 'outputs' / 'complete_window_classification.json'
+GREEN_WINDOW_FILE = ROOT / 'outputs' / 'aura_green_window.json'
+SNAPSHOT_COLUMNS = (
+    'ds', 'forecast_load_mw', 'renewable_baseload_mw', 'fossil_fuel_mw', 'carbon_intensity_gco2_per_kwh', 'green'
+)
+
+_snapshot: Optional[ColumnTable] = None
+_snapshot_lock = threading.Lock()
+
+
+def write_snapshot(columns: Dict[str, np.ndarray], meta: Dict, snapshot_dir: Path = SNAPSHOT_DIR) -> str:
+    """Publish a pipeline run; columns must hold SNAPSHOT_COLUMNS. Returns the version."""
+    missing = set(SNAPSHOT_COLUMNS) - set(columns)
+    if missing:
+        raise ValueError(f'Snapshot is missing columns: {sorted(missing)}')
+    table = {name: columns[name] for name in SNAPSHOT_COLUMNS}
+    table['ds'] = np.asarray(table['ds'], dtype='datetime64[ns]')
+    table['green'] = np.asarray(table['green'], dtype=np.uint8)
+    return write_table(snapshot_dir, table, meta=meta)
+
+
+def seed_snapshot(snapshot_dir: Optional[Path] = None, classification_file: Optional[Path] = None,
+                  green_window_file: Optional[Path] = None) -> Optional[str]:
+    """
+    Publish the classification JSON as a snapshot. Returns the version, or
+    None when the file does not exist.
+    """
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    classification_file = Path(classification_file or CLASSIFICATION_FILE)
+    green_window_file = Path(green_window_file or GREEN_WINDOW_FILE)
+    if not classification_file.exists():
+        return None
+    with open(classification_file) as f:
+        classification = json.load(f)
+    rows = classification['hourly_classifications']
+    timestamps = [row['timestamp'] for row in rows]
+    columns = {name: np.array([row[name] for row in rows], dtype=float) for name in SNAPSHOT_COLUMNS[1:-1]}
+    columns['ds'] = np.array(timestamps, dtype='datetime64[ns]')
+    columns['green'] = np.array([row['window_type'] == 'green_window' for row in rows])
+
+    meta = {
+        'seeded_from': classification_file.name,
+        'baseline_threshold': classification['forecast_period'].get('baseline_threshold'),
+        'forecast_period': classification['forecast_period'],
+    }
+    if green_window_file.exists():
+        with open(green_window_file) as f:
+            window = json.load(f)
+        position = {timestamp: i for i, timestamp in enumerate(timestamps)}
+        meta['best_window'] = {
+            'start': window['start'],
+            'end': window['end'],
+            'avg_carbon_intensity_gco2_per_kwh': window['avg_carbon_intensity_gco2_per_kwh'],
+            'length_hours': window['length_hours'],
+            'window_type': window['window_type'],
+            'positions': [position[row['ds']] for row in window.get('rows', []) if row['ds'] in position],
+        }
+        meta['total_green_windows'] = window.get('total_green_windows', 0)
+        meta['top_windows'] = window.get('top_windows', [])
+    return write_snapshot(columns, meta=meta, snapshot_dir=snapshot_dir)
+
+
+def ensure_snapshot(snapshot_dir: Optional[Path] = None) -> Optional[str]:
+    """
+    Seed the snapshot from the classification JSON unless a version is already
+    published. Returns the published version, or None when there is neither.
+    """
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    with _snapshot_lock:
+        return current_version(snapshot_dir) or seed_snapshot(snapshot_dir)
+
+
+def get_snapshot(snapshot_dir: Optional[Path] = None) -> ColumnTable:
+    """
+    The published snapshot, memory-mapped once per version. Raises
+    FileNotFoundError if none has been published.
+    """
+    global _snapshot
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    version = current_version(snapshot_dir)
+    if version is None:
+        raise FileNotFoundError(Path(snapshot_dir) / 'CURRENT')
+    snapshot = _snapshot
+    if snapshot is None or snapshot.version != version or snapshot.root != Path(snapshot_dir):
+        with _snapshot_lock:
+            snapshot = _snapshot
+            if snapshot is None or snapshot.version != version or snapshot.root != Path(snapshot_dir):
+                snapshot = open_table(snapshot_dir, version)
+                _snapshot = snapshot
+    return snapshot
+
+
+def read_snapshot(version: str, snapshot_dir: Optional[Path] = None) -> ColumnTable:
+    """A specific published version (the cached one when it is current). Raises FileNotFoundError if pruned."""
+    snapshot_dir = snapshot_dir or SNAPSHOT_DIR
+    snapshot = _snapshot
+    if snapshot is not None and snapshot.version == version and snapshot.root == Path(snapshot_dir):
+        return snapshot
+    return open_table(snapshot_dir, version)
+
+
+def _records(snapshot: ColumnTable, positions: Optional[np.ndarray], time_key: str, with_hour: bool) -> List[Dict]:
+    index = slice(None) if positions is None else np.asarray(positions, dtype=np.int64)
+    ds = np.asarray(snapshot['ds'][index])
+    green = np.asarray(snapshot['green'][index]).astype(bool)
+    columns = {time_key: np.datetime_as_string(ds, unit='s').tolist()}
+    if with_hour:
+        columns['hour'] = (ds.astype('datetime64[h]').astype(np.int64) % 24).tolist()
+    columns.update({
+        'forecast_load_mw': np.asarray(snapshot['forecast_load_mw'][index]).tolist(),
+        'renewable_baseload_mw': np.asarray(snapshot['renewable_baseload_mw'][index]).tolist(),
+        'fossil_fuel_mw': np.asarray(snapshot['fossil_fuel_mw'][index]).tolist(),
+        'carbon_intensity_gco2_per_kwh': np.asarray(snapshot['carbon_intensity_gco2_per_kwh'][index]).tolist(),
+        'window_type': np.where(green, 'green_window', 'dirty_window').tolist(),
+    })
+    names = list(columns)
+    return [dict(zip(names, values)) for values in zip(*columns.values())]
+
+
+def hourly_records(snapshot: ColumnTable) -> List[Dict]:
+    """Every forecast hour as a row (timestamp, hour, load, mix, intensity, window_type)."""
+    return _records(snapshot, None, 'timestamp', with_hour=True)
+
+
+def window_records(snapshot: ColumnTable) -> List[Dict]:
+    """Rows of the best window recorded in the snapshot metadata."""
+    return _records(snapshot, snapshot.meta['best_window']['positions'], 'ds', with_hour=False)
@@ -0,0 +1,281 @@
+"""
+Aggregate interval smart-meter data into the hourly load series.
+
+Input is any number of CSV files (optionally compressed) with one row per
+meter and interval: a timestamp, the energy (kWh) or average demand (kW) of
+the interval and, optionally, the feeder the meter is on. Files are streamed
+in chunks of --chunk-rows, one file per worker process, and every chunk is
+folded into dense per-hour (and per-feeder) sums with np.bincount, so memory
+is bounded by the chunk size plus the hourly output - never by the input.
+A file is never split between workers: one large file is read by a single
+process, so split big exports into several files to use more workers.
+
+The result is written in the format of data/hourly_load_data.csv (Date/time
+labels the hour ending at that time, Load [MW] is the average load over the
+hour), which load_load_series() and the trainer read unchanged: total.csv for
+all meters and, with --by-feeder, one feeder_<name>.csv per feeder (see
+feeder_files() for ids that share a name and readings without a feeder).
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import glob
+import hashlib
+import os
+import re
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from backend.live_load import append_readings, to_hours
+
+OUTPUTS_DIR = ROOT / 'outputs'
+OUT_DIR = OUTPUTS_DIR / 'meter_hourly'
+CHUNK_ROWS = 1_000_000
+INTERVAL_MINUTES = 15
+ALL_METERS = '__all__'
+# Feeder of readings whose feeder id is missing
+MISSING_FEEDER = '__missing__'
+
+
+def feeder_slug(name) -> str:
+    return re.sub(r'[^a-z0-9]+', '_', str(name).strip().lower()).strip('_') or 'unknown'
+
+
+def feeder_files(names) -> dict:
+    """
+    CSV file name per feeder: feeder_<slug>.csv, with a hash of the id
+    appended when several ids share a slug (e.g. "A-1" and "a 1"), and
+    feeder__missing.csv for readings without a feeder id (a slug never starts
+    with an underscore, so no real feeder can take that name).
+    """
+    by_slug = {}
+    for name in names:
+        if name != MISSING_FEEDER:
+            by_slug.setdefault(feeder_slug(name), []).append(name)
+    files = {MISSING_FEEDER: 'feeder__missing.csv'} if MISSING_FEEDER in names else {}
+    for slug, shared in by_slug.items():
+        for name in shared:
+            if len(shared) == 1:
+                files[name] = f'feeder_{slug}.csv'
+            else:
+                digest = hashlib.sha1(str(name).encode('utf-8')).hexdigest()[:8]
+                files[name] = f'feeder_{slug}_{digest}.csv'
+    return files
+
+
+class HourlyTotals:
+    """Energy (kWh) and reading count per hour and feeder over a growing range of hours."""
+
+    def __init__(self):
+        self.start = None  # first hour (hours since the epoch, hour starting)
+        self.length = 0
+        self.feeders = {}  # feeder -> (kwh, readings) arrays of self.length hours
+        self.rows = 0
+        self.skipped = 0
+
+    def __len__(self):
+        return self.length
+
+    def _cover(self, lo: int, hi: int):
+        """Grow every feeder's arrays to span hours lo..hi."""
+        if self.start is None:
+            self.start, self.length = lo, hi - lo + 1
+            return
+        start = min(self.start, lo)
+        end = max(self.start + self.length, hi + 1)
+        if start == self.start and end == self.start + self.length:
+            return
+        before = self.start - start
+        for name, (kwh, readings) in self.feeders.items():
+            grown_kwh = np.zeros(end - start)
+            grown_readings = np.zeros(end - start, dtype=np.int64)
+            grown_kwh[before:before + self.length] = kwh
+            grown_readings[before:before + self.length] = readings
+            self.feeders[name] = (grown_kwh, grown_readings)
+        self.start, self.length = start, end - start
+
+    def _feeder(self, name):
+        if name not in self.feeders:
+            self.feeders[name] = (np.zeros(self.length), np.zeros(self.length, dtype=np.int64))
+        return self.feeders[name]
+
+    def add(self, hours: np.ndarray, kwh: np.ndarray, feeder_codes: np.ndarray, feeder_names):
+        """Fold in readings: hour (since the epoch) and kWh per reading, feeder as factorized codes."""
+        if len(hours) == 0:
+            return
+        lo, hi = int(hours.min()), int(hours.max())
+        span = hi - lo + 1
+        self._cover(lo, hi)
+        slots = feeder_codes.astype(np.int64) * span + (hours - lo)
+        size = len(feeder_names) * span
+        sums = np.bincount(slots, weights=kwh, minlength=size).reshape(len(feeder_names), span)
+        counts = np.bincount(slots, minlength=size).reshape(len(feeder_names), span)
+        offset = lo - self.start
+        for i, name in enumerate(feeder_names):
+            feeder_kwh, feeder_readings = self._feeder(name)
+            feeder_kwh[offset:offset + span] += sums[i]
+            feeder_readings[offset:offset + span] += counts[i]
+
+    def merge(self, other: 'HourlyTotals'):
+        self.rows += other.rows
+        self.skipped += other.skipped
+        if other.start is None:
+            return
+        self._cover(other.start, other.start + other.length - 1)
+        offset = other.start - self.start
+        for name, (kwh, readings) in other.feeders.items():
+            feeder_kwh, feeder_readings = self._feeder(name)
+            feeder_kwh[offset:offset + other.length] += kwh
+            feeder_readings[offset:offset + other.length] += readings
+
+    def series(self, feeder=None) -> pd.DataFrame:
+        """
+        Hourly load of one feeder (all feeders by default) in the load CSV
+        format: Date/time (hour ending), Load [MW], Readings.
+        """
+        names = list(self.feeders) if feeder is None else [feeder]
+        kwh = np.sum([self.feeders[name][0] for name in names], axis=0)
+        readings = np.sum([self.feeders[name][1] for name in names], axis=0)
+        hour_ending = (np.datetime64(self.start, 'h') + np.arange(1, len(kwh) + 1)).astype('datetime64[m]')
+        return pd.DataFrame({
+            'Date/time': pd.DatetimeIndex(hour_ending).strftime('%Y-%m-%d %H:%M'),
+            # kWh in one hour / 1000 = average MW over the hour
+            'Load [MW]': np.round(kwh / 1000.0, 4),
+            'Readings': readings,
+        })
+
+
+def aggregate_file(task) -> HourlyTotals:
+    """Stream one interval file in chunks into hourly totals (runs in a worker process)."""
+    path, options = task
+    totals = HourlyTotals()
+    columns = [options['timestamp_col'], options['value_col']]
+    if options['feeder_col']:
+        columns.append(options['feeder_col'])
+    interval = np.timedelta64(options['interval_minutes'], 'm')
+    for chunk in pd.read_csv(path, usecols=columns, chunksize=options['chunk_rows']):
+        ds = pd.to_datetime(chunk[options['timestamp_col']], format=options['timestamp_format'], errors='coerce')
+        ds = ds.to_numpy(dtype='datetime64[ns]')
+        if options['interval_ending']:
+            ds = ds - interval
+        value = pd.to_numeric(chunk[options['value_col']], errors='coerce').to_numpy(dtype=float)
+        valid = ~np.isnat(ds) & np.isfinite(value)
+        kwh = value[valid] if options['unit'] == 'kwh' else value[valid] * options['interval_minutes'] / 60.0
+        if options['feeder_col']:
+            codes, names = pd.factorize(chunk[options['feeder_col']].to_numpy()[valid])
+            names = [str(name) for name in names]
+            if (codes < 0).any():
+                codes = np.where(codes < 0, len(names), codes)
+                names.append(MISSING_FEEDER)
+        else:
+            codes, names = np.zeros(int(valid.sum()), dtype=np.int64), [ALL_METERS]
+        totals.add(to_hours(ds[valid]), kwh, codes, names)
+        totals.rows += len(chunk)
+        totals.skipped += int((~valid).sum())
+    return totals
+
+
+def aggregate(paths, options, workers=None) -> HourlyTotals:
+    """
+    Hourly totals of all files, one file per worker process: at most
+    len(paths) workers are used, however large each file is.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    totals = HourlyTotals()
+    tasks = [(path, options) for path in paths]
+    if workers == 1:
+        for task in tasks:
+            totals.merge(aggregate_file(task))
+        return totals
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for partial in pool.map(aggregate_file, tasks):
+            totals.merge(partial)
+    return totals
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Aggregate interval smart-meter files into hourly load")
+    arg_parser.add_argument("inputs", nargs='+', help="interval CSV files or glob patterns")
+    arg_parser.add_argument("--timestamp-col", default='timestamp', help="interval timestamp column")
+    arg_parser.add_argument("--timestamp-format", default='ISO8601', help="strftime format of the timestamps")
+    arg_parser.add_argument("--value-col", default='kwh', help="energy or demand column")
+    arg_parser.add_argument("--unit", choices=('kwh', 'kw'), default='kwh',
+                            help="kwh: energy per interval; kw: average demand over the interval")
+    arg_parser.add_argument("--interval-minutes", type=int, default=INTERVAL_MINUTES, help="meter interval length")
+    arg_parser.add_argument("--interval-ending", action='store_true',
+                            help="timestamps mark the end of the interval (default: the start)")
+    arg_parser.add_argument("--feeder-col", default='feeder_id', help="feeder column (used with --by-feeder)")
+    arg_parser.add_argument("--by-feeder", action='store_true', help="also write one series per feeder")
+    arg_parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="rows read at a time per file")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (at most one per input file)")
+    arg_parser.add_argument("--output-dir", default=str(OUT_DIR), help="directory for the hourly CSVs")
+    arg_parser.add_argument("--append-live", action='store_true',
+                            help="also append the total series to the live readings log used by the backend")
+    args = arg_parser.parse_args()
+
+    paths = sorted({p for pattern in args.inputs for p in (glob.glob(pattern) or [pattern])})
+    missing = [p for p in paths if not Path(p).exists()]
+    if missing:
+        print('Input files not found:', ', '.join(missing))
+        sys.exit(1)
+
+    options = {
+        'timestamp_col': args.timestamp_col,
+        'timestamp_format': args.timestamp_format,
+        'value_col': args.value_col,
+        'unit': args.unit,
+        'interval_minutes': args.interval_minutes,
+        'interval_ending': args.interval_ending,
+        'feeder_col': args.feeder_col if args.by_feeder else None,
+        'chunk_rows': args.chunk_rows,
+    }
+    print(f'Aggregating {len(paths)} files with {args.workers} workers...')
+    start = time.perf_counter()
+    totals = aggregate(paths, options, args.workers)
+    elapsed = time.perf_counter() - start
+    if totals.start is None:
+        print('No valid readings found.')
+        sys.exit(1)
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    total = totals.series()
+    total.to_csv(output_dir / 'total.csv', index=False)
+    print('Wrote', output_dir / 'total.csv')
+    if args.by_feeder:
+        files = feeder_files(sorted(totals.feeders))
+        for name, file_name in files.items():
+            totals.series(name).to_csv(output_dir / file_name, index=False)
+        print(f'Wrote {len(totals.feeders)} feeder series to', output_dir)
+        hashed = [name for name, file_name in files.items()
+                  if name != MISSING_FEEDER and file_name != f'feeder_{feeder_slug(name)}.csv']
+        if hashed:
+            print('Feeder ids sharing a file name, written with a hash of the id:',
+                  ', '.join(f'{name!r} -> {files[name]}' for name in hashed))
+        if MISSING_FEEDER in files:
+            print('Readings without a feeder id written to', files[MISSING_FEEDER])
+
+    # Hours with fewer readings than usual are missing meters or intervals
+    readings = total['Readings'].to_numpy()
+    typical = int(np.median(readings[readings > 0]))
+    incomplete = int((readings < typical).sum())
+
+    print(f'{totals.rows:,} rows -> {len(total):,} hours in {elapsed:.1f} s '
+          f'({totals.rows / elapsed:,.0f} rows/s), {totals.skipped:,} rows without a valid timestamp or value')
+    print(f'{total["Date/time"].iloc[0]} .. {total["Date/time"].iloc[-1]}, '
+          f'{typical} readings in a typical hour, {incomplete} hours with fewer')
+
+    if args.append_live:
+        covered = total[total['Readings'] > 0]
+        ds = pd.to_datetime(covered['Date/time']).to_numpy()
+        append_readings(to_hours(ds), covered['Load [MW]'].to_numpy(dtype=float))
+        print('Appended', len(covered), 'hours to the live readings log (hours already observed are ignored)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,167 @@
+from pathlib import Path
+import argparse
+import sys
+import time
+import numpy as np
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from backend.columnar import append_table, current_version, open_table, update_lock, write_table
+from backend.dispatch import load_dispatch
+from backend.forecast_records import FOSSIL_INTENSITY, classify_hours
+from backend.registry import region_slug
+from backend.rollups import RollupStore, ROLLUPS_DIR
+from backend.seasonal import BaselineTable, DEFAULT_REGION
+from ml_models.compute_green_window import load_load_series
+
+OUTPUTS_DIR = ROOT / 'outputs'
+HISTORY_DIR = OUTPUTS_DIR / 'carbon_history'
+FOSSIL_GCO2_PER_KWH = FOSSIL_INTENSITY
+
+
+def compute_history(ds, load_mw, baselines, dispatch=None):
+    """
+    Carbon intensity and green/dirty class for every hour of a load series in
+    one vectorized pass.
+
+    Args:
+        ds (np.ndarray): datetime64 timestamps, sorted ascending
+        load_mw (np.ndarray): hourly load (MW)
+        baselines (np.ndarray): 12 monthly renewable baselines (MW), January first
+        dispatch (MeritOrder): fossil units stacked in merit order instead of
+            one emission factor
+
+    Returns:
+        dict: column name -> array, ready for the columnar store
+    """
+    load_mw = np.asarray(load_mw, dtype=float)
+    months = (ds.astype('datetime64[M]').astype(int) % 12)  # 0 = January
+    renewable_mw = baselines[months]
+    fossil_mw = np.clip(load_mw - renewable_mw, 0.0, None)
+    if dispatch is not None:
+        intensity = dispatch.intensity(fossil_mw, load_mw)[0]
+    else:
+        with np.errstate(divide='ignore', invalid='ignore'):
+            intensity = np.where(load_mw > 0, fossil_mw * FOSSIL_GCO2_PER_KWH / load_mw, np.nan)
+    # Same rule as compute_green_window and the endpoints: green when below that month's baseline
+    green = classify_hours(ds, intensity, baselines)
+    return {
+        'ds': ds.astype('datetime64[ns]'),
+        'load_mw': load_mw,
+        'renewable_mw': renewable_mw,
+        'fossil_mw': fossil_mw,
+        'carbon_intensity': intensity,
+        'green': green,
+    }
+
+
+def backfill(region=None, history_dir=HISTORY_DIR, rollups_dir=ROLLUPS_DIR, incremental=False, dispatch=None,
+             series=None, since=None):
+    """
+    Compute the carbon-intensity history for a region, publish it, and update
+    the analytics rollups. With incremental=True only hours after the end of
+    the published history are computed and folded into the existing rollups;
+    when there are none, nothing is published (an empty or missing history is
+    rebuilt in full). since (a timestamp) also recomputes the published hours
+    from then on, e.g. hours that were interpolated until their reading
+    arrived: their rows are rewritten and taken out of the rollups before the
+    new values go in. An incremental run writes only the changed tail of the
+    history and rollup tables. The rollups are written first and named in the
+    history's meta, so publishing the history publishes both at once. Runs for
+    a region are serialised by a lock on its history directory. A dispatch merit order replaces the single emission
+    factor. series is the region's (ds, load_mw) arrays, e.g. the backend's
+    live series; by default the load CSV, which is the default region's.
+    """
+    region = region or DEFAULT_REGION
+    if series is None:
+        if region_slug(region) != region_slug(DEFAULT_REGION):
+            raise ValueError(f'The load CSV is {DEFAULT_REGION}\'s series; pass series=(ds, load_mw) for {region}')
+        df = load_load_series()
+        series = (df.index.values, df['y'].to_numpy())
+    baselines = BaselineTable.from_files().row(region)
+    out_dir = Path(history_dir) / region_slug(region)
+    rollup_dir = Path(rollups_dir) / region_slug(region)
+    with update_lock(out_dir):
+        return _backfill(region, out_dir, rollup_dir, baselines, incremental, dispatch, series, since)
+
+
+def _backfill(region, out_dir, rollup_dir, baselines, incremental, dispatch, series, since):
+    ds, load_mw = series
+    existing = None
+    if incremental and current_version(out_dir) and current_version(rollup_dir / 'month'):
+        existing = open_table(out_dir)
+        if len(existing) == 0:
+            existing = None  # nothing to extend: full backfill
+    if existing is not None:
+        try:
+            # The rollups published with this history, not any written after it
+            rollups = RollupStore.load(rollup_dir, existing.meta.get('rollups'))
+        except FileNotFoundError:
+            existing = None  # they were pruned: full backfill
+    if existing is not None:
+        # Published rows from keep on are recomputed along with the new hours
+        keep = len(existing)
+        if since is not None:
+            keep = existing.searchsorted('ds', np.datetime64(since, 'ns'))
+        recompute = np.ones(len(ds), dtype=bool)
+        if keep:
+            recompute = ds > existing.rows(keep - 1, keep)['ds'][0]
+        ds, load_mw = ds[recompute], load_mw[recompute]
+        if not len(ds):
+            print('No hours to update in the published history')
+            return out_dir / existing.version
+
+    start = time.perf_counter()
+    new_columns = compute_history(ds, load_mw, baselines, dispatch)
+    replaced = 0
+    if existing is not None:
+        old_columns = existing.rows(keep)
+        replaced = len(old_columns['ds'])
+
+        def history_since(first_ds):
+            # Published rows before keep, then the recomputed ones
+            first = 0 if first_ds is None else min(existing.searchsorted('ds', first_ds), keep)
+            kept = existing.rows(first, keep)
+            return {name: np.concatenate([kept[name], values]) for name, values in new_columns.items()}
+
+        rollups.replace(old_columns, new_columns, history_since)
+        first_ds = existing.rows(0, 1)['ds'][0] if keep else new_columns['ds'][0]
+    else:
+        rollups = RollupStore.from_history(new_columns)
+        first_ds = new_columns['ds'][0] if len(ds) else None
+    elapsed = time.perf_counter() - start
+
+    green_hours = int(new_columns['green'].sum())
+    meta = {
+        'region': region,
+        'start': None if first_ds is None else str(first_ds),
+        'end': str(new_columns['ds'][-1]) if len(ds) else None,
+        'emission_factor_gco2_per_kwh': FOSSIL_GCO2_PER_KWH if dispatch is None else None,
+        'dispatch': dispatch.to_dict() if dispatch is not None else None,
+        'rollups': rollups.save(rollup_dir),
+    }
+    if existing is not None:
+        version = append_table(out_dir, new_columns, keep, meta=meta)
+    else:
+        version = write_table(out_dir, new_columns, meta=meta)
+    print(f'Computed {len(ds)} hours ({replaced} replacing published ones) in {elapsed * 1000:.1f} ms '
+          f'({green_hours} green, {len(ds) - green_hours} dirty)')
+    print('Wrote', out_dir / version)
+    print('Wrote rollups to', rollup_dir)
+    return out_dir / version
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Backfill historical carbon intensity")
+    arg_parser.add_argument("--incremental", action="store_true",
+                            help="only process hours newer than the published history")
+    arg_parser.add_argument("--since", default=None,
+                            help="with --incremental, also recompute published hours from this timestamp on")
+    arg_parser.add_argument("--dispatch-units", default=None,
+                            help="CSV of fossil units to dispatch in merit order (default: AURA_DISPATCH_UNITS)")
+    args = arg_parser.parse_args()
+    backfill(incremental=args.incremental, dispatch=load_dispatch(args.dispatch_units), since=args.since)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,10 +1,21 @@
+import argparse
 import json
 from pathlib import Path
 import pandas as pd
 import joblib
 import numpy as np
+import sys
 
 ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from backend.forecasters import SeasonalProfile, catch_up
+from backend.fourier import forecast_mean as model_forecast_mean
+from backend.snapshot import write_snapshot
+from backend.live_load import with_live_readings
+from backend.forecast_records import FOSSIL_INTENSITY, WINDOW_TYPES, classify_hours
+from backend.seasonal import BaselineTable, DEFAULT_REGION
+from backend.dispatch import load_dispatch
+
 DATA = ROOT / 'data' / 'hourly_load_data.csv'
 MODEL = ROOT / 'outputs' / 'aura_model.joblib'
 SEASONAL = ROOT / 'outputs' / 'seasonal_baseline.json'
@@ -24,11 +35,12 @@ def detect_header(csv_path):
     return 0
 
 
-def load_load_series():
-    if not DATA.exists():
-        raise FileNotFoundError(DATA)
-    header = detect_header(DATA)
-    df = pd.read_csv(DATA, header=header)
+def load_load_series(csv_path=DATA):
+    csv_path = Path(csv_path)
+    if not csv_path.exists():
+        raise FileNotFoundError(csv_path)
+    header = detect_header(csv_path)
+    df = pd.read_csv(csv_path, header=header)
     df.columns = [str(c).strip().lower().replace(' ', '_') for c in df.columns]
     date_col = next((c for c in df.columns if 'date' in c or 'time' in c), None)
     load_col = next((c for c in df.columns if 'load' in c or 'mw' in c), None)
@@ -44,6 +56,9 @@ def load_load_series():
     df = df[~df.index.duplicated(keep='first')]
     df = df.asfreq('h')
     df['y'] = df['y'].fillna(df['y'].mean())
+    if csv_path.resolve() == DATA.resolve():
+        # Readings ingested by the backend (/api/ingest/load) extend the CSV
+        df = with_live_readings(df, csv_path)
     return df
 
 
@@ -76,13 +91,14 @@ def forecast_24h_demand(steps=24):
 
     # Forecast next 24 hours
     try:
-        forecast_res = results.get_forecast(steps=steps)
-        forecast_mean = forecast_res.predicted_mean
+        # Models trained with --fourier get their weekly/annual exog generated here;
+        # the model is first filtered through any hours newer than its sample
+        # (ingested readings), so it forecasts from the last reading
+        forecast_mean = model_forecast_mean(catch_up(results, df.index.values, df['y'].to_numpy()), steps)
     except Exception as e:
-        # fallback: simple persistence forecast (last value)
-        print('Model forecasting failed, using persistence fallback:', e)
-        last = df['y'].iloc[-1]
-        forecast_mean = pd.Series([last]*steps)
+        # fallback: same hour of the week averaged over the last few weeks
+        print('Model forecasting failed, using seasonal profile fallback:', e)
+        forecast_mean = SeasonalProfile.from_series(df.index.values, df['y'].to_numpy()).forecast(steps)
 
     last_ts = df.index.max()
     future_index = pd.date_range(start=last_ts + pd.Timedelta(hours=1), periods=steps, freq='H')
@@ -102,69 +118,130 @@ def forecast_24h_demand(steps=24):
     return forecast_df
 
 
-def compute_carbon_intensity(forecast_df):
+def compute_carbon_intensity(forecast_df, emission_factor=FOSSIL_INTENSITY, dispatch=None):
     """
     Compute carbon intensity for the next 24 hours demand forecast.
 
     Args:
         forecast_df (pd.DataFrame): Forecast data from forecast_24h_demand()
+        emission_factor (float): gCO2/kWh of fossil generation
+        dispatch (MeritOrder): fossil units stacked in merit order instead of
+            one emission factor; also adds Marginal_Intensity_gCO2_per_kWh
 
     Returns:
         pd.DataFrame: Forecast data with added Carbon_Intensity_gCO2_per_kWh column
     """
-    # Compute carbon intensity (gCO2/kWh)
-    def compute_ci(row):
-        load = row['Forecast_Load_MW']
-        if load <= 0:
-            return np.nan
-        fossil = row['Fossil_Fuel_MW']
-        return (fossil * 700.0) / load
-
+    # Compute carbon intensity (gCO2/kWh) for all hours at once
     forecast_df = forecast_df.copy()
-    forecast_df['Carbon_Intensity_gCO2_per_kWh'] = forecast_df.apply(compute_ci, axis=1)
+    load = forecast_df['Forecast_Load_MW'].to_numpy(dtype=float)
+    fossil = forecast_df['Fossil_Fuel_MW'].to_numpy(dtype=float)
+    if dispatch is not None:
+        intensity, marginal = dispatch.intensity(fossil, load)
+        forecast_df['Carbon_Intensity_gCO2_per_kWh'] = intensity
+        forecast_df['Marginal_Intensity_gCO2_per_kWh'] = marginal
+        return forecast_df
+    with np.errstate(divide='ignore', invalid='ignore'):
+        forecast_df['Carbon_Intensity_gCO2_per_kWh'] = np.where(load > 0, fossil * emission_factor / load, np.nan)
 
     return forecast_df
 
 
-def classify_windows_by_carbon_intensity(forecast_df):
+def classify_windows_by_carbon_intensity(forecast_df, baselines=None):
     """
-    Task 3: Compare carbon intensity of next 24 hours to seasonal_baseline.json for that month,
-    and apply "green_window" or "dirty_window" labels.
+    Task 3: Compare carbon intensity of each forecast hour to the seasonal baseline
+    of that hour's month, and apply "green_window" or "dirty_window" labels. Uses
+    the same rule (classify_hours) as the backend endpoints.
 
     Args:
         forecast_df (pd.DataFrame): Forecast data with Carbon_Intensity_gCO2_per_kWh column
+        baselines (np.ndarray): 12 monthly baselines, January first (default:
+            the default region's row of the seasonal baseline files)
 
     Returns:
-        pd.DataFrame: Forecast data with added window_type column
+        pd.DataFrame: Forecast data with added window_type column, and the
+        baseline of the first forecast hour's month
     """
-    # Load seasonal baseline (assuming it contains carbon intensity thresholds in gCO2/kWh)
-    with open(SEASONAL, 'r') as f:
-        seasonal_baselines = json.load(f)
+    if baselines is None:
+        baselines = BaselineTable.from_files().row(DEFAULT_REGION)
 
-    # Get month from the forecast data's timestamp
-    current_month = pd.Timestamp(forecast_df['ds'].iloc[0]).month  # Use the month from forecast data
-    baseline_threshold = float(seasonal_baselines.get(str(current_month)) or seasonal_baselines.get(current_month) or 400.0)  # Default to 400 gCO2/kWh
+    ds = forecast_df['ds'].to_numpy(dtype='datetime64[ns]')
+    first_month = pd.Timestamp(ds[0]).month
+    baseline_threshold = float(baselines[first_month - 1])
 
-    print(f'Current month: {current_month}, Carbon intensity baseline threshold: {baseline_threshold} gCO2/kWh')
+    print(f'Current month: {first_month}, Carbon intensity baseline threshold: {baseline_threshold} gCO2/kWh')
 
-    # Classify windows: green if carbon intensity < baseline, dirty otherwise
+    # Classify windows: green if carbon intensity < the hour's monthly baseline, dirty otherwise (NaN is dirty)
     forecast_df = forecast_df.copy()
-    forecast_df['window_type'] = forecast_df['Carbon_Intensity_gCO2_per_kWh'].apply(
-        lambda ci: 'green_window' if pd.notna(ci) and ci < baseline_threshold else 'dirty_window'
-    )
+    codes = classify_hours(ds, forecast_df['Carbon_Intensity_gCO2_per_kWh'].to_numpy(dtype=float), baselines)
+    forecast_df['window_type'] = WINDOW_TYPES[codes]
 
     return forecast_df, baseline_threshold
 
 
+def green_runs(is_green, carbon_intensity):
+    """
+    Run-length encode contiguous green hours.
+
+    Args:
+        is_green (np.ndarray): boolean flag per hour
+        carbon_intensity (np.ndarray): carbon intensity per hour (gCO2/kWh)
+
+    Returns:
+        dict: arrays with one entry per run - start (first row position),
+        end (last row position, inclusive), length_hours, avg_carbon_intensity
+    """
+    flags = np.asarray(is_green, dtype=np.int8)
+    edges = np.diff(np.concatenate(([0], flags, [0])))
+    starts = np.flatnonzero(edges == 1)
+    stops = np.flatnonzero(edges == -1)  # one past the last green hour
+    ci = np.asarray(carbon_intensity, dtype=float)
+    cumulative = np.concatenate(([0.0], np.cumsum(np.nan_to_num(ci))))
+    lengths = stops - starts
+    return {
+        'start': starts,
+        'end': stops - 1,
+        'length_hours': lengths,
+        'avg_carbon_intensity': (cumulative[stops] - cumulative[starts]) / np.maximum(lengths, 1),
+    }
+
+
+def rank_runs(runs, top_k=None):
+    """Order runs longest first, cleaner (lower average intensity) first among equal lengths."""
+    order = np.lexsort((runs['avg_carbon_intensity'], -runs['length_hours']))
+    if top_k is not None:
+        order = order[:top_k]
+    return {name: values[order] for name, values in runs.items()}
+
+
+def window_rows(forecast_df, positions):
+    """Per-hour JSON rows for the given row positions, built column-wise."""
+    rows = forecast_df.iloc[positions]
+    return pd.DataFrame({
+        'ds': rows['ds'].dt.strftime('%Y-%m-%dT%H:%M:%S'),
+        'forecast_load_mw': rows['Forecast_Load_MW'].astype(float),
+        'renewable_baseload_mw': rows['Renewable_Baseload_MW'].astype(float),
+        'fossil_fuel_mw': rows['Fossil_Fuel_MW'].astype(float),
+        'carbon_intensity_gco2_per_kwh': rows['Carbon_Intensity_gCO2_per_kWh'].astype(float),
+        'window_type': rows['window_type'],
+    }).to_dict('records')
+
+
 def main():
+    arg_parser = argparse.ArgumentParser(description="Forecast demand and find green windows")
+    arg_parser.add_argument("--steps", type=int, default=24, help="forecast horizon in hours")
+    arg_parser.add_argument("--top-k", type=int, default=5, help="number of ranked green windows to report")
+    arg_parser.add_argument("--dispatch-units", default=None,
+                            help="CSV of fossil units to dispatch in merit order (default: AURA_DISPATCH_UNITS)")
+    args = arg_parser.parse_args()
+
     # Create outputs directory if it doesn't exist
     OUTPUTS_DIR.mkdir(exist_ok=True)
 
-    # Forecast next 24 hours demand
-    forecast_df = forecast_24h_demand(steps=24)
+    # Forecast demand over the horizon
+    forecast_df = forecast_24h_demand(steps=args.steps)
 
     # Compute carbon intensity
-    forecast_df = compute_carbon_intensity(forecast_df)
+    forecast_df = compute_carbon_intensity(forecast_df, dispatch=load_dispatch(args.dispatch_units))
 
     # Task 3: Classify windows by carbon intensity comparison to seasonal baseline
     forecast_df, baseline_threshold = classify_windows_by_carbon_intensity(forecast_df)
@@ -174,8 +251,9 @@ def main():
     print('Wrote', OUT_CSV)
 
     # Identify Green and Dirty Windows
-    green_windows = forecast_df[forecast_df['window_type'] == 'green_window']
-    dirty_windows = forecast_df[forecast_df['window_type'] == 'dirty_window']
+    is_green = (forecast_df['window_type'] == 'green_window').to_numpy()
+    green_windows = forecast_df[is_green]
+    dirty_windows = forecast_df[~is_green]
 
     print(f'\nGreen windows (carbon intensity < {baseline_threshold}): {len(green_windows)} hours')
     if len(green_windows) > 0:
@@ -185,138 +263,96 @@ def main():
     if len(dirty_windows) > 0:
         print(dirty_windows[['ds', 'Carbon_Intensity_gCO2_per_kWh', 'window_type']].to_string(index=False))
 
-    # Find best contiguous green window (longest sequence of green hours)
-    if len(green_windows) > 0:
-        # Find consecutive green windows using a simpler approach
-        green_indices = forecast_df[forecast_df['window_type'] == 'green_window'].index
-        if len(green_indices) > 0:
-            # Find consecutive sequences
-            consecutive_groups = []
-            current_group = [green_indices[0]]
-
-            for i in range(1, len(green_indices)):
-                if green_indices[i] == green_indices[i-1] + 1:
-                    current_group.append(green_indices[i])
-                else:
-                    consecutive_groups.append(current_group)
-                    current_group = [green_indices[i]]
-            consecutive_groups.append(current_group)
-
-            # Find the longest group
-            longest_group = max(consecutive_groups, key=len)
-            longest_window = forecast_df.loc[longest_group]
-
-            best_start = longest_window['ds'].min()
-            best_end = longest_window['ds'].max()
-            best_avg = longest_window['Carbon_Intensity_gCO2_per_kWh'].mean()
-            window_len = len(longest_window)
-
-            print(f'\nBest contiguous green window: {window_len} hours from {best_start} to {best_end}')
-
-            # Create JSON output for the best green window
-            window_df = longest_window.reset_index()
-            out = {
-                'start': best_start.isoformat(),
-                'end': best_end.isoformat(),
-                'avg_carbon_intensity_gco2_per_kwh': float(best_avg),
-                'length_hours': window_len,
-                'baseline_threshold': baseline_threshold,
-                'window_type': 'green_window',
-                'rows': []
-            }
-            for _, r in window_df.iterrows():
-                out['rows'].append({
-                    'ds': r['ds'].isoformat(),
-                    'forecast_load_mw': float(r['Forecast_Load_MW']),
-                    'renewable_baseload_mw': float(r['Renewable_Baseload_MW']),
-                    'fossil_fuel_mw': float(r['Fossil_Fuel_MW']),
-                    'carbon_intensity_gco2_per_kwh': float(r['Carbon_Intensity_gCO2_per_kWh']),
-                    'window_type': r['window_type']
-                })
-        else:
-            # No green windows found, use the cleanest dirty window
-            print('\nNo green windows found. Using cleanest dirty window.')
-            cleanest_dirty = dirty_windows.nsmallest(3, 'Carbon_Intensity_gCO2_per_kWh')
-            best_start = cleanest_dirty['ds'].min()
-            best_end = cleanest_dirty['ds'].max()
-            best_avg = cleanest_dirty['Carbon_Intensity_gCO2_per_kWh'].mean()
-            window_len = len(cleanest_dirty)
-
-            window_df = cleanest_dirty.reset_index()
-            out = {
-                'start': best_start.isoformat(),
-                'end': best_end.isoformat(),
-                'avg_carbon_intensity_gco2_per_kwh': float(best_avg),
-                'length_hours': window_len,
-                'baseline_threshold': baseline_threshold,
-                'window_type': 'dirty_window',
-                'rows': []
-            }
-            for _, r in window_df.iterrows():
-                out['rows'].append({
-                    'ds': r['ds'].isoformat(),
-                    'forecast_load_mw': float(r['Forecast_Load_MW']),
-                    'renewable_baseload_mw': float(r['Renewable_Baseload_MW']),
-                    'fossil_fuel_mw': float(r['Fossil_Fuel_MW']),
-                    'carbon_intensity_gco2_per_kwh': float(r['Carbon_Intensity_gCO2_per_kWh']),
-                    'window_type': r['window_type']
-                })
+    # All contiguous green runs, ranked; the best one is written out in full
+    carbon_intensity = forecast_df['Carbon_Intensity_gCO2_per_kWh'].to_numpy(dtype=float)
+    ranked = rank_runs(green_runs(is_green, carbon_intensity))
+    timestamps = forecast_df['ds'].dt.strftime('%Y-%m-%dT%H:%M:%S').to_numpy()
+
+    if len(ranked['start']) > 0:
+        best_start, best_end = int(ranked['start'][0]), int(ranked['end'][0])
+        positions = np.arange(best_start, best_end + 1)
+        window_type = 'green_window'
+        print(f'\nBest contiguous green window: {len(positions)} hours from {timestamps[best_start]} to {timestamps[best_end]}')
     else:
         # No green windows at all, use the 3 cleanest hours
         print('\nNo green windows found in forecast. Using 3 cleanest hours.')
-        cleanest_hours = forecast_df.nsmallest(3, 'Carbon_Intensity_gCO2_per_kWh')
-        best_start = cleanest_hours['ds'].min()
-        best_end = cleanest_hours['ds'].max()
-        best_avg = cleanest_hours['Carbon_Intensity_gCO2_per_kWh'].mean()
-        window_len = len(cleanest_hours)
-
-        window_df = cleanest_hours.reset_index()
-        out = {
-            'start': best_start.isoformat(),
-            'end': best_end.isoformat(),
-            'avg_carbon_intensity_gco2_per_kwh': float(best_avg),
-            'length_hours': window_len,
-            'baseline_threshold': baseline_threshold,
-            'window_type': 'dirty_window',
-            'rows': []
-        }
-        for _, r in window_df.iterrows():
-            out['rows'].append({
-                'ds': r['ds'].isoformat(),
-                'forecast_load_mw': float(r['Forecast_Load_MW']),
-                'renewable_baseload_mw': float(r['Renewable_Baseload_MW']),
-                'fossil_fuel_mw': float(r['Fossil_Fuel_MW']),
-                'carbon_intensity_gco2_per_kwh': float(r['Carbon_Intensity_gCO2_per_kWh']),
-                'window_type': r['window_type']
-            })
+        positions = np.sort(np.argsort(np.nan_to_num(carbon_intensity, nan=np.inf), kind='stable')[:3])
+        window_type = 'dirty_window'
+
+    top = {name: values[:args.top_k] for name, values in ranked.items()}
+    out = {
+        'start': timestamps[positions].min(),
+        'end': timestamps[positions].max(),
+        'avg_carbon_intensity_gco2_per_kwh': float(np.nanmean(carbon_intensity[positions])),
+        'length_hours': int(len(positions)),
+        'baseline_threshold': baseline_threshold,
+        'window_type': window_type,
+        'rows': window_rows(forecast_df, positions),
+        'total_green_windows': int(len(ranked['start'])),
+        'top_windows': [
+            {'start': start, 'end': end, 'length_hours': length, 'avg_carbon_intensity_gco2_per_kwh': avg}
+            for start, end, length, avg in zip(
+                timestamps[top['start']].tolist(), timestamps[top['end']].tolist(),
+                top['length_hours'].tolist(), top['avg_carbon_intensity'].tolist()
+            )
+        ],
+    }
 
+    forecast_period = {
+        'start': timestamps[0],
+        'end': timestamps[-1],
+        'baseline_threshold': baseline_threshold,
+        'current_month': pd.Timestamp.now().month
+    }
+
+    # Publish the run as one versioned snapshot (hourly columns + window
+    # metadata). This is what the backend serves; CURRENT is swapped atomically
+    # so readers never see a partial run.
+    version = write_snapshot({
+        'ds': forecast_df['ds'].to_numpy(),
+        'forecast_load_mw': forecast_df['Forecast_Load_MW'].to_numpy(dtype=float),
+        'renewable_baseload_mw': forecast_df['Renewable_Baseload_MW'].to_numpy(dtype=float),
+        'fossil_fuel_mw': forecast_df['Fossil_Fuel_MW'].to_numpy(dtype=float),
+        'carbon_intensity_gco2_per_kwh': carbon_intensity,
+        'green': is_green,
+    }, meta={
+        'generated_at': pd.Timestamp.now().isoformat(),
+        'baseline_threshold': baseline_threshold,
+        'forecast_period': forecast_period,
+        'best_window': {
+            'start': out['start'],
+            'end': out['end'],
+            'avg_carbon_intensity_gco2_per_kwh': out['avg_carbon_intensity_gco2_per_kwh'],
+            'length_hours': out['length_hours'],
+            'window_type': window_type,
+            'positions': positions.tolist(),
+        },
+        'total_green_windows': out['total_green_windows'],
+        'top_windows': out['top_windows'],
+    })
+    print('Published snapshot', version)
+
+    # The files below are exports of the same run for offline use
     # Save the JSON output
     with open(OUT_WINDOW, 'w') as f:
         json.dump(out, f, indent=2)
     print('Wrote', OUT_WINDOW)
 
-    # Also save complete 24-hour classification data for plotting
+    # Also save complete classification data for plotting
+    hourly = pd.DataFrame({
+        'timestamp': timestamps,
+        'hour': forecast_df['ds'].dt.hour.to_numpy(),
+        'forecast_load_mw': forecast_df['Forecast_Load_MW'].astype(float).to_numpy(),
+        'renewable_baseload_mw': forecast_df['Renewable_Baseload_MW'].astype(float).to_numpy(),
+        'fossil_fuel_mw': forecast_df['Fossil_Fuel_MW'].astype(float).to_numpy(),
+        'carbon_intensity_gco2_per_kwh': carbon_intensity,
+        'window_type': forecast_df['window_type'].to_numpy(),
+    })
     complete_data = {
-        'forecast_period': {
-            'start': forecast_df['ds'].min().isoformat(),
-            'end': forecast_df['ds'].max().isoformat(),
-            'baseline_threshold': baseline_threshold,
-            'current_month': pd.Timestamp.now().month
-        },
-        'hourly_classifications': []
+        'forecast_period': forecast_period,
+        'hourly_classifications': hourly.to_dict('records')
     }
 
-    for _, row in forecast_df.iterrows():
-        complete_data['hourly_classifications'].append({
-            'timestamp': row['ds'].isoformat(),
-            'hour': row['ds'].hour,
-            'forecast_load_mw': float(row['Forecast_Load_MW']),
-            'renewable_baseload_mw': float(row['Renewable_Baseload_MW']),
-            'fossil_fuel_mw': float(row['Fossil_Fuel_MW']),
-            'carbon_intensity_gco2_per_kwh': float(row['Carbon_Intensity_gCO2_per_kWh']),
-            'window_type': row['window_type']
-        })
-
     # Save complete classification data
     complete_out_path = OUTPUTS_DIR / 'complete_window_classification.json'
     with open(complete_out_path, 'w') as f:
@@ -1,15 +1,31 @@
 from pathlib import Path
+import argparse
+import sys
+import numpy as np
 import pandas as pd
 from statsmodels.tsa.statespace.sarimax import SARIMAX
-import joblib
 import warnings
 
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from backend.registry import publish_model, atomic_dump
+from backend.fourier import fourier_names, fourier_terms
+
+arg_parser = argparse.ArgumentParser(description="Train the SARIMAX demand model")
+arg_parser.add_argument("--region", help="publish the model as a new version for this region in outputs/models/")
+arg_parser.add_argument("--data", default=str(ROOT / "data" / "hourly_load_data.csv"), help="hourly load CSV")
+arg_parser.add_argument("--fourier", action="store_true",
+                        help="add weekly and annual Fourier terms as exogenous regressors")
+arg_parser.add_argument("--weekly-order", type=int, default=3, help="weekly harmonics used with --fourier")
+arg_parser.add_argument("--annual-order", type=int, default=2, help="annual harmonics used with --fourier")
+args = arg_parser.parse_args()
+
 print("--- Starting Demand Model Trainer (This will take a few minutes) ---")
 warnings.filterwarnings("ignore") # Suppress convergence warnings
 
 try:
     # Load the hourly load data, skipping the messy header rows
-    csv_path = Path(__file__).parent.parent.joinpath("data/hourly_load_data.csv")
+    csv_path = Path(args.data)
     load_df = pd.read_csv(csv_path)
 
     # Select and rename columns
@@ -53,31 +69,56 @@ try:
     # --- Train SARIMAX Model ---
     print("Training SARIMAX model... This is the long part.")
 
+    # Weekly/annual cycles as Fourier regressors: a handful of extra
+    # coefficients instead of a 168-lag seasonal state, which would not fit
+    exog = None
+    if args.fourier:
+        exog = fourier_terms(data.index, fourier_names(args.weekly_order, args.annual_order))
+        print(f"Using {exog.shape[1]} Fourier regressors: {', '.join(exog.columns)}")
+
     # We use (1,1,1) for the non-seasonal part (trend)
     # We use (1,1,1,24) for the seasonal part (daily cycle)
     # This is a strong, standard model for hourly data with a daily pattern.
     model = SARIMAX(data['y'],
+                    exog=exog,
                     order=(1, 1, 1),
                     seasonal_order=(1, 1, 1, 24),
                     enforce_stationarity=False,
                     enforce_invertibility=False)
 
     # Fit the model
-    results = model.fit(disp=False)
+    if exog is not None:
+        # Fourier coefficients come from an OLS fit and are held fixed, so the
+        # optimizer searches the same 5 SARIMAX parameters as without exog and
+        # training time stays the same. The fit is on the series differenced
+        # like the model does (lag 1 and lag 24), because that is the scale the
+        # fixed coefficients act on; a fit on the levels would be biased.
+        design, target = exog.to_numpy(), data['y'].to_numpy()
+        for lag in (1, 24):
+            design, target = design[lag:] - design[:-lag], target[lag:] - target[:-lag]
+        coefs = np.linalg.lstsq(design, target, rcond=None)[0]
+        results = model.fit_constrained(dict(zip(exog.columns, coefs)), disp=False)
+    else:
+        results = model.fit(disp=False)
 
     print("--- Model Training Complete ---")
 
     # --- Save the Model as a File ---
-    # Create outputs directory if it doesn't exist
-    outputs_dir = Path(__file__).parent.parent / 'outputs'
-    outputs_dir.mkdir(exist_ok=True)
-
-    model_filename = outputs_dir / 'aura_model.joblib'
-    joblib.dump(results, model_filename)
+    # Written to a temporary file and renamed, so the backend's model registry
+    # never loads a half-written artifact and hot-swaps to the new one.
+    if args.region:
+        model_filename = publish_model(results, args.region)
+    else:
+        # Create outputs directory if it doesn't exist
+        outputs_dir = ROOT / 'outputs'
+        outputs_dir.mkdir(exist_ok=True)
+
+        model_filename = outputs_dir / 'aura_model.joblib'
+        atomic_dump(results, model_filename)
 
     print(f"--- Success! Model saved as '{model_filename}' ---")
 
 except FileNotFoundError:
-    print(f"Error: hourly_load_data.csv not found.")
+    print(f"Error: {csv_path.name} not found.")
 except Exception as e:
     print(f"An error occurred: {e}")
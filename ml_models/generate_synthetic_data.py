@@ -0,0 +1,329 @@
+"""
+Generate synthetic load and generation data at configurable scale.
+
+For --regions regions over --years years this writes, in the project's input
+formats:
+
+- load/<region>.csv: hourly load like data/hourly_load_data.csv (HOUR,
+  Date/time, Load [MW]; Date/time is the local wall-clock hour ending).
+  Load has daily, weekly and annual seasonality, statutory holidays, a
+  growth trend and autocorrelated noise. Because labels are local time, the
+  spring DST change skips an hour and the autumn one repeats it, and random
+  runs of hours are missing, as in the real exports.
+- energy_sources_data.csv: monthly generation by type of electricity in the
+  layout of StatCan table 25-10-0015-01, consistent with each region's load
+  (generation = load energy x a net export ratio, split into a renewable
+  mix with its own seasonality and a fossil remainder). A small share of
+  values is suppressed (STATUS x, no VALUE) as in the published table.
+- manifest.json: the parameters and, per region, its file, time zone and rows.
+
+The first regions are the provinces and territories (Nova Scotia first, with
+the scale of the real series); further ones are "Synthetic Region NNN". Each
+region is generated from its own seed, one region per worker process, so the
+output does not depend on --workers.
+
+Run from the repository root:
+    python -m ml_models.generate_synthetic_data --regions 200 --years 10
+"""
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+from scipy.signal import lfilter
+
+ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(ROOT))
+from backend.registry import region_slug
+
+OUT_DIR = ROOT / 'outputs' / 'synthetic'
+GENERATION_FILE = 'energy_sources_data.csv'
+
+# (GEO, time zone, mean load MW); further regions cycle through the time zones
+PROVINCES = [
+    ('Nova Scotia', 'America/Halifax', 1300.0),
+    ('Newfoundland and Labrador', 'America/St_Johns', 1000.0),
+    ('Prince Edward Island', 'America/Halifax', 180.0),
+    ('New Brunswick', 'America/Moncton', 1500.0),
+    ('Quebec', 'America/Toronto', 22000.0),
+    ('Ontario', 'America/Toronto', 16000.0),
+    ('Manitoba', 'America/Winnipeg', 2700.0),
+    ('Saskatchewan', 'America/Regina', 2800.0),
+    ('Alberta', 'America/Edmonton', 9500.0),
+    ('British Columbia', 'America/Vancouver', 7000.0),
+    ('Yukon', 'America/Whitehorse', 50.0),
+    ('Northwest Territories', 'America/Yellowknife', 35.0),
+    ('Nunavut', 'America/Iqaluit', 20.0),
+]
+RENEWABLE_TYPES = ['Hydraulic turbine', 'Wind power turbine', 'Tidal power turbine', 'Solar']
+FOSSIL_TYPES = ['Conventional steam turbine', 'Nuclear steam turbine',
+                'Combustion turbine', 'Internal combustion turbine']
+TOTAL_TYPE = 'Total all types of electricity generation'
+GENERATION_COLUMNS = [
+    'REF_DATE', 'GEO', 'DGUID', 'Class of electricity producer', 'Type of electricity generation',
+    'UOM', 'UOM_ID', 'SCALAR_FACTOR', 'SCALAR_ID', 'VECTOR', 'COORDINATE', 'VALUE', 'STATUS',
+    'SYMBOL', 'TERMINATED', 'DECIMALS',
+]
+# Month of peak output for each renewable type and the amplitude of its annual cycle
+RENEWABLE_SEASONS = {
+    'Hydraulic turbine': (5, 0.25),
+    'Wind power turbine': (1, 0.30),
+    'Tidal power turbine': (1, 0.0),
+    'Solar': (6.5, 0.70),
+}
+
+
+def region_spec(index: int):
+    """(GEO, time zone, mean load MW or None for a random scale) of the index-th region."""
+    if index < len(PROVINCES):
+        return PROVINCES[index]
+    return f'Synthetic Region {index + 1:03d}', PROVINCES[index % len(PROVINCES)][1], None
+
+
+def easter(year: int) -> np.datetime64:
+    """Easter Sunday (anonymous Gregorian algorithm)."""
+    a, b, c = year % 19, year // 100, year % 100
+    d, e = b // 4, b % 4
+    g = (8 * b + 13) // 25
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = c // 4, c % 4
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    month = (h + l - 7 * m + 114) // 31
+    day = (h + l - 7 * m + 114) % 31 + 1
+    return np.datetime64(f'{year:04d}-{month:02d}-{day:02d}')
+
+
+def holidays(years) -> np.ndarray:
+    """Canadian statutory holidays (datetime64[D]) in the given years."""
+    days = []
+    for year in years:
+        y = f'{year:04d}'
+        days += [
+            np.datetime64(f'{y}-01-01'),
+            easter(year) - np.timedelta64(2, 'D'),  # Good Friday
+            np.busday_offset(f'{y}-05-24', 0, roll='backward', weekmask='Mon'),  # Victoria Day
+            np.datetime64(f'{y}-07-01'),
+            np.busday_offset(f'{y}-08-01', 0, roll='forward', weekmask='Mon'),  # Civic Holiday
+            np.busday_offset(f'{y}-09-01', 0, roll='forward', weekmask='Mon'),  # Labour Day
+            np.busday_offset(f'{y}-10-01', 1, roll='forward', weekmask='Mon'),  # Thanksgiving
+            np.datetime64(f'{y}-11-11'),
+            np.datetime64(f'{y}-12-25'),
+            np.datetime64(f'{y}-12-26'),
+        ]
+    return np.array(days, dtype='datetime64[D]')
+
+
+def local_hours(start_year: int, years: int, tz: str) -> np.ndarray:
+    """
+    Local wall-clock start (naive datetime64[h]) of every hour from local
+    midnight on 1 January start_year for the given years. Hours are
+    consecutive in real time, so the wall clock skips and repeats at DST.
+    """
+    start = pd.Timestamp(f'{start_year}-01-01', tz=tz).tz_convert('UTC').tz_localize(None)
+    end = pd.Timestamp(f'{start_year + years}-01-01', tz=tz).tz_convert('UTC').tz_localize(None)
+    n = int((end - start) / np.timedelta64(1, 'h'))
+    # Exact start (St John's is offset by a half hour from UTC)
+    utc = np.datetime64(start, 'ns') + np.arange(n) * np.timedelta64(1, 'h')
+    local = pd.DatetimeIndex(utc).tz_localize('UTC').tz_convert(tz).tz_localize(None)
+    return local.to_numpy().astype('datetime64[h]')
+
+
+def load_profile(local: np.ndarray, mean_mw: float, rng: np.random.Generator) -> np.ndarray:
+    """Hourly load (MW) for the local hour starts, with the region's random seasonal parameters."""
+    hour = (local - local.astype('datetime64[D]')).astype(np.int64)
+    days = local.astype('datetime64[D]')
+    weekday = (days.astype(np.int64) + 3) % 7  # 0 = Monday
+    day_of_year = (days - days.astype('datetime64[Y]')).astype(np.int64)
+    years_elapsed = (local - local[0]).astype(np.int64) / (24 * 365.25)
+
+    # Daily: evening peak and a smaller morning one, stronger on working days
+    daily = (rng.uniform(0.08, 0.16) * np.cos(2 * np.pi * (hour - rng.uniform(17, 19)) / 24)
+             + rng.uniform(0.03, 0.07) * np.cos(4 * np.pi * (hour - rng.uniform(7, 9)) / 24))
+    off_day = (weekday >= 5) | np.isin(days, holidays(np.unique(days.astype('datetime64[Y]').astype(int) + 1970)))
+    weekly = np.where(off_day, 1.0 - rng.uniform(0.05, 0.12), 1.0)
+    daily = np.where(off_day, 0.7 * daily, daily)
+    # Annual: winter heating peak in mid-January, summer cooling peak in late July
+    winter = rng.uniform(0.08, 0.25) * np.cos(2 * np.pi * (day_of_year - 15) / 365.25)
+    summer = rng.uniform(0.0, 0.15) * np.maximum(0.0, np.cos(2 * np.pi * (day_of_year - 205) / 365.25)) ** 2
+    trend = (1.0 + rng.uniform(-0.005, 0.02)) ** years_elapsed
+    # AR(1) noise: weather and demand deviations persist for hours
+    noise = lfilter([1.0], [1.0, -0.95], rng.normal(0.0, rng.uniform(0.008, 0.015), len(local)))
+
+    load = mean_mw * trend * weekly * (1.0 + daily + winter + summer + noise)
+    return np.maximum(load, 0.05 * mean_mw)
+
+
+def drop_gaps(n: int, gap_rate: float, rng: np.random.Generator) -> np.ndarray:
+    """Mask of the rows to keep after removing random runs (mean 6 hours) totalling ~gap_rate of them."""
+    keep = np.ones(n, dtype=bool)
+    runs = rng.poisson(gap_rate * n / 6.0)
+    for start, length in zip(rng.integers(0, n, runs), np.minimum(rng.geometric(1 / 6.0, runs), 72)):
+        keep[start:start + length] = False
+    return keep
+
+
+def write_load_csv(path: Path, local: np.ndarray, load: np.ndarray):
+    """Write rows in the format of data/hourly_load_data.csv (Date/time = local hour ending)."""
+    labels = np.char.replace(np.datetime_as_string(local + np.timedelta64(1, 'h'), unit='m'), 'T', ' ')
+    # Formatting the lines directly is about twice as fast as DataFrame.to_csv
+    with open(path, 'w') as f:
+        f.write('HOUR,Date/time,Load [MW]\n')
+        f.writelines(f'{i},{label},{value:.2f}\n' for i, (label, value) in enumerate(zip(labels.tolist(), load.tolist()), 1))
+
+
+def generation_frame(geo: str, index: int, local: np.ndarray, load: np.ndarray,
+                     suppressed_rate: float, rng: np.random.Generator) -> pd.DataFrame:
+    """Monthly generation by type (MWh) in the StatCan layout, consistent with the region's load."""
+    months, codes = np.unique(local.astype('datetime64[M]'), return_inverse=True)
+    load_mwh = np.bincount(codes, weights=load)
+    total = load_mwh * rng.uniform(0.9, 1.3)  # net exporters generate more than they use
+    month_of_year = months.astype(np.int64) % 12 + 1
+
+    renewable_share = rng.uniform(0.05, 0.95)
+    weights = rng.dirichlet([4.0, 2.0, 0.1, 0.5])
+    values = {}
+    for gen_type, weight in zip(RENEWABLE_TYPES, weights):
+        peak, amplitude = RENEWABLE_SEASONS[gen_type]
+        season = 1.0 + amplitude * np.cos(2 * np.pi * (month_of_year - peak) / 12)
+        values[gen_type] = total * renewable_share * weight * season
+    renewable = np.sum(list(values.values()), axis=0)
+    scale = np.minimum(1.0, total / np.maximum(renewable, 1e-9))
+    for gen_type in RENEWABLE_TYPES:
+        values[gen_type] *= scale
+    fossil = total - renewable * scale
+    for gen_type, weight in zip(FOSSIL_TYPES, rng.dirichlet([3.0, 1.0, 2.0, 0.5])):
+        values[gen_type] = fossil * weight
+    values[TOTAL_TYPE] = total
+
+    types = [TOTAL_TYPE] + RENEWABLE_TYPES + FOSSIL_TYPES
+    n = len(months)
+    value = np.round(np.concatenate([values[t] for t in types]), 0)
+    suppressed = rng.random(len(value)) < suppressed_rate
+    type_index = np.repeat(np.arange(len(types)), n)
+    return pd.DataFrame({
+        'REF_DATE': np.tile(np.datetime_as_string(months, unit='M'), len(types)),
+        'GEO': geo,
+        'DGUID': f'2016A0002{index:04d}',
+        'Class of electricity producer': 'Total all classes of electricity producer',
+        'Type of electricity generation': np.repeat(types, n),
+        'UOM': 'Megawatt hours',
+        'UOM_ID': 235,
+        'SCALAR_FACTOR': 'units',
+        'SCALAR_ID': 0,
+        'VECTOR': [f'v{1000000 + index * 100 + t}' for t in type_index],
+        'COORDINATE': [f'{index + 1}.1.{t + 1}' for t in type_index],
+        'VALUE': np.where(suppressed, np.nan, value),
+        'STATUS': np.where(suppressed, 'x', ''),
+        'SYMBOL': '',
+        'TERMINATED': '',
+        'DECIMALS': 0,
+    })
+
+
+def generate_region(task):
+    """Write one region's load CSV and return its manifest entry and generation rows (runs in a worker)."""
+    index, options = task
+    geo, tz, mean_mw = region_spec(index)
+    rng = np.random.default_rng([options['seed'], index])
+    if mean_mw is None:
+        mean_mw = float(np.clip(rng.lognormal(np.log(1500.0), 1.2), 10.0, 30000.0))
+
+    local = local_hours(options['start_year'], options['years'], tz)
+    load = load_profile(local, mean_mw, rng)
+    generation = generation_frame(geo, index, local, load, options['suppressed_rate'], rng)
+
+    keep = drop_gaps(len(local), options['gap_rate'], rng)
+    path = Path(options['output_dir']) / 'load' / f'{region_slug(geo)}.csv'
+    write_load_csv(path, local[keep], load[keep])
+    entry = {
+        'region': geo,
+        'file': str(path.relative_to(options['output_dir'])),
+        'timezone': tz,
+        'rows': int(keep.sum()),
+        'missing_hours': int((~keep).sum()),
+        'mean_load_mw': round(float(load.mean()), 2),
+    }
+    return entry, generation
+
+
+def generate(options, regions: int, workers=None):
+    """Generate all regions into options['output_dir']; returns the manifest."""
+    output_dir = Path(options['output_dir'])
+    (output_dir / 'load').mkdir(parents=True, exist_ok=True)
+    generation_path = output_dir / GENERATION_FILE
+    tasks = [(index, options) for index in range(regions)]
+    workers = max(1, min(workers or os.cpu_count() or 1, regions))
+
+    entries = []
+    with open(generation_path, 'w', newline='') as f:
+        f.write(','.join(GENERATION_COLUMNS) + '\n')
+
+        def collect(results):
+            for entry, generation in results:
+                entries.append(entry)
+                generation.to_csv(f, header=False, index=False, float_format='%.0f')
+
+        if workers == 1:
+            collect(map(generate_region, tasks))
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                collect(pool.map(generate_region, tasks))
+
+    manifest = {
+        'seed': options['seed'],
+        'start_year': options['start_year'],
+        'years': options['years'],
+        'gap_rate': options['gap_rate'],
+        'suppressed_rate': options['suppressed_rate'],
+        'generation_file': GENERATION_FILE,
+        'regions': entries,
+    }
+    with open(output_dir / 'manifest.json', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Generate synthetic load and generation data")
+    arg_parser.add_argument("--regions", type=int, default=len(PROVINCES), help="number of regions")
+    arg_parser.add_argument("--years", type=int, default=10, help="years of hourly load per region")
+    arg_parser.add_argument("--start-year", type=int, default=2015, help="first year")
+    arg_parser.add_argument("--seed", type=int, default=0, help="random seed")
+    arg_parser.add_argument("--gap-rate", type=float, default=0.002, help="fraction of hours missing from the load files")
+    arg_parser.add_argument("--suppressed-rate", type=float, default=0.01,
+                            help="fraction of generation values suppressed (STATUS x)")
+    arg_parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes")
+    arg_parser.add_argument("--output-dir", default=str(OUT_DIR), help="directory for the generated files")
+    args = arg_parser.parse_args()
+
+    if args.regions < 1 or args.years < 1:
+        print('--regions and --years must be at least 1')
+        sys.exit(1)
+
+    options = {
+        'seed': args.seed,
+        'start_year': args.start_year,
+        'years': args.years,
+        'gap_rate': args.gap_rate,
+        'suppressed_rate': args.suppressed_rate,
+        'output_dir': str(Path(args.output_dir).resolve()),
+    }
+    print(f'Generating {args.regions} regions x {args.years} years with {args.workers} workers...')
+    start = time.perf_counter()
+    manifest = generate(options, args.regions, args.workers)
+    elapsed = time.perf_counter() - start
+
+    rows = sum(entry['rows'] for entry in manifest['regions'])
+    print(f'{rows:,} hourly load rows in {elapsed:.1f} s ({rows / elapsed:,.0f} rows/s)')
+    print('Load files:', Path(options['output_dir']) / 'load')
+    print('Generation data:', Path(options['output_dir']) / GENERATION_FILE)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,56 +1,123 @@
-from pathlib import Path
-import pandas as pd
-import json
-
-print("--- Starting Supply Model Builder ---")
-
-try:
-    # Load the monthly generation data
-    csv_path = Path(__file__).parent.parent.joinpath("data/energy_sources_data.csv")
-    df = pd.read_csv(csv_path)
-
-    # Filter for Nova Scotia and relevant renewable types
-    df_ns = df[df['GEO'] == 'Nova Scotia'].copy()
-    renewables = ['Hydraulic turbine', 'Wind power turbine', 'Tidal power turbine', 'Solar']
-    df_ns_renew = df_ns[df_ns['Type of electricity generation'].isin(renewables)]
-
-    # Convert REF_DATE to datetime and extract month/year
-    df_ns_renew['REF_DATE'] = pd.to_datetime(df_ns_renew['REF_DATE'], format='%Y-%m')
-    df_ns_renew['month'] = df_ns_renew['REF_DATE'].dt.month
-    df_ns_renew['year'] = df_ns_renew['REF_DATE'].dt.year
-
-    # Group by year and month, sum the VALUE (MWh)
-    df_monthly_sum = df_ns_renew.groupby(['year', 'month'])['VALUE'].sum().reset_index()
-
-    # Get the average MWh for each month across all years
-    df_avg_monthly = df_monthly_sum.groupby('month')['VALUE'].mean().reset_index()
-
-    # Convert "Average Monthly MWh" to "Average Hourly MW"
-    # This is the crucial step for our rule-based model
-    days_in_month = {
-        1: 31, 2: 28.25, 3: 31, 4: 30, 5: 31, 6: 30,
-        7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31
-    }
-
-    df_avg_monthly['hours_in_month'] = df_avg_monthly['month'].map(lambda m: days_in_month[m] * 24)
-    df_avg_monthly['average_hourly_mw'] = df_avg_monthly['VALUE'] / df_avg_monthly['hours_in_month']
-
-    # Create the final lookup table (our "formula")
-    seasonal_baseline_dict = df_avg_monthly.set_index('month')['average_hourly_mw'].round(1).to_dict()
-
-    # Create outputs directory if it doesn't exist
-    outputs_dir = Path(__file__).parent.parent / 'outputs'
-    outputs_dir.mkdir(exist_ok=True)
-
-    # Save the lookup table to a JSON file in outputs directory
-    output_path = outputs_dir / 'seasonal_baseline.json'
-    with open(output_path, 'w') as f:
-        json.dump(seasonal_baseline_dict, f, indent=4)
-
-    print(f"--- Success! Created '{output_path}' ---")
-    print(seasonal_baseline_dict)
-
-except FileNotFoundError:
-    print(f"Error: energy_sources_data.csv not found.")
-except Exception as e:
-    print(f"An error occurred: {e}")
+from pathlib import Path
+import argparse
+import time
+import pandas as pd
+import json
+
+# Only these columns are read, with compact dtypes; the repeated text columns
+# become categoricals so each chunk stores small integer codes.
+USECOLS = ['REF_DATE', 'GEO', 'Type of electricity generation', 'VALUE']
+DTYPES = {
+    'REF_DATE': 'category',
+    'GEO': 'category',
+    'Type of electricity generation': 'category',
+    'VALUE': 'float64',
+}
+RENEWABLES = ['Hydraulic turbine', 'Wind power turbine', 'Tidal power turbine', 'Solar']
+
+def aggregate_chunk(chunk):
+    """Renewable MWh per (GEO, year, month) for one chunk of the generation table."""
+    # Early row filter on the categorical column, before anything else is parsed
+    chunk = chunk[chunk['Type of electricity generation'].isin(RENEWABLES)]
+    if chunk.empty:
+        return None
+
+    # REF_DATE is categorical: parse each distinct 'YYYY-MM' once, then map codes
+    ref_dates = chunk['REF_DATE'].cat.remove_unused_categories()
+    parsed = pd.to_datetime(ref_dates.cat.categories, format='%Y-%m')
+    codes = ref_dates.cat.codes.to_numpy()
+    # Group on GEO's integer codes and name the (few) result rows afterwards;
+    # codes are per chunk, so the names are what chunks are combined on
+    geo = chunk['GEO'].cat
+    keys = pd.DataFrame({
+        'GEO': geo.codes.to_numpy(),
+        'year': parsed.year.to_numpy()[codes],
+        'month': parsed.month.to_numpy()[codes],
+        'VALUE': chunk['VALUE'].to_numpy(),
+    })
+    totals = keys.groupby(['GEO', 'year', 'month'])['VALUE'].sum()
+    names = geo.categories[totals.index.levels[0]].astype(str)
+    totals.index = totals.index.set_levels(names, level='GEO')
+    return totals
+
+
+def build(csv_path, chunksize):
+    """Write the region x month baseline table and Nova Scotia's lookup table to outputs/."""
+    # Stream the monthly generation data in chunks, keeping only running
+    # (GEO, year, month) totals so peak memory does not grow with the file
+    start = time.perf_counter()
+    rows_read = 0
+    monthly_totals = None
+    for chunk in pd.read_csv(csv_path, usecols=USECOLS, dtype=DTYPES, chunksize=chunksize):
+        rows_read += len(chunk)
+        partial = aggregate_chunk(chunk)
+        if partial is None:
+            continue
+        monthly_totals = partial if monthly_totals is None else monthly_totals.add(partial, fill_value=0.0)
+
+    elapsed = time.perf_counter() - start
+    print(f"Read {rows_read} rows in {elapsed:.2f}s ({rows_read / max(elapsed, 1e-9):,.0f} rows/s)")
+    if monthly_totals is None:
+        raise ValueError("no renewable generation rows found")
+
+    # Average monthly MWh per (GEO, month) across the years with data
+    avg_monthly_mwh = monthly_totals.groupby(level=['GEO', 'month']).mean().unstack('month')
+    avg_monthly_mwh = avg_monthly_mwh.reindex(columns=range(1, 13))
+
+    # Convert "Average Monthly MWh" to "Average Hourly MW"
+    # This is the crucial step for our rule-based model
+    days_in_month = {
+        1: 31, 2: 28.25, 3: 31, 4: 30, 5: 31, 6: 30,
+        7: 31, 8: 31, 9: 30, 10: 31, 11: 30, 12: 31
+    }
+    hours_in_month = pd.Series(days_in_month) * 24
+    region_baselines = avg_monthly_mwh.div(hours_in_month, axis=1).round(1)
+
+    # Create outputs directory if it doesn't exist
+    outputs_dir = Path(__file__).parent.parent / 'outputs'
+    outputs_dir.mkdir(exist_ok=True)
+
+    # Save the region x month table: one row of 12 monthly values per region
+    regional_path = outputs_dir / 'seasonal_baseline_by_region.json'
+    regional_table = {
+        'unit': 'MW',
+        'months': list(range(1, 13)),
+        'regions': {
+            geo: [None if pd.isna(v) else float(v) for v in row]
+            for geo, row in zip(region_baselines.index, region_baselines.to_numpy())
+        }
+    }
+    with open(regional_path, 'w') as f:
+        json.dump(regional_table, f)
+    print(f"Wrote baselines for {len(region_baselines)} regions to '{regional_path}'")
+
+    # Keep the single-region lookup table (our "formula") for Nova Scotia
+    seasonal_baseline_dict = region_baselines.loc['Nova Scotia'].dropna().to_dict()
+
+    # Save the lookup table to a JSON file in outputs directory
+    output_path = outputs_dir / 'seasonal_baseline.json'
+    with open(output_path, 'w') as f:
+        json.dump(seasonal_baseline_dict, f, indent=4)
+
+    print(f"--- Success! Created '{output_path}' ---")
+    print(seasonal_baseline_dict)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Build monthly renewable baselines per region")
+    arg_parser.add_argument("--data", default=str(Path(__file__).parent.parent / "data" / "energy_sources_data.csv"),
+                            help="StatCan electricity generation CSV")
+    arg_parser.add_argument("--chunksize", type=int, default=250_000, help="rows read per chunk")
+    args = arg_parser.parse_args()
+    print("--- Starting Supply Model Builder ---")
+    csv_path = Path(args.data)
+    try:
+        build(csv_path, args.chunksize)
+    except FileNotFoundError:
+        print(f"Error: {csv_path.name} not found.")
+    except Exception as e:
+        print(f"An error occurred: {e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,5 +1,23 @@
+import json
+import numpy as np
 import pytest
 from fastapi.testclient import TestClient
+from backend.main import get_forecast_data
+
+
+@pytest.fixture
+def job_dirs(tmp_path, monkeypatch):
+    """Keep job records, snapshots and shared forecasts written by background jobs out of outputs/"""
+    import backend.main
+    import backend.snapshot
+    monkeypatch.setattr(backend.main.green_window_jobs, "jobs_dir", tmp_path / "jobs")
+    monkeypatch.setattr(backend.main.history_update_jobs, "jobs_dir", tmp_path / "jobs")
+    # The pipeline script runs in a subprocess and finds the snapshot directory in the environment
+    monkeypatch.setenv("AURA_SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(backend.snapshot, "SNAPSHOT_DIR", tmp_path / "snapshots")
+    monkeypatch.setattr(backend.main, "SNAPSHOT_DIR", tmp_path / "snapshots")
+    monkeypatch.setattr(backend.main.shared_forecast, "state_dir", tmp_path / "forecast_state")
+    return tmp_path
 
 
 class TestPredictDemand:
@@ -51,6 +69,30 @@ class TestPredictDemand:
             assert field in hourly_data
 
 
+    def test_predict_demand_unknown_region(self, client: TestClient):
+        """Test that an unknown region is rejected"""
+        response = client.get("/api/predict-demand", params={"region": "Atlantis"})
+        assert response.status_code == 404
+
+
+class TestSeasonalBaseline:
+    """Test cases for /api/seasonal-baseline endpoint"""
+
+    def test_seasonal_baseline_default_region(self, client: TestClient):
+        """Test the default region returns 12 monthly values"""
+        response = client.get("/api/seasonal-baseline")
+
+        assert response.status_code == 200
+        data = response.json()
+        assert len(data["data"]) == 12
+        assert "Nova Scotia" in data["regions"]
+
+    def test_seasonal_baseline_unknown_region(self, client: TestClient):
+        """Test that an unknown region returns 404"""
+        response = client.get("/api/seasonal-baseline", params={"region": "Atlantis"})
+        assert response.status_code == 404
+
+
 class TestFindGreenWindows:
     """Test cases for /api/find-green-windows endpoint (Scenario 2)"""
 
@@ -65,6 +107,7 @@ class TestFindGreenWindows:
         assert "green_windows" in data["data"] or "fallback_windows" in data["data"]
 
         response_data = data["data"]
+        assert response_data["forecast_tier"] in ["sarimax", "seasonal_profile"]
 
         if "green_windows" in response_data:
             # Green windows found
@@ -130,6 +173,123 @@ class TestOptimizeWindows:
         assert response.status_code == 422  # Validation error
 
 
+class TestOptimizeWindowsBatch:
+    """Test cases for /api/optimize-windows/batch endpoint"""
+
+    def test_batch_matches_single_requests(self, client: TestClient):
+        """Test that batch results come back in order and equal the single-request responses"""
+        requests = [
+            {"start_time": "06:00", "end_time": "18:00", "number_of_windows": 3},
+            {"start_time": "22:00", "end_time": "04:00", "number_of_windows": 10, "appliances": ["ev_charger"]},
+        ]
+        response = client.post("/api/optimize-windows/batch", json={"requests": requests})
+
+        assert response.status_code == 200
+        data = response.json()
+        assert data["success"] is True
+        assert data["data"]["failed"] == 0
+        results = data["data"]["results"]
+        assert len(results) == 2
+        for request, result in zip(requests, results):
+            single = client.post("/api/optimize-windows", json=request).json()
+            assert result == single
+        assert results[1]["data"]["optimal_windows"][0]["appliances"] == ["ev_charger"]
+
+    def test_multi_hour_cycle_windows(self, client: TestClient):
+        """Test that an EV charging cycle spans several hours and is ranked by its emissions"""
+        response = client.post("/api/optimize-windows/batch", json={"requests": [
+            {"start_time": "00:00", "end_time": "23:59", "number_of_windows": 5, "appliances": ["ev_charger"]},
+        ]})
+
+        assert response.status_code == 200
+        windows = response.json()["data"]["results"][0]["data"]["optimal_windows"]
+        for window in windows:
+            start, end = (int(window[key][:2]) for key in ("start_time", "end_time"))
+            assert (end - start) % 24 == 4
+        savings = [window["energy_savings_kg"] for window in windows]
+        assert savings == sorted(savings)
+
+    def test_batch_reports_failures_per_request(self, client: TestClient):
+        """Test that an empty time range or unknown region fails only its own entry"""
+        requests = [
+            {"start_time": "10:30", "end_time": "10:45", "number_of_windows": 1},
+            {"start_time": "06:00", "end_time": "18:00", "number_of_windows": 1, "region": "Atlantis"},
+            {"start_time": "06:00", "end_time": "18:00", "number_of_windows": 1},
+        ]
+        response = client.post("/api/optimize-windows/batch", json={"requests": requests})
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["failed"] == 2
+        assert [r["success"] for r in data["results"]] == [False, False, True]
+        assert data["results"][0]["status_code"] == 400
+        assert data["results"][1]["status_code"] == 404
+
+    def test_batch_validation(self, client: TestClient):
+        """Test that an empty batch or an invalid entry is rejected"""
+        assert client.post("/api/optimize-windows/batch", json={"requests": []}).status_code == 422
+        invalid = {"requests": [{"start_time": "25:00", "end_time": "18:00", "number_of_windows": 2}]}
+        assert client.post("/api/optimize-windows/batch", json=invalid).status_code == 422
+
+
+class TestScenarios:
+    """Test cases for /api/scenarios endpoint"""
+
+    def test_default_scenario_matches_forecast(self, client: TestClient):
+        """Test that the unchanged scenario reproduces the forecast's intensity"""
+        response = client.post("/api/scenarios", json={"scenarios": [{}], "window_hours": 2, "top_k": 2})
+
+        assert response.status_code == 200
+        data = response.json()["data"]
+        scenario = data["scenarios"][0]
+        expected = get_forecast_data()["Carbon_Intensity_gCO2_per_kWh"].round(1).tolist()
+        assert scenario["carbon_intensity"] == expected
+        assert scenario["green_hour_count"] == len(scenario["green_hours"])
+        assert len(scenario["best_windows"]) == 2
+        assert scenario["best_windows"][0]["avg_carbon_intensity"] <= scenario["best_windows"][1]["avg_carbon_intensity"]
+
+    def test_grid_and_list(self, client: TestClient):
+        """Test that grid combinations follow the listed scenarios and respond to the parameters"""
+        response = client.post("/api/scenarios", json={
+            "scenarios": [{"emission_factor": 0}],
+            "grid": {"renewable_scale": [1, 3], "demand_growth": [0, 0.5]},
+            "include_intensity": False,
+        })
+
+        assert response.status_code == 200
+        scenarios = response.json()["data"]["scenarios"]
+        assert len(scenarios) == 5
+        assert scenarios[0]["avg_carbon_intensity"] == 0.0
+        assert "carbon_intensity" not in scenarios[0]
+        by_params = {(s["renewable_scale"], s["demand_growth"]): s for s in scenarios[1:]}
+        # More renewables lower intensity; more demand raises it
+        assert by_params[(3.0, 0.0)]["avg_carbon_intensity"] < by_params[(1.0, 0.0)]["avg_carbon_intensity"]
+        assert by_params[(1.0, 0.5)]["avg_carbon_intensity"] > by_params[(1.0, 0.0)]["avg_carbon_intensity"]
+
+    def test_scenario_validation(self, client: TestClient):
+        """Test that empty or out-of-range scenarios are rejected"""
+        assert client.post("/api/scenarios", json={}).status_code == 400
+        assert client.post("/api/scenarios", json={"grid": {"demand_growth": [-1]}}).status_code == 422
+        assert client.post("/api/scenarios", json={"scenarios": [{"emission_factor": -5}]}).status_code == 422
+        # No dispatch units are configured in the test environment
+        merit_order = client.post("/api/scenarios", json={"scenarios": [{}], "intensity_model": "merit_order"})
+        assert merit_order.status_code == 400
+
+    def test_oversized_grid_rejected_before_expansion(self, client: TestClient, monkeypatch):
+        """Test that a grid over the scenario limit is refused from its axis lengths alone"""
+        import backend.main
+
+        def expand(**axes):
+            raise AssertionError("grid expanded")
+        monkeypatch.setattr(backend.main, "scenario_grid", expand)
+        axis = [round(0.01 * i, 2) for i in range(100)]
+        response = client.post("/api/scenarios", json={
+            "grid": {"emission_factor": axis, "renewable_scale": axis, "demand_growth": axis},
+        })
+        assert response.status_code == 400
+        assert response.json()["detail"].startswith("1000000 scenarios requested")
+
+
 class TestAvailableTimeRanges:
     """Test cases for /api/available-time-ranges endpoint"""
 
@@ -188,11 +348,20 @@ class TestScheduleAppliances:
         # Should still work but might have empty results
         assert response.status_code in [200, 400]
 
+    @pytest.mark.parametrize("window_start", ["24:00", "25:30", "-1:00"])
+    def test_schedule_appliances_invalid_time(self, client: TestClient, sample_schedule_data, window_start):
+        """Test that out-of-range window times are rejected with 400"""
+        sample_schedule_data["schedule"][0]["window_start"] = window_start
+        response = client.post("/api/schedule-appliances", json=sample_schedule_data)
+
+        assert response.status_code == 400
+        assert window_start in response.json()["detail"]
+
 
 class TestComputeGreenWindow:
     """Test cases for /api/compute-green-window endpoint"""
 
-    def test_compute_green_window_success(self, client: TestClient):
+    def test_compute_green_window_success(self, client: TestClient, job_dirs):
         """Test successful green window computation"""
         response = client.post("/api/compute-green-window")
 
@@ -210,10 +379,203 @@ class TestComputeGreenWindow:
         assert "duration_hours" in green_window
 
 
+class TestGreenWindowJobs:
+    """Test cases for the /api/jobs green window job endpoints"""
+
+    def test_job_runs_to_completion(self, client, job_dirs):
+        """Test that a submitted job can be polled until it has a result"""
+        import time
+        response = client.post("/api/jobs/compute-green-window", json={"steps": 24, "top_k": 3})
+        assert response.status_code == 202
+        job = response.json()["data"]
+        assert job["status"] in ("queued", "running", "succeeded")
+
+        # An identical submission returns the same job
+        again = client.post("/api/jobs/compute-green-window", json={"steps": 24, "top_k": 3}).json()["data"]
+        assert again["job_id"] == job["job_id"]
+
+        deadline = time.time() + 120
+        while job["status"] in ("queued", "running") and time.time() < deadline:
+            time.sleep(0.2)
+            job = client.get(f"/api/jobs/{job['job_id']}").json()["data"]
+
+        assert job["status"] == "succeeded", job["error"]
+        assert len(job["result"]["top_windows"]) <= 3
+        assert len(job["result"]["complete_forecast"]["hourly_classifications"]) == 24
+
+    def test_unknown_job(self, client):
+        """Test that an unknown job id is a 404"""
+        response = client.get("/api/jobs/0123456789abcdef0123456789abcdef")
+        assert response.status_code == 404
+
+    def test_invalid_parameters(self, client):
+        """Test that out-of-range parameters are rejected"""
+        response = client.post("/api/jobs/compute-green-window", json={"steps": 0})
+        assert response.status_code == 422
+
+
+class TestIngestLoad:
+    """Test cases for /api/ingest/load endpoint"""
+
+    @pytest.fixture
+    def live_dir(self, tmp_path, job_dirs):
+        """Point the live series at an empty log (and history updates at an empty directory) for the test"""
+        import backend.main
+        from backend.main import live_load
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr(live_load, "root", tmp_path)
+            mp.setattr(backend.main, "HISTORY_DIR", tmp_path / "history")
+            mp.setattr(backend.main, "ROLLUPS_DIR", tmp_path / "rollups")
+            live_load.reload()
+            yield tmp_path
+        live_load.reload()
+
+    def test_readings_extend_series_and_forecast(self, client, live_dir):
+        """Test that new hours are appended, deduplicated and move the forecast start"""
+        readings = [
+            {"timestamp": "2025-01-01T00:00:00", "load_mw": 1200},
+            {"timestamp": "2025-01-01T02:00:00", "load_mw": 1300},
+            {"timestamp": "2025-01-01T02:00:00", "load_mw": 1},
+        ]
+        response = client.post("/api/ingest/load", json={"readings": readings})
+        assert response.status_code == 200
+        data = response.json()["data"]
+        assert data["accepted"] == 2
+        assert data["duplicates"] == 1
+        assert data["interpolated_hours"] == 1
+        assert data["series_end"] == "2025-01-01T02"
+        assert (live_dir / "readings.bin").stat().st_size == 2 * 16
+
+        # Replaying the batch changes nothing
+        again = client.post("/api/ingest/load", json={"readings": readings}).json()["data"]
+        assert again["accepted"] == 0
+        assert again["series_version"] == data["series_version"]
+
+        forecast = client.get("/api/predict-demand").json()["data"]
+        assert forecast["forecast_period"]["start"] == "2025-01-01T03:00:00"
+
+    def test_readings_update_history_and_rollups(self, client, live_dir):
+        """Test that an ingest folds the new hours into the published history and rollups"""
+        import time
+        import backend.main
+        from backend.history import get_history_table
+        from backend.rollups import get_rollups
+        from ml_models.carbon_history_backfill import backfill
+        history_dir, rollups_dir = backend.main.HISTORY_DIR, backend.main.ROLLUPS_DIR
+        backfill(history_dir=history_dir, rollups_dir=rollups_dir, series=backend.main.live_load.arrays())
+        before = get_rollups(None, rollups_dir, history_dir).query("month")
+        assert str(before["bucket"].max().astype("datetime64[M]")) == "2024-12"
+
+        readings = [{"timestamp": f"2025-01-01T{hour:02d}:00:00", "load_mw": 1200 + hour} for hour in range(6)]
+        response = client.post("/api/ingest/load", json={"readings": readings})
+        assert response.status_code == 200
+        job_id = response.json()["data"]["history_job_id"]
+        assert job_id is not None
+        for _ in range(100):
+            job = client.get(f"/api/jobs/{job_id}").json()["data"]
+            if job["status"] not in ("queued", "running"):
+                break
+            time.sleep(0.1)
+        assert job["status"] == "succeeded", job["error"]
+
+        after = get_rollups(None, rollups_dir, history_dir).query("month")
+        assert len(after["bucket"]) == len(before["bucket"]) + 1
+        assert after["hours"][-1] == 6
+        assert after["load_mw_sum"][-1] == pytest.approx(sum(1200 + hour for hour in range(6)))
+        assert after["hours"][:-1].tolist() == before["hours"].tolist()
+        assert str(get_history_table(None, history_dir)["ds"][-1]) == "2025-01-01T05:00:00.000000000"
+
+    def test_late_reading_replaces_interpolated_hour(self, client, live_dir):
+        """Test that a reading for an interpolated hour reaches the published history and rollups"""
+        import time
+        import backend.main
+        from backend.history import get_history_table
+        from backend.rollups import get_rollups
+        from ml_models.carbon_history_backfill import backfill
+        history_dir, rollups_dir = backend.main.HISTORY_DIR, backend.main.ROLLUPS_DIR
+        backfill(history_dir=history_dir, rollups_dir=rollups_dir, series=backend.main.live_load.arrays())
+
+        def ingest(readings):
+            response = client.post("/api/ingest/load", json={"readings": readings})
+            assert response.status_code == 200
+            job_id = response.json()["data"]["history_job_id"]
+            for _ in range(100):
+                job = client.get(f"/api/jobs/{job_id}").json()["data"]
+                if job["status"] not in ("queued", "running"):
+                    break
+                time.sleep(0.1)
+            assert job["status"] == "succeeded", job["error"]
+
+        def january():
+            table = get_history_table(None, history_dir)
+            ds = table["ds"]
+            lo = int(np.searchsorted(ds, np.datetime64("2025-01-01T00", "ns")))
+            return np.asarray(table["load_mw"][lo:]).tolist()
+
+        ingest([{"timestamp": "2025-01-01T00:00:00", "load_mw": 1200},
+                {"timestamp": "2025-01-01T02:00:00", "load_mw": 1300}])
+        assert january() == [1200.0, 1250.0, 1300.0]
+
+        ingest([{"timestamp": "2025-01-01T01:00:00", "load_mw": 1400}])
+        assert january() == [1200.0, 1400.0, 1300.0]
+
+        month = get_rollups(None, rollups_dir, history_dir).query("month")
+        assert str(month["bucket"][-1].astype("datetime64[M]")) == "2025-01"
+        assert month["hours"][-1] == 3
+        assert month["load_mw_sum"][-1] == pytest.approx(1200 + 1400 + 1300)
+        assert month["load_mw_max"][-1] == 1400.0
+        assert month["load_mw_min"][-1] == 1200.0
+
+    def test_invalid_readings_rejected(self, client, live_dir):
+        """Test validation of timestamps and values"""
+        cases = [
+            ({"timestamp": "2025-01-01T02:30:00", "load_mw": 1200}, 400),
+            ({"timestamp": "2023-06-01T00:00:00", "load_mw": 1200}, 400),
+            ({"timestamp": "2027-01-01T00:00:00", "load_mw": 1200}, 400),
+            ({"timestamp": "2025-01-01T02:00:00+00:00", "load_mw": 1200}, 400),
+            ({"timestamp": "2025-01-01T02:00:00", "load_mw": -5}, 422),
+        ]
+        for reading, status in cases:
+            assert client.post("/api/ingest/load", json={"readings": [reading]}).status_code == status
+        assert client.post("/api/ingest/load", json={"readings": []}).status_code == 422
+        assert not (live_dir / "readings.bin").exists()
+
+
 class TestForecast24h:
     """Test cases for /api/forecast-24h endpoint"""
 
-    def test_get_forecast_24h_after_computation(self, client: TestClient):
+    def test_fresh_clone_serves_committed_classification(self, client: TestClient, tmp_path, monkeypatch):
+        """Test that with no published snapshot the committed classification JSON is served once seeded"""
+        import backend.snapshot
+        monkeypatch.setattr(backend.snapshot, "SNAPSHOT_DIR", tmp_path / "snapshots")
+
+        # Reads never publish; the seed happens at startup
+        assert client.get("/api/forecast-24h").status_code == 404
+        assert not (tmp_path / "snapshots" / "CURRENT").exists()
+        assert backend.snapshot.ensure_snapshot() is not None
+
+        response = client.get("/api/forecast-24h")
+
+        assert response.status_code == 200
+        with open(backend.snapshot.CLASSIFICATION_FILE) as f:
+            committed = json.load(f)
+        hourly = response.json()["data"]["hourly_data"]
+        assert len(hourly) == len(committed["hourly_classifications"])
+        assert [row["window_type"] for row in hourly] == [
+            row["window_type"] for row in committed["hourly_classifications"]
+        ]
+        assert (tmp_path / "snapshots" / "CURRENT").exists()
+
+    def test_forecast_24h_without_any_data(self, client: TestClient, tmp_path, monkeypatch):
+        """Test that 404 is returned when there is neither a snapshot nor a classification file"""
+        import backend.snapshot
+        monkeypatch.setattr(backend.snapshot, "SNAPSHOT_DIR", tmp_path / "snapshots")
+        monkeypatch.setattr(backend.snapshot, "CLASSIFICATION_FILE", tmp_path / "missing.json")
+
+        assert backend.snapshot.ensure_snapshot() is None
+        assert client.get("/api/forecast-24h").status_code == 404
+
+    def test_get_forecast_24h_after_computation(self, client: TestClient, job_dirs):
         """Test getting 24h forecast after computation"""
         # First compute the green window to generate data
         compute_response = client.post("/api/compute-green-window")
@@ -234,6 +596,10 @@ class TestForecast24h:
         assert "green_windows" in summary
         assert "dirty_windows" in summary
 
+        # Both endpoints serve the same published snapshot
+        assert data["data"]["snapshot_version"] == compute_response.json()["data"]["snapshot_version"]
+        assert summary["green_windows"] + summary["dirty_windows"] == summary["total_hours"]
+
     def test_get_forecast_24h_without_computation(self, client: TestClient):
         """Test getting forecast when no data is available"""
         # This might fail if no data exists, but let's see
@@ -243,6 +609,74 @@ class TestForecast24h:
         assert response.status_code in [200, 404]
 
 
+class TestHistory:
+    """Test cases for /api/history endpoint"""
+
+    def test_history_range_query(self, client: TestClient):
+        """Test hourly and daily history queries over a time range"""
+        import subprocess
+        backfill = subprocess.run(["python", "ml_models/carbon_history_backfill.py"], capture_output=True, text=True)
+        assert backfill.returncode == 0
+
+        response = client.get("/api/history", params={"start": "2024-03-01T00:00", "end": "2024-03-01T05:00"})
+        assert response.status_code == 200
+        history = response.json()["data"]["history"]
+        assert len(history) == 6
+        assert history[0]["timestamp"] == "2024-03-01T00:00:00"
+        assert history[0]["window_type"] in ["green_window", "dirty_window"]
+
+        response = client.get("/api/history", params={"start": "2024-03-01", "end": "2024-03-07T23:00", "resolution": "day"})
+        assert response.status_code == 200
+        days = response.json()["data"]["history"]
+        assert len(days) == 7
+        assert all(day["hours"] == 24 for day in days)
+
+    def test_history_invalid_parameters(self, client: TestClient):
+        """Test error handling for bad resolution and timestamps"""
+        assert client.get("/api/history", params={"resolution": "minute"}).status_code == 400
+        assert client.get("/api/history", params={"start": "not-a-date"}).status_code == 400
+
+
+class TestAnalyticsRollups:
+    """Test cases for /api/analytics/rollups endpoint"""
+
+    def test_rollups_by_granularity(self, client: TestClient):
+        """Test monthly and hour-of-day rollups built by the backfill"""
+        import subprocess
+        backfill = subprocess.run(["python", "ml_models/carbon_history_backfill.py"], capture_output=True, text=True)
+        assert backfill.returncode == 0
+
+        response = client.get("/api/analytics/rollups", params={"granularity": "month", "start": "2024-03-01", "end": "2024-05-31"})
+        assert response.status_code == 200
+        buckets = response.json()["data"]["buckets"]
+        assert [b["bucket"] for b in buckets] == ["2024-03-01", "2024-04-01", "2024-05-01"]
+        assert buckets[0]["hours"] == 31 * 24
+        assert buckets[0]["load_mw"]["min"] <= buckets[0]["load_mw"]["mean"] <= buckets[0]["load_mw"]["max"]
+
+        response = client.get("/api/analytics/rollups", params={"granularity": "hour_of_day"})
+        assert response.status_code == 200
+        assert len(response.json()["data"]["buckets"]) == 24
+
+    def test_rollups_invalid_granularity(self, client: TestClient):
+        """Test error handling for an unsupported granularity"""
+        assert client.get("/api/analytics/rollups", params={"granularity": "year"}).status_code == 400
+
+
+class TestAdmission:
+    """Test cases for /api/admission endpoint"""
+
+    def test_limits_and_counters_reported(self, client):
+        """Test that the expensive routes are limited and their counters exposed"""
+        client.post("/api/optimize-windows", json={"start_time": "06:00", "end_time": "18:00", "number_of_windows": 1})
+        response = client.get("/api/admission")
+        assert response.status_code == 200
+        routes = response.json()["data"]["routes"]
+        for path in ("/api/compute-green-window", "/api/optimize-windows", "/api/schedule-appliances"):
+            assert {"rate", "burst", "concurrency", "admitted", "rate_limited", "saturated"} <= set(routes[path])
+        assert routes["/api/optimize-windows"]["admitted"] >= 1
+        assert routes["/api/optimize-windows"]["in_progress"] == 0
+
+
 class TestHealthCheck:
     """Test cases for health check endpoint"""
 
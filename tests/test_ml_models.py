@@ -1,8 +1,14 @@
 import pytest
 import subprocess
 import json
+import numpy as np
 import pandas as pd
 from pathlib import Path
+from ml_models.backtest_demand_model import forecast_origins, rolling_origins, score
+from ml_models.compute_green_window import green_runs, rank_runs, load_load_series
+from ml_models.aggregate_meter_data import MISSING_FEEDER, HourlyTotals, aggregate, feeder_files
+from ml_models.generate_synthetic_data import generation_frame, holidays, local_hours, load_profile
+from ml_models.seasonal_supply_model_builder import DTYPES, aggregate_chunk
 
 
 class TestMLScripts:
@@ -106,6 +112,313 @@ class TestMLScripts:
         assert len(data["hourly_classifications"]) == 24
 
 
+    def test_carbon_history_backfill(self):
+        """Test that the carbon-intensity history backfill runs successfully"""
+        script_path = Path("ml_models/carbon_history_backfill.py")
+
+        # Run the script
+        result = subprocess.run(
+            ["python", str(script_path)],
+            capture_output=True,
+            text=True,
+            cwd=Path(".")
+        )
+
+        # Should complete successfully
+        assert result.returncode == 0
+        assert "Wrote" in result.stdout
+
+        # Check that the published table exists
+        history_dir = Path("outputs/carbon_history/nova_scotia")
+        version = (history_dir / "CURRENT").read_text().strip()
+        assert (history_dir / version / "carbon_intensity.npy").exists()
+
+
+    def test_backtest_demand_model(self, tmp_path):
+        """Test that the rolling-origin backtest runs and writes its report"""
+        report_file = tmp_path / "backtest.json"
+        result = subprocess.run(
+            ["python", "ml_models/backtest_demand_model.py", "--origins", "5", "--workers", "1",
+             "--in-sample", "--output", str(report_file)],
+            capture_output=True,
+            text=True,
+            cwd=Path(".")
+        )
+
+        assert result.returncode == 0
+        with open(report_file, 'r') as f:
+            report = json.load(f)
+        assert report["origins"] == 5
+        assert report["in_sample"] is True
+        assert len(report["per_origin"]) == 5
+        assert len(report["mae_by_horizon"]) == 24
+        assert 0 <= report["green_accuracy"] <= 1
+
+    def test_aggregate_meter_data(self, tmp_path):
+        """Test that interval files are aggregated into loadable hourly series"""
+        write_meter_files(tmp_path)
+        out_dir = tmp_path / "hourly"
+        result = subprocess.run(
+            ["python", "ml_models/aggregate_meter_data.py", str(tmp_path / "meters_*.csv"), "--by-feeder",
+             "--workers", "2", "--chunk-rows", "50", "--output-dir", str(out_dir)],
+            capture_output=True,
+            text=True,
+            cwd=Path(".")
+        )
+
+        assert result.returncode == 0
+        assert "rows/s" in result.stdout
+        total = load_load_series(out_dir / "total.csv")
+        assert len(total) == 24
+        assert total["y"].iloc[0] == pytest.approx(0.012)
+        assert (out_dir / "feeder_f1.csv").exists()
+        assert (out_dir / "feeder_f2.csv").exists()
+
+    def test_generate_synthetic_data(self, tmp_path):
+        """Test that synthetic regions are written in the load and StatCan input formats"""
+        result = subprocess.run(
+            ["python", "-m", "ml_models.generate_synthetic_data", "--regions", "2", "--years", "1",
+             "--start-year", "2024", "--output-dir", str(tmp_path)],
+            capture_output=True,
+            text=True,
+            cwd=Path(".")
+        )
+
+        assert result.returncode == 0
+        assert "rows/s" in result.stdout
+        manifest = json.loads((tmp_path / "manifest.json").read_text())
+        assert [r["region"] for r in manifest["regions"]] == ["Nova Scotia", "Newfoundland and Labrador"]
+
+        raw = pd.read_csv(tmp_path / "load" / "nova_scotia.csv")
+        assert list(raw.columns) == ["HOUR", "Date/time", "Load [MW]"]
+        assert len(raw) == manifest["regions"][0]["rows"]
+        assert raw["Date/time"].duplicated().any()  # repeated hour at the end of DST
+        series = load_load_series(tmp_path / "load" / "nova_scotia.csv")
+        assert series.index.freq == "h"
+
+        generation = pd.read_csv(tmp_path / "energy_sources_data.csv",
+                                 usecols=["REF_DATE", "GEO", "Type of electricity generation", "VALUE"])
+        assert len(generation) == 2 * 12 * 9
+        assert {"Hydraulic turbine", "Wind power turbine", "Solar"} <= set(generation["Type of electricity generation"])
+
+
+def write_meter_files(directory):
+    """Two files of 15-minute readings for a day: 3 meters on feeders F1/F2 reading 1 kWh each"""
+    ts = pd.date_range("2024-03-01", periods=96, freq="15min").strftime("%Y-%m-%dT%H:%M:%S")
+    for i, meters in enumerate((["a", "b"], ["c"])):
+        pd.DataFrame({
+            "timestamp": np.tile(ts, len(meters)),
+            "meter_id": np.repeat(meters, len(ts)),
+            "feeder_id": np.repeat(["F1" if m != "c" else "F2" for m in meters], len(ts)),
+            "kwh": 1.0,
+        }).to_csv(directory / f"meters_{i}.csv", index=False)
+
+
+class TestMeterAggregation:
+    """Test the out-of-core hourly aggregation of meter readings"""
+
+    OPTIONS = {
+        'timestamp_col': 'timestamp', 'timestamp_format': 'ISO8601', 'value_col': 'kwh', 'unit': 'kwh',
+        'interval_minutes': 15, 'interval_ending': False, 'feeder_col': 'feeder_id', 'chunk_rows': 40,
+    }
+
+    def test_chunks_and_files_sum_per_feeder(self, tmp_path):
+        """Test that chunked, merged totals equal the per-hour sums"""
+        write_meter_files(tmp_path)
+        totals = aggregate(sorted(tmp_path.glob("meters_*.csv")), self.OPTIONS, workers=1)
+        assert totals.rows == 3 * 96
+        assert set(totals.feeders) == {"F1", "F2"}
+        assert totals.series("F1")["Load [MW]"].tolist() == [0.008] * 24
+        assert totals.series()["Readings"].tolist() == [12] * 24
+        assert totals.series()["Date/time"].iloc[0] == "2024-03-01 01:00"
+
+    def test_demand_units_and_interval_ending(self, tmp_path):
+        """Test kW readings and timestamps marking the end of each interval"""
+        pd.DataFrame({
+            "timestamp": ["2024-03-01T00:15", "2024-03-01T01:00", "2024-03-01T01:15", "bad"],
+            "kwh": [400.0, 400.0, 800.0, 1.0],
+        }).to_csv(tmp_path / "kw.csv", index=False)
+        options = {**self.OPTIONS, 'unit': 'kw', 'interval_ending': True, 'feeder_col': None}
+        totals = aggregate([tmp_path / "kw.csv"], options, workers=1)
+        series = totals.series()
+        assert totals.skipped == 1
+        assert series["Date/time"].tolist() == ["2024-03-01 01:00", "2024-03-01 02:00"]
+        assert series["Load [MW]"].tolist() == [0.2, 0.2]
+
+    def test_missing_feeder_kept_apart_from_unknown(self, tmp_path):
+        """Test that readings without a feeder id do not merge into a feeder called unknown"""
+        pd.DataFrame({
+            "timestamp": ["2024-03-01T00:00", "2024-03-01T00:15"],
+            "feeder_id": ["unknown", None],
+            "kwh": [1.0, 2.0],
+        }).to_csv(tmp_path / "missing.csv", index=False)
+        totals = aggregate([tmp_path / "missing.csv"], self.OPTIONS, workers=1)
+        assert totals.feeders["unknown"][0].tolist() == [1.0]
+        assert totals.feeders[MISSING_FEEDER][0].tolist() == [2.0]
+
+    def test_feeder_files_do_not_collide(self):
+        """Test that ids sharing a slug get distinct files and missing feeders a reserved one"""
+        files = feeder_files(["A-1", "a 1", "F2", "unknown", MISSING_FEEDER])
+        assert len(set(files.values())) == 5
+        assert files["F2"] == "feeder_f2.csv"
+        assert files["unknown"] == "feeder_unknown.csv"
+        assert files[MISSING_FEEDER] == "feeder__missing.csv"
+        assert files["A-1"].startswith("feeder_a_1_") and files["a 1"].startswith("feeder_a_1_")
+        assert feeder_files(["A-1", "a 1"]) == {name: files[name] for name in ["A-1", "a 1"]}
+
+    def test_out_of_order_ranges_merge(self):
+        """Test that totals grow in both directions and merge by hour"""
+        early, late = HourlyTotals(), HourlyTotals()
+        late.add(np.array([100, 101]), np.array([1.0, 2.0]), np.array([0, 0]), ["x"])
+        early.add(np.array([98]), np.array([5.0]), np.array([0]), ["y"])
+        late.merge(early)
+        assert (late.start, len(late)) == (98, 4)
+        assert late.feeders["x"][0].tolist() == [0.0, 0.0, 1.0, 2.0]
+        assert late.feeders["y"][0].tolist() == [5.0, 0.0, 0.0, 0.0]
+
+
+class TestSupplyAggregation:
+    """Test the chunked renewable totals of the seasonal supply builder"""
+
+    def test_chunks_with_different_regions_combine_by_name(self):
+        """Test that per-chunk GEO codes are mapped to names before chunks are summed"""
+        rows = pd.DataFrame({
+            'REF_DATE': ['2020-01', '2020-01', '2020-02', '2020-01'],
+            'GEO': ['Quebec', 'Nova Scotia', 'Nova Scotia', 'Quebec'],
+            'Type of electricity generation': ['Wind power turbine', 'Solar', 'Hydraulic turbine', 'Combustible fuels'],
+            'VALUE': [1.0, 2.0, 4.0, 8.0],
+        })
+        # Each chunk infers its own categories, so "Nova Scotia" has code 0 in one and not in the other
+        first, second = rows.iloc[:1].astype(DTYPES), rows.iloc[1:].astype(DTYPES)
+        totals = aggregate_chunk(first).add(aggregate_chunk(second), fill_value=0.0)
+
+        assert totals.to_dict() == {
+            ('Nova Scotia', 2020, 1): 2.0,
+            ('Nova Scotia', 2020, 2): 4.0,
+            ('Quebec', 2020, 1): 1.0,
+        }
+
+
+class TestSyntheticData:
+    """Test the building blocks of the synthetic dataset generator"""
+
+    def test_holidays(self):
+        """Test fixed and moving statutory holidays"""
+        days = set(holidays([2024]).astype(str))
+        assert {"2024-01-01", "2024-03-29", "2024-05-20", "2024-07-01", "2024-08-05",
+                "2024-09-02", "2024-10-14", "2024-11-11", "2024-12-25", "2024-12-26"} == days
+
+    def test_local_hours_follow_dst(self):
+        """Test that local wall-clock hours skip in spring and repeat in autumn, except without DST"""
+        halifax = local_hours(2024, 1, "America/Halifax").astype(str)
+        assert len(halifax) == 8784
+        assert "2024-03-10T02" not in halifax
+        assert (halifax == "2024-11-03T01").sum() == 2
+        regina = local_hours(2024, 1, "America/Regina")
+        assert len(np.unique(regina)) == len(regina) == 8784
+
+    def test_load_seasonality(self):
+        """Test weekly and daily structure around the requested mean"""
+        local = local_hours(2023, 1, "America/Halifax")
+        load = pd.Series(load_profile(local, 1000.0, np.random.default_rng(0)), index=pd.DatetimeIndex(local))
+        assert 900 < load.mean() < 1100
+        assert load[load.index.dayofweek < 5].mean() > load[load.index.dayofweek >= 5].mean()
+        by_hour = load.groupby(load.index.hour).mean()
+        assert by_hour.idxmax() in range(16, 21)
+        assert by_hour.idxmin() in range(1, 7)
+
+    def test_generation_matches_load(self):
+        """Test that the types add up to the total and the total covers the load energy"""
+        local = local_hours(2023, 1, "America/Halifax")
+        load = np.full(len(local), 100.0)
+        frame = generation_frame("Nova Scotia", 0, local, load, 0.0, np.random.default_rng(1))
+        by_type = frame.pivot(index="REF_DATE", columns="Type of electricity generation", values="VALUE")
+        total = by_type.pop("Total all types of electricity generation")
+        assert np.allclose(by_type.sum(axis=1), total, atol=10)
+        assert (total >= 0.9 * 100.0 * 24 * 28).all()
+
+
+class TestBacktest:
+    """Test the rolling-origin backtest building blocks"""
+
+    SPEC = {
+        'order': (1, 0, 0), 'seasonal_order': (0, 0, 0, 0), 'trend': 'c',
+        'enforce_stationarity': False, 'enforce_invertibility': False, 'exog_names': [],
+        'params': np.array([100.0, 0.8, 25.0]),
+    }
+
+    def test_rolling_forward_matches_refiltering(self):
+        """Test that extending the filter between origins equals filtering from scratch"""
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+        rng = np.random.default_rng(0)
+        y = 500 + rng.normal(0, 5, 400)
+        origins = rolling_origins(len(y), horizon=24, step=24, warmup=48)
+
+        forecasts = forecast_origins(y, origins, self.SPEC, horizon=24)
+
+        kwargs = {k: v for k, v in self.SPEC.items() if k not in ('params', 'exog_names')}
+        for i in [0, len(origins) - 1]:
+            expected = SARIMAX(y[:origins[i]], **kwargs).filter(self.SPEC['params']).forecast(24)
+            np.testing.assert_allclose(forecasts[i], expected)
+
+    def test_origins_start_after_first(self):
+        """Test that origins before the first allowed index are left out"""
+        origins = rolling_origins(400, horizon=24, step=24, warmup=48, first=300)
+        assert origins.tolist() == [300, 324, 348, 372]
+        assert rolling_origins(400, horizon=24, step=24, warmup=48, first=390).tolist() == []
+
+    def test_score_metrics(self):
+        """Test MAE, MAPE and green/dirty confusion counts"""
+        ds = (np.datetime64("2024-06-01T00", "ns") + np.arange(4) * np.timedelta64(1, "h")).reshape(1, 4)
+        baselines = np.full(12, 400.0)
+        actual = np.array([[1000.0, 1000.0, 2000.0, 2000.0]])  # intensity 420, 420, 560, 560
+        forecast = np.array([[1100.0, 900.0, 2000.0, 1000.0]])
+
+        metrics = score(ds, actual, forecast, baselines)
+
+        assert metrics["mae_mw"] == pytest.approx(300.0)
+        assert metrics["mape_pct"] == pytest.approx((10 + 10 + 0 + 50) / 4)
+        # Under-forecasting hour 2 (900 MW) drops its intensity below the baseline
+        assert metrics["confusion"] == {"true_green": 0, "false_green": 1, "missed_green": 0, "true_dirty": 3}
+
+
+class TestGreenRuns:
+    """Test run-length extraction and ranking of green windows"""
+
+    def test_all_runs_with_lengths_and_intensity(self):
+        """Test that every contiguous green run is found, including at the edges"""
+        is_green = np.array([1, 1, 0, 0, 1, 0, 1, 1, 1], dtype=bool)
+        intensity = np.array([10, 20, 99, 99, 30, 99, 40, np.nan, 60])
+
+        runs = green_runs(is_green, intensity)
+
+        assert runs["start"].tolist() == [0, 4, 6]
+        assert runs["end"].tolist() == [1, 4, 8]
+        assert runs["length_hours"].tolist() == [2, 1, 3]
+        assert runs["avg_carbon_intensity"].tolist() == pytest.approx([15.0, 30.0, 100 / 3])
+
+    def test_no_green_hours(self):
+        """Test that an all-dirty horizon has no runs"""
+        runs = green_runs(np.zeros(24, dtype=bool), np.full(24, 500.0))
+        assert len(runs["start"]) == 0
+        assert len(rank_runs(runs)["start"]) == 0
+
+    def test_rank_longest_then_cleanest(self):
+        """Test top-k ordering on a multi-week horizon"""
+        hours = 24 * 21
+        is_green = np.zeros(hours, dtype=bool)
+        is_green[10:15] = True    # 5 hours
+        is_green[100:103] = True  # 3 hours, cleaner
+        is_green[200:203] = True  # 3 hours
+        intensity = np.full(hours, 400.0)
+        intensity[100:103] = 300.0
+
+        top = rank_runs(green_runs(is_green, intensity), top_k=2)
+
+        assert top["start"].tolist() == [10, 100]
+        assert top["length_hours"].tolist() == [5, 3]
+
+
 class TestOutputFiles:
     """Test the structure and content of output files"""
 
@@ -0,0 +1,208 @@
+import json
+import sys
+import threading
+import types
+import pytest
+from ai_chatbot.parser import (
+    APPLIANCE_ALIASES, MIN_RULE_CONFIDENCE, LLMParser, extract_tasks, get_parser, rule_extract_tasks,
+)
+from backend.appliances import APPLIANCE_CONSUMPTION
+
+
+class RecordingPipe:
+    """Stand-in generation pipeline that echoes a task per prompt and records batch sizes"""
+
+    def __init__(self):
+        self.batch_sizes = []
+        self.lock = threading.Lock()
+
+    def __call__(self, prompts, **kwargs):
+        with self.lock:
+            self.batch_sizes.append(len(prompts))
+            self.kwargs = kwargs
+        return [{"generated_text": json.dumps({"name": "task", "hours": i + 1})} for i in range(len(prompts))]
+
+
+def make_parser(**kwargs):
+    parser = LLMParser(**kwargs)
+    parser.pipe = RecordingPipe()
+    parser._loaded = True
+    return parser
+
+
+class TestExtractTasks:
+    """Test parsing of raw model output"""
+
+    def test_extract_tasks(self):
+        """Test that JSON-like objects are extracted and hours coerced to float"""
+        output = '[{"name": "Laundry", "hours": "2"}, {"name": "EV"}, {bad}]'
+        assert extract_tasks(output) == [{"name": "Laundry", "hours": 2.0}]
+
+    def test_extract_tasks_empty(self):
+        """Test output without any objects"""
+        assert extract_tasks("nothing here") == []
+
+
+class TestRuleExtractor:
+    """Test the deterministic fast-path task extractor"""
+
+    def test_common_phrasing(self):
+        """Test appliance aliases and duration units are recognised"""
+        tasks, confidence = rule_extract_tasks("laundry for 2 hours, charge my EV for 3.5h")
+        assert tasks == [{"name": "washer", "hours": 2.0}, {"name": "ev_charger", "hours": 3.5}]
+        assert confidence == 1.0
+
+    def test_minutes_and_number_words(self):
+        """Test minute units, spelled-out amounts and multi-word appliance names"""
+        tasks, _ = rule_extract_tasks("Dryer for 45 min; water heater for half an hour")
+        assert tasks == [{"name": "dryer", "hours": 0.75}, {"name": "water_heater", "hours": 0.5}]
+
+    def test_default_duration(self):
+        """Test a task without a duration is assumed to take one hour"""
+        tasks, _ = rule_extract_tasks("run the dishwasher")
+        assert tasks == [{"name": "dishwasher", "hours": 1.0}]
+
+    def test_unknown_task_lowers_confidence(self):
+        """Test that clauses without a known appliance reduce confidence"""
+        tasks, confidence = rule_extract_tasks("laundry for 2 hours, also run backups")
+        assert tasks == [{"name": "washer", "hours": 2.0}]
+        assert confidence < 1.0
+
+        assert rule_extract_tasks("hello there") == ([], 0.0)
+
+    @pytest.mark.parametrize("text,expected", [
+        ("wash the dishes for 1 hour", [{"name": "dishwasher", "hours": 1.0}]),
+        ("dry the dishes", [{"name": "dishwasher", "hours": 1.0}]),
+        ("cook in the microwave for 5 minutes", [{"name": "microwave", "hours": 0.0833}]),
+        ("heat water for 2 hours", [{"name": "water_heater", "hours": 2.0}]),
+    ])
+    def test_noun_overrides_verb(self, text, expected):
+        """Test that an appliance noun in a clause wins over a verb alias"""
+        assert rule_extract_tasks(text) == (expected, 1.0)
+
+    @pytest.mark.parametrize("text", ["wash the car", "charge my phone for 2 hours"])
+    def test_verb_with_unknown_object_is_unresolved(self, text):
+        """Test that a verb alias does not claim an object it does not schedule"""
+        assert rule_extract_tasks(text) == ([], 0.0)
+
+    def test_verb_only_is_not_confident(self):
+        """Test that a clause read from a verb alone stays below the fast-path threshold"""
+        tasks, confidence = rule_extract_tasks("wash for 2 hours")
+        assert tasks == [{"name": "washer", "hours": 2.0}]
+        assert confidence < MIN_RULE_CONFIDENCE
+
+    def test_aliases_cover_backend_appliances(self):
+        """Test that the parser knows exactly the appliances the backend schedules"""
+        assert set(APPLIANCE_ALIASES) == set(APPLIANCE_CONSUMPTION)
+
+
+class TestLLMParser:
+    """Test lazy loading, sharing and micro-batching of the LLM parser"""
+
+    def test_get_parser_is_shared(self):
+        """Test that the same parser instance is returned per model name"""
+        assert get_parser("shared-test-model") is get_parser("shared-test-model")
+
+    def test_get_parser_is_keyed_on_settings(self):
+        """Test that differently configured callers do not share a parser"""
+        greedy = get_parser("settings-test-model", num_beams=1, max_new_tokens=32)
+        assert get_parser("settings-test-model", num_beams=1, max_new_tokens=32) is greedy
+        assert get_parser("settings-test-model") is not greedy
+        assert get_parser("settings-test-model", backend="int8") is not get_parser("settings-test-model")
+        assert (greedy.num_beams, greedy.max_new_tokens) == (1, 32)
+
+    def test_model_loaded_on_batching_thread(self, monkeypatch):
+        """Test that the first submit does not load the model on the caller's thread"""
+        parser = LLMParser("thread-test-model")
+        threads = []
+
+        def build():
+            threads.append(threading.current_thread().name)
+            return RecordingPipe()
+        monkeypatch.setattr(parser, "_build_pipeline", build)
+        monkeypatch.setitem(sys.modules, "transformers", types.SimpleNamespace(set_seed=lambda seed: None))
+
+        future = parser.submit("backup the server")
+        assert future.result(timeout=5) == [{"name": "task", "hours": 1.0}]
+        assert threads == ["llm-parser-batcher"]
+
+    def test_model_not_loaded_on_init(self):
+        """Test that constructing a parser does not build the pipeline"""
+        parser = LLMParser("missing-model")
+        assert parser.pipe is None
+        assert parser._loaded is None
+
+    def test_empty_text_skips_model(self):
+        """Test that blank input returns no tasks without touching the model"""
+        parser = make_parser()
+        assert parser.parse_tasks("   ") == []
+        assert parser.pipe.batch_sizes == []
+
+    def test_concurrent_calls_are_batched(self):
+        """Test that concurrent parse_tasks calls share one generate call"""
+        parser = make_parser(max_batch_size=4, max_wait_ms=200)
+        futures = [parser.submit(f"text {i}") for i in range(4)]
+        results = [f.result(timeout=5) for f in futures]
+
+        assert parser.pipe.batch_sizes == [4]
+        assert [r[0]["hours"] for r in results] == [1.0, 2.0, 3.0, 4.0]
+
+    def test_batch_size_is_capped(self):
+        """Test that batches never exceed max_batch_size"""
+        parser = make_parser(max_batch_size=2, max_wait_ms=200)
+        futures = [parser.submit(f"text {i}") for i in range(5)]
+        for f in futures:
+            f.result(timeout=5)
+
+        assert max(parser.pipe.batch_sizes) <= 2
+        assert sum(parser.pipe.batch_sizes) == 5
+
+    def test_confident_rules_skip_model(self):
+        """Test that a confidently parsed text never reaches the model"""
+        parser = make_parser()
+        tasks = parser.parse_tasks("Laundry for 2 hours, charge my EV for 3.5h")
+
+        assert tasks == [{"name": "washer", "hours": 2.0}, {"name": "ev_charger", "hours": 3.5}]
+        assert parser.pipe.batch_sizes == []
+
+    def test_results_are_cached_on_normalized_text(self):
+        """Test that repeated texts are answered from the LRU cache"""
+        parser = make_parser(cache_size=1)
+        parser.parse_tasks("backup the server")
+        parser.parse_tasks("  Backup   the SERVER ")
+        assert parser.pipe.batch_sizes == [1]
+
+        # The oldest entry is evicted once the cache is full
+        parser.parse_tasks("sync photos")
+        parser.parse_tasks("backup the server")
+        assert parser.pipe.batch_sizes == [1, 1, 1]
+
+    def test_unloaded_model_uses_confident_rules_only(self):
+        """Test that without a model only confidently parsed texts yield tasks"""
+        parser = LLMParser("missing-model")
+        parser._loaded = False
+        assert parser.parse_tasks("laundry, then run backups") == []
+        assert parser.parse_tasks("laundry for 2 hours") == [{"name": "washer", "hours": 2.0}]
+
+    def test_generation_error_yields_no_tasks(self):
+        """Test that a failed generate call does not fall back to low-confidence rule results"""
+        parser = make_parser()
+
+        def fail(prompts, **kwargs):
+            raise RuntimeError("generation failed")
+        parser.pipe = fail
+        assert parser.parse_tasks("laundry, then run backups") == []
+
+    def test_unknown_backend_rejected(self):
+        """Test that only the supported inference backends are accepted"""
+        with pytest.raises(ValueError):
+            LLMParser(backend="fp16")
+
+    def test_generation_settings_are_configurable(self):
+        """Test that beam count and token budget reach the generate call"""
+        parser = make_parser(num_beams=1, max_new_tokens=32)
+        parser.parse_tasks("backup the server")
+
+        assert parser.pipe.kwargs["num_beams"] == 1
+        assert parser.pipe.kwargs["max_new_tokens"] == 32
+        assert parser.pipe.kwargs["early_stopping"] is False
@@ -1,11 +1,30 @@
 import pytest
 import json
+import numpy as np
 import pandas as pd
 from pathlib import Path
 from backend.main import (
     time_to_minutes, minutes_to_time, calculate_energy_savings,
     calculate_renewable_percentage, get_forecast_data
 )
+from backend.appliances import APPLIANCE_CONSUMPTION, appliance_profile, start_emissions
+from backend.seasonal import BaselineTable, normalize_region
+from backend.registry import ModelRegistry, publish_model
+from backend.columnar import append_table, write_table, open_table
+from backend.history import query_history, time_slice
+from backend.rollups import RollupStore
+from backend.snapshot import write_snapshot, get_snapshot, hourly_records, window_records
+from backend.forecasters import SeasonalProfile, TieredForecaster, catch_up, hour_of_week
+from backend.live_load import LiveLoadSeries, append_readings, to_hours, LOG_NAME
+from backend.forecast_state import SharedForecast
+from backend.jobs import JobQueue, JobQueueFull
+from backend.admission import AdmissionController, AdmissionMiddleware, RouteLimit, load_limits
+from backend.loadtest import RouteStats, format_table, run_load
+from backend.forecast_records import ForecastRecords, GREEN, DIRTY, classify_hours, window_types, forecast_rows
+from backend.dispatch import MeritOrder, load_dispatch
+from backend.scenarios import best_windows, evaluate_scenarios, grid_size, scenario_grid
+from backend.fourier import fourier_names, fourier_terms, forecast_exog, forecast_mean
+from ml_models.carbon_history_backfill import backfill, compute_history
 
 
 class TestTimeUtilities:
@@ -18,6 +37,12 @@ class TestTimeUtilities:
         assert time_to_minutes("12:00") == 720
         assert time_to_minutes("23:59") == 1439
 
+    @pytest.mark.parametrize("time_str", ["24:00", "25:30", "-1:00", "12:60", "12", "noon", "1:2:3"])
+    def test_time_to_minutes_rejects_invalid_times(self, time_str):
+        """Test that times outside 00:00-23:59 or not in HH:MM are rejected"""
+        with pytest.raises(ValueError):
+            time_to_minutes(time_str)
+
     def test_minutes_to_time(self):
         """Test converting minutes to time string"""
         assert minutes_to_time(0) == "00:00"
@@ -62,6 +87,1122 @@ class TestEnergyCalculations:
         assert percentage == 0.0
 
 
+class TestApplianceProfiles:
+    """Test appliance power profiles and cycle emissions"""
+
+    def test_profile_durations(self):
+        """Test that cycles are cut short, run once or repeated to fill a duration"""
+        assert appliance_profile("washer").sum() == pytest.approx(APPLIANCE_CONSUMPTION["washer"])
+        # Longer than the cycle: a washer stops, a heater keeps running
+        assert appliance_profile("washer", 120).sum() == pytest.approx(0.5)
+        assert appliance_profile("heater", 120).sum() == pytest.approx(3.0)
+        # Shorter than the cycle: the first hour of EV charging at full power
+        assert appliance_profile("ev_charger", 60).sum() == pytest.approx(7.2)
+        # Unknown appliances draw 1 kW, partial slots pro rata
+        assert appliance_profile("sauna", 50).sum() == pytest.approx(50 / 60)
+
+    def test_start_emissions_match_direct_sum(self):
+        """Test that the convolution equals summing the cycle over each start hour"""
+        intensity = np.random.default_rng(1).uniform(100, 600, 24)
+        profile = appliance_profile("ev_charger")
+        slots = np.concatenate([np.repeat(intensity, 4), np.full(len(profile), intensity[-1])])
+        expected = [profile @ slots[4 * h:4 * h + len(profile)] / 1000 for h in range(24)]
+        assert np.allclose(start_emissions(profile, intensity), expected)
+
+    def test_flat_intensity_matches_hourly_rate(self):
+        """Test that an hour-long cycle at constant intensity matches calculate_energy_savings"""
+        emissions = start_emissions(appliance_profile("dryer", 60), np.full(6, 300.0))
+        assert np.allclose(emissions, calculate_energy_savings(300.0, ["dryer"], 1.0))
+
+
+class TestBaselineTable:
+    """Test the region x month seasonal baseline table"""
+
+    def test_lookup_by_region_and_month(self):
+        """Test vectorized month lookups per region"""
+        table = BaselineTable(["Nova Scotia", "Ontario"], np.arange(24).reshape(2, 12))
+
+        assert table.lookup("Ontario", [1, 12]).tolist() == [12.0, 23.0]
+        assert table.lookup(None, [3]).tolist() == [2.0]
+        assert table.to_dict("nova-scotia")["1"] == 0.0
+
+    def test_unknown_region(self):
+        """Test that unknown regions raise KeyError"""
+        table = BaselineTable(["Nova Scotia"], np.zeros((1, 12)))
+        with pytest.raises(KeyError):
+            table.row("Atlantis")
+
+    def test_normalize_region(self):
+        """Test that region names match regardless of case and separators"""
+        assert normalize_region(" Nova_Scotia ") == normalize_region("nova-scotia") == "nova scotia"
+
+
+class TestModelRegistry:
+    """Test the per-region model registry"""
+
+    def make_registry(self, tmp_path, **kwargs):
+        return ModelRegistry(models_dir=tmp_path / "models", legacy_model=tmp_path / "aura_model.joblib",
+                             poll_interval_s=0, **kwargs)
+
+    def test_lazy_loading_per_region(self, tmp_path):
+        """Test that models are loaded only when first requested"""
+        publish_model({"region": "ns"}, "Nova Scotia", "v1", models_dir=tmp_path / "models")
+        publish_model({"region": "on"}, "Ontario", "v1", models_dir=tmp_path / "models")
+        registry = self.make_registry(tmp_path)
+        assert registry.loads == 0
+
+        assert registry.get("ontario") == {"region": "on"}
+        assert registry.get("Ontario") == {"region": "on"}
+        assert registry.loads == 1
+
+        with pytest.raises(KeyError):
+            registry.get("Atlantis")
+
+    def test_hot_swap_to_newer_version(self, tmp_path):
+        """Test that a newly published version replaces the served one"""
+        publish_model("old", "Ontario", "20240101T000000", models_dir=tmp_path / "models")
+        registry = self.make_registry(tmp_path)
+        assert registry.get("Ontario") == "old"
+
+        publish_model("new", "Ontario", "20250101T000000", models_dir=tmp_path / "models")
+        assert registry.get("Ontario") == "new"
+        assert registry.status()["current_versions"] == {"ontario": "20250101T000000"}
+        assert len(registry.status()["loaded_models"]) == 1
+
+        # Older versions can still be pinned explicitly
+        assert registry.get("Ontario", version="20240101T000000") == "old"
+
+    def test_lru_eviction_under_budget(self, tmp_path):
+        """Test that least-recently-used models are evicted over the memory budget"""
+        for region in ["a", "b", "c"]:
+            publish_model("x" * 20000, region, "v1", models_dir=tmp_path / "models")
+        registry = self.make_registry(tmp_path, memory_budget_mb=0.05)
+
+        registry.get("a")
+        registry.get("b")
+        registry.get("a")
+        registry.get("c")
+
+        loaded = {m["region"] for m in registry.status()["loaded_models"]}
+        assert loaded == {"a", "c"}
+        assert registry.evictions == 1
+
+    def test_legacy_model_serves_default_region(self, tmp_path):
+        """Test that outputs/aura_model.joblib is used for the default region"""
+        import joblib
+        joblib.dump("legacy", tmp_path / "aura_model.joblib")
+        registry = self.make_registry(tmp_path)
+        assert registry.get() == "legacy"
+
+    def test_failed_artifact_is_not_reloaded(self, tmp_path):
+        """Test that a corrupt artifact is loaded once until it changes on disk"""
+        import time
+        calls = []
+
+        def loader(path):
+            calls.append(path)
+            if path.stat().st_size < 100:
+                raise EOFError("truncated")
+            return "model"
+
+        def settle(registry):
+            for _ in range(500):
+                if not registry.status()["warming"]:
+                    return
+                time.sleep(0.01)
+
+        path = publish_model("x", "Ontario", "v1", models_dir=tmp_path / "models")
+        registry = self.make_registry(tmp_path, loader=loader)
+        for _ in range(3):
+            assert registry.get_if_loaded("Ontario") is None
+            settle(registry)
+        assert len(calls) == 1
+        assert registry.status()["failed"] == ["ontario@v1"]
+
+        # Rewriting the artifact makes it eligible again
+        publish_model("x" * 1000, "Ontario", path.stem, models_dir=tmp_path / "models")
+        registry.get_if_loaded("Ontario")
+        settle(registry)
+        assert len(calls) == 2
+        assert registry.get_if_loaded("Ontario") == "model"
+        assert registry.status()["failed"] == []
+
+
+class TestTieredForecaster:
+    """Test the seasonal-profile fallback and SARIMAX tier selection"""
+
+    def make_series(self, weeks=6):
+        ds = np.datetime64("2024-01-01T00", "ns") + np.arange(weeks * 168) * np.timedelta64(1, "h")
+        week = np.repeat(np.arange(weeks), 168)
+        return ds, 1000.0 + hour_of_week(ds) + 10.0 * week
+
+    def make_forecaster(self, tmp_path, registry):
+        ds, y = self.make_series()
+        data = tmp_path / "load.csv"
+        data.write_text("")
+        series = pd.DataFrame({"y": y}, index=pd.DatetimeIndex(ds, name="ds"))
+        return TieredForecaster(registry, lambda: series, data, history_dir=tmp_path / "history", weeks=4)
+
+    def test_hour_of_week(self):
+        """Test that weeks start on Monday"""
+        ds = np.array(["2024-01-01T00", "2024-01-01T05", "2024-01-07T23"], dtype="datetime64[ns]")  # Mon, Mon, Sun
+        assert hour_of_week(ds).tolist() == [0, 5, 167]
+
+    def test_profile_averages_recent_weeks(self):
+        """Test that each hour is the mean of the same hour over the last N weeks"""
+        ds, y = self.make_series()
+        profile = SeasonalProfile.from_series(ds, y, weeks=4)
+        forecast = profile.forecast(24)
+
+        # Weeks 2..5 contribute 20, 30, 40, 50 on top of the hour-of-week value
+        assert forecast.index[0] == pd.Timestamp("2024-02-12T00:00")
+        assert forecast.iloc[0] == pytest.approx(1035.0)
+        assert forecast.iloc[5] == pytest.approx(1040.0)
+
+    def test_profile_answers_until_model_is_warm(self, tmp_path):
+        """Test that a cold model starts loading in the background and the profile answers"""
+        import threading
+
+        class FakeResults:
+            def get_forecast(self, steps, exog=None):
+                return type("Forecast", (), {"predicted_mean": pd.Series(np.full(steps, 1.0))})()
+
+        released = threading.Event()
+
+        def slow_loader(path):
+            released.wait(5)
+            return FakeResults()
+
+        publish_model("unused", "Nova Scotia", "v1", models_dir=tmp_path / "models")
+        registry = ModelRegistry(models_dir=tmp_path / "models", legacy_model=tmp_path / "none.joblib",
+                                 poll_interval_s=0, loader=slow_loader)
+        forecaster = self.make_forecaster(tmp_path, registry)
+
+        values, tier = forecaster.forecast(steps=24)
+        assert tier == "seasonal_profile"
+        assert len(values) == 24
+
+        released.set()
+        registry.get()
+        values, tier = forecaster.forecast(steps=24)
+        assert tier == "sarimax"
+        assert values.tolist() == [1.0] * 24
+
+    def test_profile_answers_when_sarimax_fails(self, tmp_path):
+        """Test the fallback when the loaded model cannot forecast"""
+        class BrokenResults:
+            def get_forecast(self, steps, exog=None):
+                raise ValueError("bad state")
+
+        publish_model("unused", "Nova Scotia", "v1", models_dir=tmp_path / "models")
+        registry = ModelRegistry(models_dir=tmp_path / "models", legacy_model=tmp_path / "none.joblib",
+                                 poll_interval_s=0, loader=lambda path: BrokenResults())
+        registry.get()
+        _, tier = self.make_forecaster(tmp_path, registry).forecast()
+        assert tier == "seasonal_profile"
+
+
+class TestCatchUp:
+    """Test filtering a fitted model through hours newer than its sample"""
+
+    def test_model_extended_with_new_hours(self):
+        """Test that forecasts start after the last reading, and only contiguous data is used"""
+        import warnings
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+        index = pd.date_range("2024-01-01", periods=96, freq="h")
+        y = pd.Series(1000 + 50 * np.sin(np.arange(96) * 2 * np.pi / 24), index=index)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            results = SARIMAX(y, order=(1, 0, 0), trend="c").fit(disp=False)
+
+        ds = pd.date_range("2024-01-01", periods=100, freq="h").values
+        values = np.append(y.to_numpy(), [1200.0, 1210.0, 1220.0, 1230.0])
+        extended = catch_up(results, ds, values)
+        assert extended.get_forecast(1).predicted_mean.index[0] == pd.Timestamp("2024-01-05T04:00")
+
+        assert catch_up(results, index.values, y.to_numpy()) is results
+        gap = np.delete(ds, 97)
+        assert catch_up(results, gap, np.delete(values, 97)) is results
+
+
+class TestLiveLoadSeries:
+    """Test incremental application of ingested load readings"""
+
+    def make_series(self, tmp_path, hours=48):
+        base = tmp_path / "load.csv"
+        base.write_text("")
+        df = pd.DataFrame({"y": np.arange(hours, dtype=float)},
+                          index=pd.date_range("2024-01-01", periods=hours, freq="h", name="ds"))
+        return LiveLoadSeries(lambda: df, base, root=tmp_path / "live")
+
+    def ingest(self, series, stamps, loads):
+        append_readings(to_hours(np.array(stamps, dtype="datetime64[ns]")), np.array(loads, dtype=float), series.root)
+        return series.refresh()
+
+    def test_gaps_interpolated_and_duplicates_ignored(self, tmp_path):
+        """Test that skipped hours are interpolated and replaced when their reading arrives"""
+        series = self.make_series(tmp_path)
+        stats = self.ingest(series, ["2024-01-03T02", "2024-01-03T02", "2024-01-01T05"], [77.0, 1.0, 999.0])
+        assert stats["accepted"] == 1
+        assert stats["duplicates"] == 2
+        assert stats["interpolated_hours"] == 2
+        assert str(np.datetime64(stats["changed_from"], "h")) == "2024-01-03T00"
+
+        ds, y = series.arrays()
+        assert str(series.end()) == "2024-01-03T02"
+        assert y[5] == 5.0
+        assert y[-3:].tolist() == [57.0, 67.0, 77.0]
+
+        stats = self.ingest(series, ["2024-01-03T01"], [100.0])
+        assert stats["interpolated_hours"] == 1
+        # 00:00 is re-interpolated towards the new reading, so it changed too
+        assert str(np.datetime64(stats["changed_from"], "h")) == "2024-01-03T00"
+        assert series.arrays()[1][-3:].tolist() == [73.5, 100.0, 77.0]
+        assert series.frame().index.freq == "h"
+
+    def test_changed_from_after_another_refresh(self, tmp_path):
+        """Test that the changed range of readings is found even once another caller folded them in"""
+        series = self.make_series(tmp_path)
+        self.ingest(series, ["2024-01-03T03"], [80.0])
+        stats = self.ingest(series, ["2024-01-03T01"], [100.0])
+        assert series.refresh()["changed_from"] is None
+
+        hours = to_hours(np.array(["2024-01-03T01"], dtype="datetime64[ns]"))
+        assert series.changed_from(hours) == stats["changed_from"]
+        assert str(np.datetime64(series.changed_from(hours), "h")) == "2024-01-03T00"
+
+    def test_other_process_catches_up_from_log(self, tmp_path):
+        """Test that a second series reads only the new records and ignores a partial one"""
+        writer, reader = self.make_series(tmp_path), self.make_series(tmp_path)
+        version = reader.version()
+        self.ingest(writer, ["2024-01-03T00"], [48.0])
+        with open(tmp_path / "live" / LOG_NAME, "ab") as f:
+            f.write(b"\x00" * 5)
+
+        assert reader.version() == writer.version() != version
+        assert reader.arrays()[1][-1] == 48.0
+        assert reader.observed(to_hours(np.array(["2024-01-03T00", "2024-01-03T01"], dtype="datetime64[ns]"))).tolist() == [True, False]
+
+
+class TestSharedForecast:
+    """Test the single-producer forecast publication shared by worker processes"""
+
+    class FakeForecaster:
+        def __init__(self):
+            self.calls = 0
+
+        def forecast(self, region=None, steps=24):
+            self.calls += 1
+            index = pd.date_range("2025-01-01", periods=steps, freq="h")
+            tier = "sarimax" if self.model else "seasonal_profile"
+            return pd.Series(np.full(steps, 1000.0 + self.calls), index=index), tier
+
+        def model_version(self, region=None):
+            return self.model
+
+        def profile(self, region=None):
+            return SeasonalProfile(np.full(168, 500.0), np.datetime64("2024-12-31T23", "ns"), 4)
+
+        def source_key(self, region=None):
+            return self.source
+
+        source = "csv:1"
+        model = "v1"
+
+    def test_readers_share_the_producers_forecast(self, tmp_path):
+        """Test that only the lock holder forecasts and other workers read its table"""
+        producer_forecaster, reader_forecaster = self.FakeForecaster(), self.FakeForecaster()
+        producer = SharedForecast(producer_forecaster, state_dir=tmp_path)
+        reader = SharedForecast(reader_forecaster, state_dir=tmp_path)
+        assert producer.is_producer()
+        assert not reader.is_producer()
+
+        values, tier = producer.get(steps=24)
+        shared, shared_tier = reader.get(steps=24)
+        assert tier == shared_tier == "sarimax"
+        assert shared.tolist() == values.tolist() == [1001.0] * 24
+        assert reader_forecaster.calls == 0
+        assert reader.status()["published"] == producer.status()["published"]
+
+        # Fresh tables are reused rather than recomputed
+        producer.get(steps=24)
+        assert producer_forecaster.calls == 1
+
+    def test_reader_without_publication_uses_profile(self, tmp_path):
+        """Test that a non-producer never forecasts with SARIMAX itself"""
+        holder = SharedForecast(self.FakeForecaster(), state_dir=tmp_path)
+        assert holder.is_producer()
+        reader_forecaster = self.FakeForecaster()
+        values, tier = SharedForecast(reader_forecaster, state_dir=tmp_path).get(steps=6)
+        assert tier == "seasonal_profile"
+        assert values.tolist() == [500.0] * 6
+        assert reader_forecaster.calls == 0
+
+    def test_stale_forecast_republished_with_next_sequence(self, tmp_path):
+        """Test that an expired forecast is recomputed and the sequence advances"""
+        shared = SharedForecast(self.FakeForecaster(), state_dir=tmp_path, ttl_s=0)
+        shared.get(steps=24)
+        first = shared.published()
+        values, _ = shared.get(steps=24)
+        second = shared.published()
+        assert second.version != first.version
+        assert (first.meta["sequence"], second.meta["sequence"]) == (1, 2)
+        assert values.iloc[0] == 1002.0
+
+    def test_profile_forecast_kept_until_model_or_data_changes(self, tmp_path):
+        """Test that no version is published while the model is unavailable and nothing else changed"""
+        forecaster = self.FakeForecaster()
+        forecaster.model = None
+        shared = SharedForecast(forecaster, state_dir=tmp_path)
+        _, tier = shared.get(steps=24)
+        shared.get(steps=24)
+        assert tier == "seasonal_profile"
+        assert (forecaster.calls, shared.published().meta["sequence"]) == (1, 1)
+
+        forecaster.model = "v1"
+        _, tier = shared.get(steps=24)
+        assert tier == "sarimax"
+        assert shared.published().meta["model"] == "v1"
+
+        forecaster.source = "live:2"
+        shared.get(steps=24)
+        assert (forecaster.calls, shared.published().meta["sequence"]) == (3, 3)
+
+    def test_producer_role_handed_over_on_release(self, tmp_path):
+        """Test that another worker takes over once the producer lets go"""
+        first = SharedForecast(self.FakeForecaster(), state_dir=tmp_path)
+        second = SharedForecast(self.FakeForecaster(), state_dir=tmp_path)
+        assert first.is_producer()
+        assert not second.is_producer()
+        first.release()
+        assert second.is_producer()
+        second.release()
+
+
+class TestJobQueue:
+    """Test job deduplication, bounded concurrency and status records"""
+
+    def make_queue(self, tmp_path, run, **kwargs):
+        return JobQueue("test", run, jobs_dir=tmp_path, **kwargs)
+
+    def wait(self, queue, job_id):
+        import asyncio
+        return asyncio.run(queue.wait(job_id, poll_s=0.01))
+
+    def test_identical_jobs_deduplicated(self, tmp_path):
+        """Test that identical parameters share a queued/running/recent job"""
+        import threading
+        release = threading.Event()
+        calls = []
+
+        def run(params, progress):
+            calls.append(params)
+            progress(0.5, "halfway")
+            release.wait(5)
+            return {"value": params["x"] * 2}
+
+        queue = self.make_queue(tmp_path, run)
+        first, created = queue.submit({"x": 1})
+        second, reused_created = queue.submit({"x": 1})
+        other, other_created = queue.submit({"x": 2})
+        assert created and other_created and not reused_created
+        assert second["job_id"] == first["job_id"] != other["job_id"]
+
+        release.set()
+        done = self.wait(queue, first["job_id"])
+        assert done["status"] == "succeeded"
+        assert done["progress"] == 1.0
+        assert done["result"] == {"value": 2}
+
+        # A recently finished identical job is reused; an expired one is not
+        assert queue.submit({"x": 1})[0]["job_id"] == first["job_id"]
+        queue.dedupe_s = 0
+        rerun, created = queue.submit({"x": 1})
+        assert created
+        self.wait(queue, rerun["job_id"])
+        self.wait(queue, other["job_id"])
+        assert len(calls) == 3
+
+    def test_superseded_result_not_reused(self, tmp_path):
+        """Test that a finished job is rerun once its result is no longer valid"""
+        published = {"version": "v1"}
+
+        def run(params, progress):
+            return {"version": published["version"]}
+
+        queue = self.make_queue(tmp_path, run, still_valid=lambda result: result["version"] == published["version"])
+        job, _ = queue.submit({"x": 1})
+        self.wait(queue, job["job_id"])
+        assert not queue.submit({"x": 1})[1]
+
+        published["version"] = "v2"
+        rerun, created = queue.submit({"x": 1})
+        assert created
+        assert self.wait(queue, rerun["job_id"])["result"] == {"version": "v2"}
+
+    def test_worker_pool_bounds_concurrency(self, tmp_path):
+        """Test that no more than `workers` jobs run at once and the queue is capped"""
+        import threading
+        import time
+        lock = threading.Lock()
+        running = {"now": 0, "max": 0}
+        release = threading.Event()
+
+        def run(params, progress):
+            with lock:
+                running["now"] += 1
+                running["max"] = max(running["max"], running["now"])
+            release.wait(5)
+            time.sleep(0.01)
+            with lock:
+                running["now"] -= 1
+            return {}
+
+        queue = self.make_queue(tmp_path, run, workers=2, max_queued=3)
+        jobs = [queue.submit({"x": i})[0] for i in range(5)]
+        time.sleep(0.1)
+        assert queue.status()["running"] == 2
+        assert queue.status()["queued"] == 3
+        with pytest.raises(JobQueueFull):
+            queue.submit({"x": 99})
+
+        release.set()
+        assert all(self.wait(queue, job["job_id"])["status"] == "succeeded" for job in jobs)
+        assert running["max"] == 2
+
+    def test_failure_recorded_and_visible_to_other_processes(self, tmp_path):
+        """Test that errors are reported and records are readable from another queue"""
+        def run(params, progress):
+            raise ValueError("no model")
+
+        queue = self.make_queue(tmp_path, run)
+        job, _ = queue.submit({"x": 1})
+        assert self.wait(queue, job["job_id"])["status"] == "failed"
+
+        other_process = self.make_queue(tmp_path, run)
+        record = other_process.get(job["job_id"])
+        assert record["status"] == "failed"
+        assert record["error"] == "no model"
+
+        # Failed jobs are not reused, and unknown or malformed ids are not found
+        assert other_process.submit({"x": 1})[1]
+        assert other_process.get("0" * 32) is None
+        assert other_process.get("../etc/passwd") is None
+
+    def test_vanished_record_is_skipped(self, tmp_path, capsys):
+        """Test that a worker whose job record disappears mid-run finishes without error"""
+        import threading
+        started, release = threading.Event(), threading.Event()
+
+        def run(params, progress):
+            started.set()
+            release.wait(5)
+            for fraction in (0.25, 0.5, 0.75):
+                progress(fraction, "working")
+            return {"value": 1}
+
+        queue = self.make_queue(tmp_path, run)
+        job, _ = queue.submit({"x": 1})
+        assert started.wait(5)
+        (tmp_path / f"{job['job_id']}.json").unlink()
+        release.set()
+
+        assert self.wait(queue, job["job_id"]) is None
+        assert queue.status()["running"] == 0
+        assert not (tmp_path / f"{job['job_id']}.json").exists()
+        # Reported once, not on every progress call
+        assert capsys.readouterr().out.count("has no record") == 1
+        # The key now points at nothing, so an identical submission starts afresh
+        assert queue.submit({"x": 1})[1]
+
+
+class TestAdmissionControl:
+    """Test per-client token buckets, concurrency caps and limit configuration"""
+
+    class Clock:
+        def __init__(self):
+            self.now = 0.0
+
+        def __call__(self):
+            return self.now
+
+    def test_token_bucket_per_client(self):
+        """Test that each client gets its own burst and refill, with Retry-After on 429"""
+        clock = self.Clock()
+        controller = AdmissionController({"/slow": RouteLimit(rate=0.5, burst=2)}, clock=clock)
+        for _ in range(2):
+            assert controller.admit("/slow", "a") is None
+            controller.release("/slow", 0.1)
+        assert controller.admit("/slow", "a") == (429, 2, "Rate limit for /slow exceeded (0.5/s, burst 2)")
+        assert controller.admit("/slow", "b") is None
+
+        clock.now = 2.0
+        assert controller.admit("/slow", "a") is None
+        assert controller.counters["/slow"] == {"admitted": 4, "rate_limited": 1, "saturated": 0}
+        assert controller.admit("/other", "a") is None
+
+    def test_concurrency_cap(self):
+        """Test that a saturated route answers 503 without using up the client's tokens"""
+        controller = AdmissionController({"/slow": RouteLimit(rate=100, burst=100, concurrency=2)})
+        assert controller.admit("/slow", "a") is None
+        assert controller.admit("/slow", "b") is None
+        status, retry_after, _ = controller.admit("/slow", "c")
+        assert (status, retry_after) == (503, 1)
+
+        controller.release("/slow", 4.2)
+        assert controller.admit("/slow", "c") is None
+        assert controller.admit("/slow", "c")[:2] == (503, 5)
+        assert controller.status()["/slow"]["in_progress"] == 2
+        assert controller.status()["/slow"]["saturated"] == 2
+
+    def test_middleware_rejects_concurrent_burst(self):
+        """Test 503 with Retry-After for requests beyond the cap while others are in progress"""
+        import asyncio
+        import httpx
+        from fastapi import FastAPI
+
+        app = FastAPI()
+        controller = AdmissionController({"/slow": RouteLimit(rate=100, burst=100, concurrency=2)})
+        app.add_middleware(AdmissionMiddleware, controller=controller)
+
+        @app.get("/slow")
+        async def slow():
+            await asyncio.sleep(0.2)
+            return {"ok": True}
+
+        async def burst():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(client.get("/slow") for _ in range(5)))
+
+        responses = asyncio.run(burst())
+        assert sorted(r.status_code for r in responses) == [200, 200, 503, 503, 503]
+        assert all(r.headers["retry-after"] == "1" for r in responses if r.status_code == 503)
+        assert controller.status()["/slow"]["in_progress"] == 0
+
+    def test_limits_configuration(self):
+        """Test that JSON overrides adjust, add and remove route limits"""
+        limits = load_limits('{"/api/optimize-windows": {"rate": 1}, "/api/compute-green-window": null, "/x": {"rate": 2, "burst": 4}}')
+        assert limits["/api/optimize-windows"].rate == 1.0
+        assert limits["/api/optimize-windows"].concurrency == 8
+        assert "/api/compute-green-window" not in limits
+        assert limits["/x"].concurrency is None
+        with pytest.raises(ValueError):
+            RouteLimit(rate=0, burst=1)
+
+
+class TestLoadGenerator:
+    """Test the HTTP load generator's sessions, accounting and report"""
+
+    def test_run_against_app(self):
+        """Test per-route counts, status codes and totals for a chatbot mix"""
+        import asyncio
+        import httpx
+        from fastapi import FastAPI, HTTPException
+
+        app = FastAPI()
+
+        @app.post("/api/optimize-windows")
+        async def optimize(body: dict):
+            return {"success": True, "windows": body["number_of_windows"]}
+
+        @app.post("/api/schedule-appliances")
+        async def schedule(body: dict):
+            raise HTTPException(status_code=500, detail="boom")
+
+        report = asyncio.run(run_load("http://test", mix="chatbot", concurrency=4, duration_s=0.3,
+                                      transport=httpx.ASGITransport(app=app)))
+        routes = report["routes"]
+        assert set(routes) == {"POST /api/optimize-windows", "POST /api/schedule-appliances"}
+        optimize_stats = routes["POST /api/optimize-windows"]
+        assert optimize_stats["requests"] > 0
+        assert optimize_stats["error_rate"] == 0.0
+        assert optimize_stats["latency_ms_p50"] <= optimize_stats["latency_ms_p99"] <= optimize_stats["latency_ms_max"]
+        schedule_stats = routes["POST /api/schedule-appliances"]
+        assert schedule_stats["statuses"] == {"500": schedule_stats["requests"]}
+        assert schedule_stats["error_rate"] == 1.0
+        assert report["total"]["requests"] == optimize_stats["requests"] + schedule_stats["requests"]
+        assert "ALL" in format_table(report)
+
+    def test_rejections_counted_apart_from_errors(self):
+        """Test that 429/503 are rejected, other failures errors, and percentiles are in ms"""
+        stats = RouteStats()
+        for latency, status in [(0.01, 200), (0.02, 200), (0.03, 429), (0.04, 503), (0.05, "ConnectError")]:
+            stats.record(latency, status)
+        summary = stats.summary(elapsed_s=2.0)
+        assert (summary["requests"], summary["ok"], summary["rejected"], summary["errors"]) == (5, 2, 2, 1)
+        assert summary["error_rate"] == 0.6
+        assert summary["throughput_rps"] == 2.5
+        assert summary["latency_ms_p50"] == 30.0
+        assert summary["latency_ms_max"] == 50.0
+
+
+class TestFourierTerms:
+    """Test the weekly/annual Fourier exogenous regressors"""
+
+    def test_names_and_periodicity(self):
+        """Test column naming and that weekly terms repeat every 168 hours"""
+        names = fourier_names(weekly_order=2, annual_order=1)
+        assert names == ["weekly_sin1", "weekly_cos1", "weekly_sin2", "weekly_cos2", "annual_sin1", "annual_cos1"]
+
+        ds = pd.date_range("2024-03-04", periods=24 * 15, freq="h")
+        terms = fourier_terms(ds, names)
+        np.testing.assert_allclose(terms["weekly_sin1"].values[:168], terms["weekly_sin1"].values[168:336], atol=1e-9)
+        assert not np.allclose(terms["annual_sin1"].values[:168], terms["annual_sin1"].values[168:336])
+
+    def test_unknown_column_rejected(self):
+        """Test that non-Fourier exog names are rejected"""
+        with pytest.raises(ValueError):
+            fourier_terms(pd.date_range("2024-01-01", periods=3, freq="h"), ["temperature"])
+
+    def test_forecast_regenerates_exog_from_model(self):
+        """Test that a model trained with Fourier exog forecasts from its exog_names alone"""
+        import warnings
+        from statsmodels.tsa.statespace.sarimax import SARIMAX
+        ds = pd.date_range("2024-01-01", periods=24 * 28, freq="h")
+        exog = fourier_terms(ds, fourier_names(weekly_order=1, annual_order=0))
+        y = pd.Series(1000 + 50 * exog["weekly_sin1"].values, index=ds)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            results = SARIMAX(y, exog=exog, order=(1, 0, 0), trend="c").fit(disp=False)
+
+        future = forecast_exog(results, 24)
+        assert future.index[0] == pd.Timestamp("2024-01-29T00:00")
+        assert list(future.columns) == ["weekly_sin1", "weekly_cos1"]
+        assert len(forecast_mean(results, 24)) == 24
+
+    def test_model_without_exog(self):
+        """Test that plain SARIMAX models need no exog"""
+        class Plain:
+            model = type("Model", (), {"exog_names": None})()
+        assert forecast_exog(Plain(), 24) is None
+
+
+class TestCarbonHistory:
+    """Test the historical carbon-intensity table and range queries"""
+
+    def make_table(self, tmp_path, hours=72):
+        ds = np.datetime64("2024-01-31T00", "ns") + np.arange(hours) * np.timedelta64(1, "h")
+        load = np.full(hours, 1000.0)
+        baselines = np.full(12, 300.0)
+        baselines[1] = 500.0  # February
+        write_table(tmp_path, compute_history(ds, load, baselines))
+        return open_table(tmp_path)
+
+    def test_compute_history_vectorized(self, tmp_path):
+        """Test fossil share, intensity and class are computed per month"""
+        table = self.make_table(tmp_path)
+
+        assert table["renewable_mw"][0] == 300.0
+        assert table["renewable_mw"][24] == 500.0
+        assert table["carbon_intensity"][0] == pytest.approx(700 * 700 / 1000)
+        assert table["green"][0] == 0
+        assert table["green"][24] == 1  # 350 < 500
+
+    def test_time_slice_binary_search(self, tmp_path):
+        """Test that range bounds are inclusive"""
+        ds = self.make_table(tmp_path)["ds"]
+        lo, hi = time_slice(ds, np.datetime64("2024-02-01T00", "ns"), np.datetime64("2024-02-01T05", "ns"))
+        assert (lo, hi) == (24, 30)
+        assert time_slice(ds, None, None) == (0, 72)
+
+    def test_daily_resolution(self, tmp_path):
+        """Test aggregation into daily buckets"""
+        result = query_history(self.make_table(tmp_path), resolution="day")
+
+        assert result["hours"].tolist() == [24, 24, 24]
+        assert result["green_hours"].tolist() == [0, 24, 24]
+        assert result["avg_load_mw"].tolist() == [1000.0, 1000.0, 1000.0]
+
+    def test_unknown_resolution(self, tmp_path):
+        """Test that unsupported resolutions are rejected"""
+        with pytest.raises(ValueError):
+            query_history(self.make_table(tmp_path), resolution="minute")
+
+    def test_incremental_backfill_over_empty_history(self, tmp_path):
+        """Test that an incremental run over an empty published table falls back to a full backfill"""
+        ds = np.datetime64("2024-01-01T00", "ns") + np.arange(48) * np.timedelta64(1, "h")
+        empty = compute_history(ds[:0], np.zeros(0), np.full(12, 300.0))
+        write_table(tmp_path / "history" / "nova_scotia", empty)
+        RollupStore().save(tmp_path / "rollups" / "nova_scotia")
+
+        path = backfill(history_dir=tmp_path / "history", rollups_dir=tmp_path / "rollups", incremental=True,
+                        series=(ds, np.full(48, 1000.0)))
+        assert len(open_table(path.parent)["ds"]) == 48
+        assert RollupStore.load(tmp_path / "rollups" / "nova_scotia").query("day")["hours"].tolist() == [24, 24]
+
+    def test_incremental_backfill_matches_full_build(self, tmp_path):
+        """Test that recomputing the tail from since gives the history and rollups of a full build"""
+        ds = np.datetime64("2024-01-01T00", "ns") + np.arange(24 * 40) * np.timedelta64(1, "h")
+        load = 1000.0 + 200.0 * np.sin(np.arange(len(ds)) / 24 * 2 * np.pi)
+        incremental, full = tmp_path / "incremental", tmp_path / "full"
+        backfill(history_dir=incremental, rollups_dir=incremental / "rollups", series=(ds[:-30], load[:-30]))
+
+        corrected = load.copy()
+        corrected[-40:] += 300.0
+        path = backfill(history_dir=incremental, rollups_dir=incremental / "rollups", incremental=True,
+                        series=(ds, corrected), since=str(ds[-40]))
+        backfill(history_dir=full, rollups_dir=full / "rollups", series=(ds, corrected))
+
+        actual, expected = open_table(path.parent), open_table(full / "nova_scotia")
+        for name in expected.meta["columns"]:
+            np.testing.assert_array_equal(actual[name], expected[name])
+        actual = RollupStore.load(incremental / "rollups" / "nova_scotia")
+        expected = RollupStore.load(full / "rollups" / "nova_scotia")
+        for granularity in ["hour_of_day", "day", "week", "month"]:
+            for name, values in expected.query(granularity).items():
+                np.testing.assert_allclose(actual.query(granularity)[name], values)
+        assert actual.last_ds == expected.last_ds
+
+    def test_rollups_follow_the_published_history(self, tmp_path):
+        """Test that rollups written by an update that never published its history are not served or extended"""
+        from backend.rollups import get_rollups
+        ds = np.datetime64("2024-01-01T00", "ns") + np.arange(48) * np.timedelta64(1, "h")
+        history_dir, rollups_dir = tmp_path / "history", tmp_path / "rollups"
+        backfill(history_dir=history_dir, rollups_dir=rollups_dir, series=(ds[:24], np.full(24, 1000.0)))
+
+        # An update that died between writing its rollups and publishing the history
+        orphan = RollupStore.from_history(compute_history(ds, np.full(48, 1000.0), np.full(12, 300.0)))
+        orphan.save(rollups_dir / "nova_scotia")
+        assert get_rollups(None, rollups_dir, history_dir).query("day")["hours"].tolist() == [24]
+
+        backfill(history_dir=history_dir, rollups_dir=rollups_dir, incremental=True, series=(ds, np.full(48, 1000.0)))
+        assert get_rollups(None, rollups_dir, history_dir).query("day")["hours"].tolist() == [24, 24]
+
+    def test_append_table_links_full_segments(self, tmp_path):
+        """Test that appending keeps full segments as links and rewrites only the tail"""
+        values = np.arange(10, dtype=float)
+        write_table(tmp_path, {"x": values[:7]})
+        first = append_table(tmp_path, {"x": values[7:]}, 7, segment_rows=4)
+        second = append_table(tmp_path, {"x": np.array([50.0, 60.0])}, 8, segment_rows=4)
+
+        table = open_table(tmp_path)
+        assert table["x"].tolist() == [0, 1, 2, 3, 4, 5, 6, 7, 50, 60]
+        assert table.meta["segments"] == [7, 3]
+        assert table.rows(6, 9)["x"].tolist() == [6, 7, 50]
+        assert table.searchsorted("x", 50) == 8
+        assert (tmp_path / first / "x.0.npy").stat().st_ino == (tmp_path / second / "x.0.npy").stat().st_ino
+
+        # Segments shorter than segment_rows are rewritten along with the new rows
+        append_table(tmp_path, {"x": np.array([70.0])}, 10, segment_rows=8)
+        assert open_table(tmp_path).meta["segments"] == [8, 3]
+
+        with pytest.raises(ValueError):
+            append_table(tmp_path, {"x": values}, 12)
+
+    def test_backfill_needs_region_series(self, tmp_path):
+        """Test that another region is not backfilled from the default region's load CSV"""
+        with pytest.raises(ValueError):
+            backfill("Ontario", history_dir=tmp_path, rollups_dir=tmp_path)
+
+
+class TestRollups:
+    """Test the materialized analytics rollups"""
+
+    def make_history(self, hours=24 * 70):
+        ds = np.datetime64("2024-01-01T00", "ns") + np.arange(hours) * np.timedelta64(1, "h")
+        load = 1000.0 + 200.0 * np.sin(np.arange(hours) / 24 * 2 * np.pi)
+        return compute_history(ds, load, np.linspace(300.0, 500.0, 12))
+
+    def test_incremental_append_matches_full_build(self):
+        """Test that appending hours in batches gives the same buckets as one build"""
+        history = self.make_history()
+        full = RollupStore.from_history(history)
+        incremental = RollupStore()
+        for lo, hi in [(0, 100), (100, 1000), (1000, len(history["ds"]))]:
+            incremental.append({name: values[lo:hi] for name, values in history.items()})
+
+        for granularity in ["hour_of_day", "day", "week", "month"]:
+            expected = full.query(granularity)
+            actual = incremental.query(granularity)
+            assert actual.keys() == expected.keys()
+            for name in expected:
+                np.testing.assert_allclose(actual[name], expected[name])
+
+    def test_matches_raw_aggregation(self):
+        """Test rollup buckets against aggregating the hourly history directly"""
+        history = self.make_history()
+        result = RollupStore.from_history(history).query("day")
+
+        assert result["hours"].tolist() == [24] * 70
+        assert result["load_mw_sum"][0] == pytest.approx(history["load_mw"][:24].sum())
+        assert result["carbon_intensity_max"][0] == pytest.approx(history["carbon_intensity"][:24].max())
+        assert result["green_hours"][0] == history["green"][:24].sum()
+
+    def test_replace_matches_full_build(self):
+        """Test that replacing folded-in hours gives the buckets of a build from the corrected history"""
+        history = self.make_history()
+        store = RollupStore.from_history(history)
+
+        # Recompute the last 40 hours, lowering the day's peak so its max must be rebuilt
+        load = history["load_mw"].copy()
+        load[-40:] -= 150.0
+        corrected = compute_history(history["ds"], load, np.linspace(300.0, 500.0, 12))
+        store.replace({name: values[-40:] for name, values in history.items()},
+                      {name: values[-40:] for name, values in corrected.items()}, lambda since: corrected)
+
+        full = RollupStore.from_history(corrected)
+        for granularity in ["hour_of_day", "day", "week", "month"]:
+            expected = full.query(granularity)
+            actual = store.query(granularity)
+            for name in expected:
+                np.testing.assert_allclose(actual[name], expected[name])
+        assert store.last_ds == full.last_ds
+
+    def test_unknown_values_are_left_out_of_the_mean(self):
+        """Test that NaN hours add to neither the sum nor the finite count"""
+        history = self.make_history(hours=48)
+        history["carbon_intensity"] = history["carbon_intensity"].copy()
+        history["carbon_intensity"][:12] = np.nan
+        history["carbon_intensity"][24:] = np.nan
+        result = RollupStore.from_history(history).query("day")
+
+        assert result["hours"].tolist() == [24, 24]
+        assert result["carbon_intensity_count"].tolist() == [12, 0]
+        expected = history["carbon_intensity"][12:24]
+        assert result["carbon_intensity_sum"][0] / result["carbon_intensity_count"][0] == pytest.approx(expected.mean())
+
+    def test_range_query_and_persistence(self, tmp_path):
+        """Test range-bounded queries and a save/load round trip"""
+        store = RollupStore.from_history(self.make_history())
+        march = store.query("day", np.datetime64("2024-03-01", "ns"), np.datetime64("2024-03-05T23", "ns"))
+        assert len(march["hours"]) == 5
+
+        store.save(tmp_path)
+        loaded = RollupStore.load(tmp_path)
+        np.testing.assert_allclose(loaded.query("week")["renewable_share_sum"], store.query("week")["renewable_share_sum"])
+        assert loaded.last_ds == store.last_ds
+
+    def test_save_over_loaded_tables_writes_changed_buckets(self, tmp_path):
+        """Test that saving a loaded store keeps the published buckets before the first changed one"""
+        history = self.make_history()
+        RollupStore.from_history({name: values[:-30] for name, values in history.items()}).save(tmp_path)
+        store = RollupStore.load(tmp_path)
+        store.append({name: values[-30:] for name, values in history.items()})
+        store.save(tmp_path)
+
+        loaded = RollupStore.load(tmp_path)
+        full = RollupStore.from_history(history)
+        for granularity in ["hour_of_day", "day", "week", "month"]:
+            for name, values in full.query(granularity).items():
+                np.testing.assert_allclose(loaded.query(granularity)[name], values)
+
+    def test_unknown_granularity(self):
+        """Test that unsupported granularities are rejected"""
+        with pytest.raises(ValueError):
+            RollupStore().query("year")
+
+
+class TestSnapshot:
+    """Test the versioned pipeline snapshot"""
+
+    def publish(self, snapshot_dir, load):
+        ds = np.datetime64("2025-01-01T00", "ns") + np.arange(4) * np.timedelta64(1, "h")
+        load = np.asarray(load, dtype=float)
+        return write_snapshot({
+            "ds": ds,
+            "forecast_load_mw": load,
+            "renewable_baseload_mw": np.full(4, 500.0),
+            "fossil_fuel_mw": load - 500.0,
+            "carbon_intensity_gco2_per_kwh": (load - 500.0) * 700.0 / load,
+            "green": np.array([True, True, False, False]),
+        }, meta={
+            "forecast_period": {"start": "2025-01-01T00:00:00", "end": "2025-01-01T03:00:00"},
+            "best_window": {"start": "2025-01-01T00:00:00", "end": "2025-01-01T01:00:00", "positions": [0, 1]},
+        }, snapshot_dir=snapshot_dir)
+
+    def test_rows_match_columns(self, tmp_path):
+        """Test the hourly and best-window rows read back from the memory-mapped table"""
+        self.publish(tmp_path, [1000, 1100, 1200, 1300])
+        snapshot = get_snapshot(tmp_path)
+
+        rows = hourly_records(snapshot)
+        assert len(rows) == 4
+        assert rows[2] == {
+            "timestamp": "2025-01-01T02:00:00", "hour": 2, "forecast_load_mw": 1200.0,
+            "renewable_baseload_mw": 500.0, "fossil_fuel_mw": 700.0,
+            "carbon_intensity_gco2_per_kwh": pytest.approx(700 * 700 / 1200), "window_type": "dirty_window"
+        }
+        window = window_records(snapshot)
+        assert [r["ds"] for r in window] == ["2025-01-01T00:00:00", "2025-01-01T01:00:00"]
+        assert all(r["window_type"] == "green_window" for r in window)
+
+    def test_loaded_once_per_version(self, tmp_path):
+        """Test that the snapshot is reopened only when a new version is published"""
+        first = self.publish(tmp_path, [1000, 1100, 1200, 1300])
+        assert get_snapshot(tmp_path) is get_snapshot(tmp_path)
+
+        second = self.publish(tmp_path, [900, 900, 900, 900])
+        snapshot = get_snapshot(tmp_path)
+        assert snapshot.version == second != first
+        assert snapshot["forecast_load_mw"][0] == 900.0
+
+    def test_missing_columns_rejected(self, tmp_path):
+        """Test that an incomplete run cannot be published"""
+        with pytest.raises(ValueError):
+            write_snapshot({"ds": np.array([], dtype="datetime64[ns]")}, meta={}, snapshot_dir=tmp_path)
+
+
+class TestForecastRecords:
+    """Test the compact forecast representation used by the endpoints"""
+
+    def _records(self, hours=168):
+        ds = np.datetime64('2024-03-31T12', 'h') + np.arange(hours)
+        load = np.round(np.random.default_rng(3).uniform(0.5, 60000.0, hours), 2)
+        baselines = np.linspace(100.0, 1200.0, 12)
+        return ForecastRecords.from_forecast(ds, load, baselines, 'full'), load, baselines
+
+    def test_load_recovered_exactly(self):
+        """Test that float32 storage returns the rounded loads unchanged"""
+        records, load, _ = self._records()
+        assert records.load_mw.dtype == np.float32
+        assert np.array_equal(records.load(), load)
+
+    def test_derived_columns_match_frame(self):
+        """Test that renewable baseload follows the month and the frame carries every column"""
+        records, load, baselines = self._records()
+        df = records.frame()
+        assert df.attrs['forecast_tier'] == 'full'
+        # Hours from 12:00 on 31 March are in March until midnight, then April
+        assert records.renewable()[0] == baselines[2]
+        assert records.renewable()[12] == baselines[3]
+        assert np.array_equal(df['Fossil_Fuel_MW'].to_numpy(), np.maximum(load - records.renewable(), 0))
+        assert df['time_minutes'].tolist() == (df['hour'] * 60).tolist()
+
+    def test_classes_are_uint8_codes(self):
+        """Test that green/dirty classes are codes mapped to strings only on output"""
+        records, _, _ = self._records(24)
+        intensity = records.carbon_intensity()
+        codes = records.classes(intensity)
+        assert codes.dtype == np.uint8
+        assert set(np.unique(codes)) <= {DIRTY, GREEN}
+        assert np.array_equal(codes, intensity < records.thresholds())
+        types = window_types(codes)
+        assert types == np.where(codes == GREEN, 'green_window', 'dirty_window').tolist()
+
+    def test_hours_classified_against_their_own_month(self):
+        """Test that a forecast crossing a month boundary uses each month's baseline"""
+        ds = np.datetime64('2024-03-31T22', 'h') + np.arange(4)
+        baselines = np.full(12, 100.0)
+        baselines[3] = 300.0  # April
+        codes = classify_hours(ds, np.full(4, 200.0), baselines)
+        assert codes.tolist() == [DIRTY, DIRTY, GREEN, GREEN]
+
+        records = ForecastRecords.from_forecast(ds, np.full(4, 1000.0), baselines, 'full')
+        assert records.baseline_threshold() == 100.0
+        assert np.array_equal(records.classes(np.full(4, 200.0)), codes)
+
+    def test_smaller_than_frame(self):
+        """Test that the records hold a fraction of the DataFrame's memory"""
+        records, _, _ = self._records()
+        assert records.nbytes == 168 * 8
+        assert records.nbytes * 5 < records.frame().memory_usage(deep=True).sum()
+
+    def test_forecast_rows(self):
+        """Test that column lists become response rows"""
+        assert forecast_rows({'a': [1, 2], 'b': ['x', 'y']}) == [{'a': 1, 'b': 'x'}, {'a': 2, 'b': 'y'}]
+
+
+class TestScenarioEngine:
+    """Test the vectorized what-if scenario engine"""
+
+    def test_grid_is_cartesian_product(self):
+        """Test that a grid covers every combination, with defaults for missing parameters"""
+        grid = scenario_grid(emission_factor=[500, 700], renewable_scale=[1, 2, 3])
+        assert len(grid["emission_factor"]) == 6
+        assert set(zip(grid["emission_factor"], grid["renewable_scale"])) == {
+            (e, r) for e in (500.0, 700.0) for r in (1.0, 2.0, 3.0)
+        }
+        assert (grid["demand_growth"] == 0.0).all()
+        assert grid_size(emission_factor=[500, 700], renewable_scale=[1, 2, 3], demand_growth=[]) == 6
+
+    def test_matches_single_scenario_formula(self):
+        """Test that each row equals the intensity computed for that scenario alone"""
+        rng = np.random.default_rng(5)
+        load = rng.uniform(800, 1600, 48)
+        renewable = np.full(48, 400.0)
+        grid = scenario_grid(emission_factor=[300, 900], renewable_scale=[0.5, 2], demand_growth=[0, 0.25])
+        result = evaluate_scenarios(load, renewable, 350.0, grid, window_hours=3, top_k=2)
+        for i in range(8):
+            scaled = load * (1 + grid["demand_growth"][i])
+            fossil = np.maximum(scaled - renewable * grid["renewable_scale"][i], 0)
+            expected = fossil * grid["emission_factor"][i] / scaled
+            assert np.allclose(result["intensity"][i], expected)
+            assert result["green_hours"][i] == (expected < 350.0).sum()
+            means = np.convolve(expected, np.ones(3) / 3, mode="valid")
+            assert result["window_start"][i, 0] == int(np.argmin(means))
+
+    def test_best_windows_do_not_overlap(self):
+        """Test that windows are disjoint, skip unknown hours and are padded when few fit"""
+        intensity = np.array([[5.0, 1.0, 1.0, 5.0, 2.0, np.nan, 0.0, 9.0]])
+        windows = best_windows(intensity, 2, 4)
+        assert windows["start"][0].tolist() == [1, 3, 6, -1]
+        assert windows["avg_carbon_intensity"][0, :3].tolist() == [1.0, 3.5, 4.5]
+        assert best_windows(intensity, 9, 2)["start"].tolist() == [[-1, -1]]
+
+
+class TestMeritOrder:
+    """Test merit-order dispatch of fossil units"""
+
+    UNITS = "name,fuel,capacity_mw,emission_factor_gco2_per_kwh,marginal_cost\n" \
+            "peaker,oil,100,800,200\ncoal,coal,300,1000,30\nccgt,gas,200,370,50\n"
+
+    def _merit_order(self, tmp_path):
+        path = tmp_path / "units.csv"
+        path.write_text(self.UNITS)
+        return load_dispatch(path)
+
+    def test_units_stacked_by_cost(self, tmp_path):
+        """Test that the file is read and units are dispatched cheapest first"""
+        merit_order = self._merit_order(tmp_path)
+        assert merit_order.names == ["coal", "ccgt", "peaker"]
+        assert merit_order.capacity == 600.0
+
+    def test_dispatch_matches_unit_by_unit_stacking(self, tmp_path):
+        """Test that the searchsorted dispatch equals filling units one at a time"""
+        merit_order = self._merit_order(tmp_path)
+        demand = np.concatenate([[0.0, 300.0, 500.0, 600.0], np.random.default_rng(2).uniform(0, 800, (3, 50)).ravel()])
+        emissions, marginal = merit_order.dispatch(demand)
+        for mw, emitted, factor in zip(demand, emissions, marginal):
+            expected, remaining, last = 0.0, mw, 1000.0
+            for capacity, ef in ((300, 1000), (200, 370), (100, 800)):
+                used = min(capacity, remaining)
+                expected += used * ef
+                remaining -= used
+                last = ef if used > 0 else last
+            expected += remaining * merit_order.shortfall_factor
+            assert emitted == pytest.approx(expected)
+            assert factor == (merit_order.shortfall_factor if remaining > 0 else last)
+
+    def test_bad_units_file(self, tmp_path):
+        """Test that a units file without capacities is rejected"""
+        path = tmp_path / "units.csv"
+        path.write_text("name,emission_factor_gco2_per_kwh\ncoal,1000\n")
+        with pytest.raises(ValueError):
+            MeritOrder.from_file(path)
+        with pytest.raises(FileNotFoundError):
+            load_dispatch(tmp_path / "missing.csv")
+
+    def test_records_and_scenarios_use_merit_order(self, tmp_path):
+        """Test that forecasts and scenario batches take intensity from the dispatch"""
+        merit_order = self._merit_order(tmp_path)
+        ds = np.datetime64("2024-01-01T00", "h") + np.arange(24)
+        load = np.linspace(700.0, 1100.0, 24)
+        baselines = np.full(12, 400.0)
+        records = ForecastRecords.from_forecast(ds, load, baselines, "full", merit_order)
+        fossil = load - 400.0
+        assert np.allclose(records.carbon_intensity(), merit_order.dispatch(fossil)[0] / load)
+        assert "Marginal_Intensity_gCO2_per_kWh" in records.frame().columns
+
+        grid = scenario_grid(renewable_scale=[0.5, 1.0], demand_growth=[0.0, 0.2])
+        result = evaluate_scenarios(load, np.full(24, 400.0), 500.0, grid, dispatch=merit_order)
+        for i in range(4):
+            scaled = load * (1 + grid["demand_growth"][i])
+            single = merit_order.intensity(np.maximum(scaled - 400.0 * grid["renewable_scale"][i], 0), scaled)
+            assert np.allclose(result["intensity"][i], single[0])
+            assert np.allclose(result["marginal_intensity"][i], single[1])
+
+
 class TestForecastData:
     """Test forecast data generation"""
 